@@ -0,0 +1,46 @@
+# analyze.py: Headless batch analysis of a PGN file.
+#
+#   python analyze.py games.pgn                        depth 6, all cores
+#   python analyze.py games.pgn -o out.pgn --movetime 0.2 --workers 4
+
+import argparse
+import os
+import sys
+
+from chess.engine.analysis import AnalysisOptions, BatchStats, analyze_games
+from chess.rules.pgn import read_pgn, game_to_pgn
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Annotate every game of a PGN file with engine evals.")
+    parser.add_argument("pgn", help="PGN file to analyze")
+    parser.add_argument("-o", "--output", help="annotated PGN to write (default: <input>.annotated.pgn)")
+    parser.add_argument("--depth", type=int, default=6, help="search depth per position")
+    parser.add_argument("--movetime", type=float, help="seconds per position instead of a fixed depth")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="worker processes (0 analyzes in this process)")
+    parser.add_argument("--chunksize", type=int, default=1, help="games handed to a worker at a time")
+    parser.add_argument("--hash", type=int, default=16, help="transposition table size per worker in MB")
+    args = parser.parse_args(argv)
+
+    output = args.output or os.path.splitext(args.pgn)[0] + ".annotated.pgn"
+    depth = args.depth if args.movetime is None else 64
+    options = AnalysisOptions(depth, args.movetime, args.hash)
+    stats = BatchStats()
+
+    with open(output, "w", encoding="utf-8") as out:
+        for result in analyze_games(read_pgn(args.pgn), options, args.workers, args.chunksize, stats):
+            game = result.game
+            if result.index:
+                out.write("\n")
+            out.write(game_to_pgn(game))
+            print(f"{result.index + 1:6d}  {game.headers.get('White', '?')} - {game.headers.get('Black', '?')}"
+                  f"  {game.result}  {result.plies} positions  {result.seconds:.1f}s", file=sys.stderr)
+
+    print(stats.report())
+    print(f"Wrote {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
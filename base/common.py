@@ -2,6 +2,8 @@ import pygame
 import os.path
 from typing import Union, Callable
 
+from base.font_cache import FONTS
+
 
 # Color class. Has named attributes of various colors I use often.
 class Color:
@@ -17,11 +19,21 @@ class Color:
     Coffee = 111, 78, 55, 255
 
 
+class _RegisteredFont:
+    # Looks the font up in the shared registry on first use instead of
+    # loading it when this module is imported.
+    def __init__(self, size: int):
+        self.size = size
+
+    def __get__(self, instance, owner) -> pygame.font.Font:
+        return FONTS.get(size=self.size)
+
+
 class GameFont:
-    Small = pygame.font.Font("resource/fonts/lunchds.ttf", 20)
-    Default = pygame.font.Font("resource/fonts/lunchds.ttf", 30)
-    Title = pygame.font.Font("resource/fonts/lunchds.ttf", 50)
-    Arrow = pygame.font.Font("resource/fonts/lunchds.ttf", 80)
+    Small = _RegisteredFont(20)
+    Default = _RegisteredFont(30)
+    Title = _RegisteredFont(50)
+    Arrow = _RegisteredFont(80)
 
 
 class MouseButton:
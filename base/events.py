@@ -0,0 +1,145 @@
+# events.py: The event stream behind the menu and game event loops. Live it
+# is pygame.event.get(); it can also record every event the loops process to
+# a file, or replay such a file frame by frame in place of real input, so a
+# session can be rerun exactly (e.g. headless, to benchmark rendering).
+#
+# A recording is JSON lines: a header, one line per event with the frame
+# (event loop call) it was processed in and its time in ms since the start,
+# and a final line with the number of frames:
+#
+#   {"recording": 1, "size": [1200, 720], "fps": 75}
+#   {"frame": 12, "t": 160.2, "type": 1025, "attrs": {"pos": [600, 165], "button": 1}}
+#   {"end": 480}
+
+import json
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, TextIO
+
+import pygame
+
+from base.settings import SCREEN_SETTING
+
+RECORDING_VERSION = 1
+
+
+def encode_event(event: pygame.event.Event) -> dict:
+    # The window attribute is an SDL handle and means nothing in a replay.
+    attrs = {key: list(value) if isinstance(value, tuple) else value
+             for key, value in event.dict.items() if key != "window"}
+    return {"type": event.type, "attrs": attrs}
+
+
+def decode_event(data: dict) -> pygame.event.Event:
+    attrs = {key: tuple(value) if isinstance(value, list) else value
+             for key, value in data["attrs"].items()}
+    return pygame.event.Event(data["type"], attrs)
+
+
+class RecordingWriter:
+    def __init__(self, path: str):
+        self.path = path
+        self.file: TextIO = open(path, "w")
+        self.write_line({"recording": RECORDING_VERSION,
+                         "size": list(SCREEN_SETTING["size"]),
+                         "fps": SCREEN_SETTING["fps"]})
+
+    def write_line(self, data: dict) -> None:
+        self.file.write(json.dumps(data, separators=(",", ":")) + "\n")
+
+    def write(self, frame: int, ms: float, event: pygame.event.Event) -> None:
+        self.write_line({"frame": frame, "t": round(ms, 1), **encode_event(event)})
+
+    def close(self, frames: int) -> None:
+        self.write_line({"end": frames})
+        self.file.close()
+
+
+class Recording:
+    """
+    A recording loaded for replay: the events of each frame and the number
+    of frames.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.frames: Dict[int, List[pygame.event.Event]] = defaultdict(list)
+        self.length = 0
+        self.events = 0
+        self.seconds = 0.0
+        self.size = None
+        try:
+            with open(path) as f:
+                for line in f:
+                    data = json.loads(line)
+                    if "recording" in data:
+                        if data["recording"] != RECORDING_VERSION:
+                            raise ValueError(f"{path}: unsupported recording version {data['recording']}")
+                        self.size = tuple(data["size"])
+                    elif "end" in data:
+                        self.length = data["end"]
+                    else:
+                        self.frames[data["frame"]].append(decode_event(data))
+                        self.events += 1
+                        self.seconds = data["t"] / 1000
+                        self.length = max(self.length, data["frame"] + 1)
+        except (OSError, json.JSONDecodeError, KeyError) as e:
+            raise ValueError(f"Cannot read recording {path}: {e}")
+        if self.size is None:
+            raise ValueError(f"{path} is not an input recording")
+
+
+class EventSource:
+    """
+    Call get() once per event loop iteration in place of pygame.event.get().
+    Each call is one frame; recordings are keyed by that count, so replaying
+    needs no timing of its own: the same events arrive on the same frames
+    and the loops make the same state changes.
+    """
+
+    def __init__(self):
+        self.frame = 0
+        self.recorder: Optional[RecordingWriter] = None
+        self.recording: Optional[Recording] = None
+        self.__start = time.perf_counter()
+
+    @property
+    def replaying(self) -> bool:
+        return self.recording is not None
+
+    def record(self, path: str) -> None:
+        self.recorder = RecordingWriter(path)
+        self.frame = 0
+        self.__start = time.perf_counter()
+
+    def replay(self, path: str) -> Recording:
+        recording = Recording(path)
+        if recording.size != tuple(SCREEN_SETTING["size"]):
+            print(f"Warning: {path} was recorded at {recording.size[0]}x{recording.size[1]}; "
+                  f"clicks may miss at this screen size")
+        self.recording = recording
+        self.frame = 0
+        return recording
+
+    def get(self) -> List[pygame.event.Event]:
+        frame = self.frame
+        self.frame += 1
+        events = pygame.event.get()
+        if self.recording is not None:
+            # Real input is ignored, except for closing the window.
+            events = [e for e in events if e.type == pygame.QUIT] + self.recording.frames.pop(frame, [])
+            if frame + 1 >= self.recording.length and not any(e.type == pygame.QUIT for e in events):
+                events.append(pygame.event.Event(pygame.QUIT))
+        elif self.recorder is not None:
+            ms = (time.perf_counter() - self.__start) * 1000
+            for event in events:
+                self.recorder.write(frame, ms, event)
+        return events
+
+    def close(self) -> None:
+        if self.recorder is not None:
+            self.recorder.close(self.frame)
+            self.recorder = None
+
+
+EVENTS = EventSource()
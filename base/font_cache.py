@@ -0,0 +1,101 @@
+# font_cache.py: Process wide font registry and rendered text cache.
+
+import os.path
+from collections import OrderedDict
+from typing import Dict, Tuple, Union
+
+import pygame
+
+FONT_DIR = "resource/fonts/"
+DEFAULT_FONT = "lunchds.ttf"
+
+
+class FontRegistry:
+    """
+    Hands out one pygame.font.Font per (file, size), so a TTF file is parsed
+    once no matter how many text boxes use it.
+    """
+
+    def __init__(self):
+        self.fonts: Dict[Tuple[str, int], pygame.font.Font] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, filename: str = DEFAULT_FONT, size: int = 20) -> pygame.font.Font:
+        path = filename if os.path.dirname(filename) else os.path.join(FONT_DIR, filename)
+        key = (path, size)
+        font = self.fonts.get(key)
+        if font is None:
+            self.misses += 1
+            font = pygame.font.Font(path, size)
+            self.fonts[key] = font
+        else:
+            self.hits += 1
+        return font
+
+    def stats(self) -> dict:
+        return {"fonts": len(self.fonts), "hits": self.hits, "misses": self.misses}
+
+
+class TextCache:
+    """
+    LRU cache of rendered text surfaces keyed by (text, font, color,
+    antialias). Bounded both by entry count and by the pixel memory of the
+    cached surfaces. The surfaces are shared, so callers must only blit them,
+    never draw on them.
+    """
+
+    def __init__(self, max_entries: int = 512, max_bytes: int = 8 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries: "OrderedDict[tuple, pygame.Surface]" = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def __surface_bytes(surface: pygame.Surface) -> int:
+        return surface.get_width() * surface.get_height() * surface.get_bytesize()
+
+    def render(self,
+               font: pygame.font.Font,
+               text: str,
+               color: Union[tuple, list],
+               antialias: bool = False) -> pygame.Surface:
+        key = (text, font, tuple(color), antialias)
+        surface = self.entries.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return surface
+
+        self.misses += 1
+        surface = font.render(text, antialias, color)
+        self.entries[key] = surface
+        self.bytes += self.__surface_bytes(surface)
+        while len(self.entries) > self.max_entries or \
+                (self.bytes > self.max_bytes and len(self.entries) > 1):
+            _, old = self.entries.popitem(last=False)
+            self.bytes -= self.__surface_bytes(old)
+            self.evictions += 1
+        return surface
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+FONTS = FontRegistry()
+TEXT_CACHE = TextCache()
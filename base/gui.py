@@ -1,7 +1,7 @@
 import pygame
-import os.path
 
 from base.common import Color
+from base.font_cache import FONTS, TEXT_CACHE
 
 from typing import Union, Callable
 
@@ -32,7 +32,7 @@ class TextBox(object):
         self.text_size = text_size
         self.text_color = text_color
 
-        self.font = font or pygame.font.Font("resource/fonts/lunchds.ttf", text_size)
+        self.font = font or FONTS.get(size=text_size)
 
         self.surf = pygame.Surface(self.size)
         self.width = self.surf.get_width()
@@ -55,21 +55,17 @@ class TextBox(object):
     def set_font(self, font_filename: str = ""):
         if font_filename == "":
             return
-        font_path = os.path.join("resource/fonts/", font_filename)
-        self.font = pygame.font.Font(font_path, self.text_size)
+        self.font = FONTS.get(font_filename, self.text_size)
 
     def update_text_pos(self, new_pos: list = None) -> None:
         if new_pos is None:
             new_pos = self.text_pos
-        self.surf.fill([0, 0, 0, 0])
         self.text_pos = new_pos
-        self.surf.fill(self.background_color)
-        self.surf.blit(self.text_render, self.text_pos)
         self.__draw_to_self(self.font)
 
     def __draw_to_self(self, font: pygame.font.Font) -> None:
         self.surf.fill(self.background_color)
-        self.text_render = font.render(self.text, False, self.text_color)
+        self.text_render = TEXT_CACHE.render(font, self.text, self.text_color, False)
         self.surf.blit(self.text_render, self.text_pos)
 
     def __center_text(self) -> None:
@@ -0,0 +1,214 @@
+# profiler.py: Per-frame timing of the main loop. Every frame is split into
+# event handling, update, draw and the wait in the scheduler, and the draw
+# step reports how many blits it made and how much of the screen it pushed
+# to the display. Rolling percentiles of each tell whether a stutter comes
+# from input, logic or rendering. They are shown in an overlay (F3) and can
+# be exported as CSV (one row per frame) or JSON (the summary).
+
+import csv
+import json
+import os
+import time
+from typing import Dict, Iterable, List, Optional
+
+import pygame
+
+from base.font_cache import FONTS
+from base.stats import RollingStats
+
+PROFILE_DIR = "profiles"
+
+PHASES = ("event", "update", "draw", "wait")
+# work is event + update + draw; frame also includes the wait. Times are in
+# milliseconds, dirty is in pixels.
+MS_COLUMNS = PHASES + ("work", "frame")
+COLUMNS = MS_COLUMNS + ("blits", "dirty")
+# How each column is written in the CSV header and shown in the overlay.
+HEADERS = {name: f"{name}_ms" for name in MS_COLUMNS}
+HEADERS.update(blits="blits", dirty="dirty_px")
+OVERLAY_FORMATS = {name: "{:.1f}" for name in MS_COLUMNS}
+OVERLAY_FORMATS.update(blits="{:.0f}", dirty="{:.0f}")
+
+
+class FrameProfiler:
+    """
+    The loop calls begin() at the top of each iteration, lap(phase) after
+    each of event_loop, update and draw, and end() after the scheduler tick.
+    Recording is a handful of perf_counter calls per frame, so it is always
+    on; only the overlay costs anything, and only while it is shown.
+    """
+
+    def __init__(self, size: int = 1024, refresh_ms: int = 250):
+        self.size = size
+        self.refresh_ms = refresh_ms
+        self.stats: Dict[str, RollingStats] = {name: RollingStats(size) for name in COLUMNS}
+        self.frames = 0
+        self.overlay_visible = False
+        self.__start = 0.0
+        self.__mark = 0.0
+        self.__blits = 0
+        self.__dirty = 0
+        self.__overlay: Optional[pygame.Surface] = None
+        self.__overlay_stale = True
+        self.__scheduler = None
+        self.__timer = None
+
+    def begin(self) -> None:
+        self.__start = self.__mark = time.perf_counter()
+        self.__blits = 0
+        self.__dirty = 0
+
+    def lap(self, phase: str) -> None:
+        now = time.perf_counter()
+        self.stats[phase].record((now - self.__mark) * 1000)
+        self.__mark = now
+
+    def end(self) -> None:
+        now = time.perf_counter()
+        wait = (now - self.__mark) * 1000
+        frame = (now - self.__start) * 1000
+        stats = self.stats
+        stats["wait"].record(wait)
+        stats["work"].record(frame - wait)
+        stats["frame"].record(frame)
+        stats["blits"].record(self.__blits)
+        stats["dirty"].record(self.__dirty)
+        self.frames += 1
+
+    def count_draw(self, blits: int, rects: Iterable[pygame.Rect] = ()) -> None:
+        """
+        Called by a draw function with the blits it made and the rects it
+        hands to pygame.display.update.
+        """
+        self.__blits += blits
+        self.__dirty += sum(rect.w * rect.h for rect in rects)
+
+    def clear(self, size: int = None) -> None:
+        """
+        Drops every sample; with a size, also resizes the buffers, e.g. to
+        keep every frame of a replay.
+        """
+        if size is not None:
+            self.size = size
+            self.stats = {name: RollingStats(size) for name in COLUMNS}
+        for stats in self.stats.values():
+            stats.clear()
+        self.frames = 0
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        return {name: stats.summary() for name, stats in self.stats.items()}
+
+    def rows(self) -> List[List[float]]:
+        """
+        The frames still in the buffers, oldest first, one list of COLUMNS
+        values per frame.
+        """
+        columns = [self.stats[name].history() for name in COLUMNS]
+        first = self.frames - len(columns[0])
+        return [[first + i] + list(values) for i, values in enumerate(zip(*columns))]
+
+    def write_csv(self, path: str) -> None:
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["frame_index"] + [HEADERS[name] for name in COLUMNS])
+            counts = [name not in MS_COLUMNS for name in COLUMNS]
+            for row in self.rows():
+                writer.writerow([row[0]] + [int(value) if count else f"{value:.4f}"
+                                            for value, count in zip(row[1:], counts)])
+
+    def write_json(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump({"frames": self.frames, "window": self.size, "columns": self.summary()}, f, indent=2)
+
+    def export(self, path: str = None) -> List[str]:
+        """
+        Writes the profile to path (CSV or JSON by its extension), or both
+        formats to a timestamped file in PROFILE_DIR. Returns the paths.
+        """
+        if path is None:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            base = os.path.join(PROFILE_DIR, time.strftime("frames-%Y%m%d-%H%M%S"))
+            paths = [base + ".csv", base + ".json"]
+        else:
+            paths = [path]
+        for p in paths:
+            if p.endswith(".json"):
+                self.write_json(p)
+            else:
+                self.write_csv(p)
+        return paths
+
+    def report(self) -> str:
+        lines = [f"{self.frames} frames (percentiles over the last {min(self.frames, self.size)})",
+                 f"  {'':<8} {'mean':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}"]
+        for name, s in self.summary().items():
+            lines.append(f"  {name:<8} {s['mean']:8.2f} {s['p50']:8.2f} {s['p95']:8.2f} "
+                         f"{s['p99']:8.2f} {s['max']:8.2f}")
+        return "\n".join(lines)
+
+    # The overlay
+
+    def attach(self, scheduler) -> None:
+        """
+        Called whenever the main loop creates a new scheduler. While the
+        overlay is shown, a timer on the scheduler wakes the loop every
+        refresh_ms so the numbers keep moving when nothing else redraws.
+        """
+        if self.__timer is not None:
+            self.__scheduler.remove_timer(self.__timer)
+            self.__timer = None
+        self.__scheduler = scheduler
+        if self.overlay_visible and scheduler is not None:
+            self.__timer = scheduler.add_timer(self.refresh_ms, self.__refresh)
+
+    def toggle_overlay(self, scheduler) -> bool:
+        self.overlay_visible = not self.overlay_visible
+        self.__overlay_stale = True
+        self.attach(scheduler)
+        return self.overlay_visible
+
+    def __refresh(self) -> None:
+        self.__overlay_stale = True
+
+    def draw_overlay(self, screen: pygame.Surface, force: bool = False) -> Optional[pygame.Rect]:
+        """
+        Blits the overlay to the top right corner if it is shown and either
+        its numbers are due for a refresh or force is set (something under
+        it was redrawn). Returns its rect when drawn.
+        """
+        if not self.overlay_visible:
+            return None
+        if self.__overlay_stale:
+            self.__overlay = self.__render_overlay()
+            self.__overlay_stale = False
+        elif not force:
+            return None
+        rect = self.__overlay.get_rect(topright=(screen.get_width() - 10, 10))
+        screen.blit(self.__overlay, rect)
+        return rect
+
+    def __render_overlay(self) -> pygame.Surface:
+        # Text here changes on every refresh, so it is rendered directly
+        # rather than through TEXT_CACHE, which it would only churn.
+        font = FONTS.get(size=16)
+        line_height = font.get_linesize()
+        header = ("", "p50", "p95", "p99", "max")
+        columns = (0, 64, 134, 204, 274)
+        summary = self.summary()
+        rows = [header]
+        for name in COLUMNS:
+            fmt = OVERLAY_FORMATS[name]
+            rows.append((name,) + tuple(fmt.format(summary[name][key]) for key in header[1:]))
+
+        surface = pygame.Surface((columns[-1] + 60, line_height * (len(rows) + 1) + 8))
+        surface.fill((30, 30, 30))
+        color = (230, 230, 230)
+        surface.blit(font.render(f"frame ms  ({self.frames} frames)", True, color), (6, 4))
+        for i, row in enumerate(rows):
+            y = 4 + line_height * (i + 1)
+            for x, text in zip(columns, row):
+                surface.blit(font.render(text, True, color), (6 + x, y))
+        return surface
+
+
+FRAME_PROFILER = FrameProfiler()
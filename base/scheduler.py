@@ -0,0 +1,98 @@
+# scheduler.py: Frame pacing that sleeps on the event queue while nothing on
+# screen needs to change.
+
+from typing import Callable, List, Optional
+
+import pygame
+
+
+class _Timer:
+    def __init__(self, timer_id: int, interval_ms: int, callback: Optional[Callable], repeat: bool):
+        self.id = timer_id
+        self.interval_ms = interval_ms
+        self.callback = callback
+        self.repeat = repeat
+        self.due = pygame.time.get_ticks() + interval_ms
+
+
+class IdleScheduler:
+    """
+    Drop-in replacement for calling clock.tick(fps) at the end of every loop
+    iteration. While a redraw is pending the loop runs at the frame rate as
+    before. Otherwise tick() blocks in pygame.event.wait until input arrives
+    or the next timer is due, so an idle window uses next to no CPU.
+
+    Set busy while something outside the event queue must be polled (the
+    engine worker); the loop then wakes every poll_ms instead of sleeping
+    until input.
+
+    With fps 0 the loop is not paced at all and never sleeps, as when
+    replaying a recording as fast as possible.
+    """
+
+    def __init__(self, clock: pygame.time.Clock, fps: int, poll_ms: int = 20, max_idle_ms: int = 1000):
+        self.clock = clock
+        self.fps = fps
+        self.poll_ms = poll_ms
+        self.max_idle_ms = max_idle_ms
+        self.redraw_pending = True
+        self.busy = False
+        self.timers: List[_Timer] = []
+        self.__next_timer_id = 1
+
+    def request_redraw(self) -> None:
+        self.redraw_pending = True
+
+    def add_timer(self, interval_ms: int, callback: Callable = None, repeat: bool = True) -> int:
+        """
+        Wakes the loop (and requests a redraw) every interval_ms, e.g. for a
+        chess clock or while an animation runs. Returns an id for
+        remove_timer.
+        """
+        timer = _Timer(self.__next_timer_id, interval_ms, callback, repeat)
+        self.__next_timer_id += 1
+        self.timers.append(timer)
+        return timer.id
+
+    def remove_timer(self, timer_id: int) -> None:
+        self.timers = [t for t in self.timers if t.id != timer_id]
+
+    def tick(self) -> int:
+        """
+        Returns the milliseconds since the previous tick, like Clock.tick.
+        """
+        self.__fire_timers()
+        if self.fps <= 0:
+            self.redraw_pending = False
+            return self.clock.tick()
+        if self.redraw_pending:
+            self.redraw_pending = False
+            return self.clock.tick(self.fps)
+
+        timeout = self.poll_ms if self.busy else self.max_idle_ms
+        now = pygame.time.get_ticks()
+        for timer in self.timers:
+            timeout = min(timeout, max(timer.due - now, 0))
+
+        event = pygame.event.wait(timeout)
+        if event.type != pygame.NOEVENT:
+            # Hand the event back so the system's event_loop sees it.
+            pygame.event.post(event)
+        self.__fire_timers()
+        # No frame limit here: the point of waking is to react right away.
+        return self.clock.tick()
+
+    def __fire_timers(self) -> None:
+        if not self.timers:
+            return
+        now = pygame.time.get_ticks()
+        for timer in list(self.timers):
+            if timer.due > now:
+                continue
+            self.redraw_pending = True
+            if timer.callback is not None:
+                timer.callback()
+            if timer.repeat:
+                timer.due = now + timer.interval_ms
+            else:
+                self.timers.remove(timer)
@@ -0,0 +1,108 @@
+# startup.py: Startup phase timing. Records wall time and memory growth for
+# each named phase of application startup and prints a table once the first
+# frame is on screen.
+
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, List
+
+
+def _rss_kb() -> int:
+    """
+    Current resident set size in KB. SDL and image decoding allocate outside
+    the Python heap, so this is the number that matters for surfaces.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except (ImportError, AttributeError):
+        return 0
+
+
+@dataclass
+class PhaseRecord:
+    name: str
+    seconds: float = 0.0
+    rss_kb: int = 0
+    py_kb: int = 0
+    done: bool = False
+
+
+class StartupTrace:
+    """
+    Call begin/end (or use the phase context manager) around each startup
+    step. When disabled every call is a no-op, so the hooks can stay in place
+    permanently.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.phases: List[PhaseRecord] = []
+        self.__open: Dict[str, tuple] = {}
+        self.reported = False
+        self.start = time.perf_counter()
+        if enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def begin(self, name: str) -> None:
+        if not self.enabled:
+            return
+        py_now = tracemalloc.get_traced_memory()[0]
+        self.__open[name] = (time.perf_counter(), _rss_kb(), py_now)
+
+    def end(self, name: str) -> None:
+        if not self.enabled or name not in self.__open:
+            return
+        started, rss, py = self.__open.pop(name)
+        record = PhaseRecord(name,
+                             time.perf_counter() - started,
+                             _rss_kb() - rss,
+                             (tracemalloc.get_traced_memory()[0] - py) // 1024,
+                             True)
+        self.phases.append(record)
+        if self.reported:
+            # Phases after the first frame (e.g. building the board when a
+            # game starts) are printed as they finish.
+            print(self.format_record(record))
+
+    def is_open(self, name: str) -> bool:
+        return name in self.__open
+
+    @contextmanager
+    def phase(self, name: str):
+        self.begin(name)
+        try:
+            yield
+        finally:
+            self.end(name)
+
+    @staticmethod
+    def format_record(record: PhaseRecord) -> str:
+        return (f"  {record.name:<22} {record.seconds * 1000:9.1f} ms  "
+                f"{record.rss_kb:+9d} KB rss  {record.py_kb:+9d} KB python")
+
+    def report(self) -> str:
+        lines = ["startup trace:"]
+        lines += [self.format_record(r) for r in self.phases]
+        lines.append(f"  {'time to first frame':<22} {(time.perf_counter() - self.start) * 1000:9.1f} ms  "
+                     f"{_rss_kb():9d} KB rss total")
+        return "\n".join(lines)
+
+    def finish(self) -> None:
+        """
+        Prints the report (once) and stops tracing Python allocations, which
+        would otherwise slow down the rest of the run.
+        """
+        if not self.enabled or self.reported:
+            return
+        print(self.report())
+        self.reported = True
+        tracemalloc.stop()
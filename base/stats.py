@@ -0,0 +1,69 @@
+# stats.py: Rolling latency statistics. Keeps the most recent samples in a
+# fixed ring buffer, so recording is O(1) and memory stays constant however
+# long the program runs.
+
+import math
+from array import array
+from typing import Dict, List
+
+
+def percentile(ordered: List[float], p: float) -> float:
+    """
+    The p-th percentile (0-100) of an already sorted list, by nearest rank.
+    """
+    if not ordered:
+        return 0.0
+    rank = max(0, min(len(ordered) - 1, math.ceil(p / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+class RollingStats:
+    def __init__(self, size: int = 4096):
+        self.samples = array("d", bytes(8 * size))
+        self.size = size
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, value: float) -> None:
+        self.samples[self.count % self.size] = value
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def recent(self) -> List[float]:
+        return list(self.samples[:min(self.count, self.size)])
+
+    def history(self) -> List[float]:
+        """
+        The samples still in the buffer, oldest first.
+        """
+        if self.count <= self.size:
+            return self.recent()
+        split = self.count % self.size
+        return list(self.samples[split:]) + list(self.samples[:split])
+
+    def clear(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def summary(self) -> Dict[str, float]:
+        """
+        Percentiles over the samples still in the buffer; count, mean and max
+        cover everything recorded since the last clear().
+        """
+        ordered = sorted(self.recent())
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "p50": percentile(ordered, 50),
+            "p95": percentile(ordered, 95),
+            "p99": percentile(ordered, 99),
+            "max": self.max,
+        }
@@ -3,6 +3,7 @@ import pygame
 from dataclasses import dataclass
 
 from .state_classes import MenuState, GameState
+from .scheduler import IdleScheduler
 
 
 @dataclass
@@ -11,6 +12,7 @@ class Window:
     screen_width: int = 0
     screen_height: int = 0
     clock: pygame.time.Clock = None
+    scheduler: IdleScheduler = None
     running: bool = True
     ms: float = 0
     dt: float = 0
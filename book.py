@@ -0,0 +1,52 @@
+# book.py: Build and inspect Polyglot opening books.
+#
+#   python book.py build games.pgn resource/books/book.bin --plies 16
+#   python book.py probe resource/books/book.bin --moves e2e4 e7e5
+
+import argparse
+import sys
+
+from chess.engine.book import OpeningBook, build_book
+from chess.rules.pgn import read_pgn
+from chess.rules.position import Position, START_FEN
+from chess.rules.san import to_san
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Build and inspect Polyglot opening books.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="make a book from the openings of a PGN file")
+    build.add_argument("pgn")
+    build.add_argument("book")
+    build.add_argument("--plies", type=int, default=16, help="how many plies of each game to include")
+
+    probe = commands.add_parser("probe", help="list the book moves of a position")
+    probe.add_argument("book")
+    probe.add_argument("--fen", default=START_FEN)
+    probe.add_argument("--moves", nargs="*", default=[], help="UCI moves played from the FEN")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        count = build_book(read_pgn(args.pgn), args.book, args.plies)
+        print(f"Wrote {count} entries to {args.book}")
+        return 0
+
+    position = Position(args.fen)
+    for text in args.moves:
+        move = position.parse_uci(text)
+        if move is None:
+            print(f"Illegal move: {text}")
+            return 1
+        position.make_move(move)
+    with OpeningBook(args.book) as book:
+        moves = book.moves(position)
+        total = sum(weight for _, weight in moves) or 1
+        print(f"key {position.hash:016x}: {len(moves)} book moves ({len(book)} entries in the book)")
+        for move, weight in moves:
+            print(f"  {to_san(position, move):<8} {weight:6d}  {weight / total:6.1%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,4 +2,18 @@
 
 class ChessException(Exception):
     def __init__(self, *args):
-        super().__init__(args)
\ No newline at end of file
+        super().__init__(args)
+
+    @property
+    def message(self) -> str:
+        """
+        The arguments joined by spaces, without the tuple they are wrapped in
+        (twice over once the exception has been pickled and rebuilt).
+        """
+        args = self.args
+        while len(args) == 1 and isinstance(args[0], tuple):
+            args = args[0]
+        return " ".join(str(arg) for arg in args)
+
+    def __str__(self) -> str:
+        return self.message
@@ -0,0 +1,219 @@
+# analysis.py: Batch analysis of PGN games on a pool of worker processes.
+#
+# Every position of a game is searched once. The score before and after a
+# move gives how much the move lost, which becomes an eval comment and, past
+# the thresholds below, a "?!", "?" or "??" mark. Games are handed to the
+# pool in chunks while the input is still being read, and results come back
+# in input order.
+
+import multiprocessing
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, Optional
+
+from chess.chess_exception import ChessException
+from chess.engine.search import Searcher, SearchLimits, MATE_BOUND, MATE
+from chess.engine.transposition import TranspositionTable
+from chess.rules.pgn import PgnGame
+from chess.rules.position import WHITE
+from chess.rules.san import to_san
+
+# Centipawns lost by a move before it is marked.
+INACCURACY = 50
+MISTAKE = 100
+BLUNDER = 300
+
+# Scores are capped here when computing the loss of a move, so a move that
+# turns mate in 3 into mate in 5 does not count as a blunder.
+_LOSS_CAP = 1000
+
+
+@dataclass
+class AnalysisOptions:
+    depth: int = 6
+    movetime: Optional[float] = None
+    hash_mb: int = 16
+
+    def limits(self) -> SearchLimits:
+        return SearchLimits(depth=self.depth, movetime=self.movetime)
+
+
+@dataclass
+class GameAnalysis:
+    index: int
+    game: PgnGame
+    plies: int = 0
+    nodes: int = 0
+    seconds: float = 0.0
+    worker: int = 0
+
+
+@dataclass
+class BatchStats:
+    games: int = 0
+    plies: int = 0
+    nodes: int = 0
+    wall: float = 0.0
+    # Seconds spent analyzing and games done, by worker pid.
+    busy: Dict[int, float] = field(default_factory=dict)
+    worker_games: Dict[int, int] = field(default_factory=dict)
+
+    def add(self, result: GameAnalysis) -> None:
+        self.games += 1
+        self.plies += result.plies
+        self.nodes += result.nodes
+        self.busy[result.worker] = self.busy.get(result.worker, 0.0) + result.seconds
+        self.worker_games[result.worker] = self.worker_games.get(result.worker, 0) + 1
+
+    def report(self) -> str:
+        wall = self.wall or 1e-9
+        lines = [f"{self.games} games, {self.plies} positions, {self.nodes:,} nodes in {self.wall:.1f}s",
+                 f"{self.games / wall:.2f} games/s, {self.plies / wall:.1f} positions/s, "
+                 f"{self.nodes / wall:,.0f} nodes/s"]
+        for pid in sorted(self.busy):
+            lines.append(f"  worker {pid:>7}: {self.worker_games[pid]:5d} games  "
+                         f"busy {self.busy[pid]:7.1f}s  utilization {self.busy[pid] / wall:6.1%}")
+        return "\n".join(lines)
+
+
+def _capped(score: int) -> int:
+    return max(-_LOSS_CAP, min(_LOSS_CAP, score))
+
+
+def format_eval(score: int, turn: int) -> str:
+    """
+    Formats a score of the side to move as a "[%eval ...]" comment command,
+    from white's point of view, in pawns or as "#n" for a mate.
+    """
+    if turn != WHITE:
+        score = -score
+    if score > MATE_BOUND:
+        return f"[%eval #{(MATE - score + 1) // 2}]"
+    if score < -MATE_BOUND:
+        return f"[%eval #-{(MATE + score) // 2}]"
+    return f"[%eval {score / 100:.2f}]"
+
+
+def move_mark(loss: int) -> str:
+    if loss >= BLUNDER:
+        return "??"
+    if loss >= MISTAKE:
+        return "?"
+    if loss >= INACCURACY:
+        return "?!"
+    return ""
+
+
+def analyze_game(game: PgnGame, searcher: Searcher, limits: SearchLimits) -> GameAnalysis:
+    """
+    Returns a copy of the game with an eval comment after every move and
+    marks on the moves that lost ground. Existing comments are kept after
+    the eval.
+    """
+    start = time.perf_counter()
+    nodes = 0
+    position = game.start_position()
+    scores = []
+    best = []
+    for ply in range(len(game.moves) + 1):
+        info = searcher.search(position, limits)
+        nodes += info.nodes
+        scores.append(info.score)
+        best.append(to_san(position, info.best_move) if info.best_move else "")
+        if ply < len(game.moves):
+            position.make_move(game.moves[ply])
+
+    annotated = PgnGame(dict(game.headers), list(game.moves), result=game.result)
+    annotated.headers["Annotator"] = f"ChessPygame depth {limits.depth}" if limits.movetime is None \
+        else f"ChessPygame {limits.movetime:g}s/move"
+    if 0 in game.comments:
+        annotated.comments[0] = game.comments[0]
+
+    position = game.start_position()
+    for ply, move in enumerate(game.moves, 1):
+        played = to_san(position, move)
+        position.make_move(move)
+        # The mover's score before the move against the same side's score
+        # after it (the opponent's score negated).
+        loss = _capped(scores[ply - 1]) + _capped(scores[ply])
+        text = format_eval(scores[ply], position.turn)
+        mark = move_mark(loss)
+        if mark:
+            annotated.marks[ply] = mark
+            if best[ply - 1] and best[ply - 1] != played:
+                text += f" {best[ply - 1]} was best."
+        if ply in game.comments:
+            text += " " + game.comments[ply]
+        annotated.comments[ply] = text
+
+    return GameAnalysis(0, annotated, len(game.moves) + 1, nodes,
+                        time.perf_counter() - start, os.getpid())
+
+
+# --------------------------------------------------------------------- #
+# Worker pool
+# --------------------------------------------------------------------- #
+_searcher: Optional[Searcher] = None
+_limits: Optional[SearchLimits] = None
+
+
+def _init_worker(options: AnalysisOptions) -> None:
+    global _searcher, _limits
+    _searcher = Searcher(TranspositionTable(options.hash_mb))
+    _limits = options.limits()
+
+
+def _analyze_task(item) -> GameAnalysis:
+    index, game = item
+    try:
+        result = analyze_game(game, _searcher, _limits)
+    except ChessException:
+        # A game that cannot be set up (e.g. a bad FEN tag) is passed
+        # through as it is.
+        result = GameAnalysis(0, game, worker=os.getpid())
+    result.index = index
+    return result
+
+
+def _bounded(games: Iterable[PgnGame], slots: threading.Semaphore) -> Iterator[tuple]:
+    # The pool's feeder thread reads its input as fast as it can; waiting on
+    # a slot per game keeps only a bounded number of games in flight.
+    for index, game in enumerate(games):
+        slots.acquire()
+        yield index, game
+
+
+def analyze_games(games: Iterable[PgnGame],
+                  options: AnalysisOptions = None,
+                  workers: int = None,
+                  chunksize: int = 1,
+                  stats: BatchStats = None) -> Iterator[GameAnalysis]:
+    """
+    Analyzes games (any iterable, typically read_pgn) on a process pool and
+    yields the results in input order. workers=0 analyzes in this process.
+    Totals and per-worker busy time are added to stats if given.
+    """
+    options = options or AnalysisOptions()
+    stats = stats if stats is not None else BatchStats()
+    start = time.perf_counter()
+
+    if workers == 0:
+        _init_worker(options)
+        for item in enumerate(games):
+            result = _analyze_task(item)
+            stats.add(result)
+            stats.wall = time.perf_counter() - start
+            yield result
+        return
+
+    workers = workers or os.cpu_count() or 1
+    slots = threading.Semaphore(max(4 * workers * chunksize, 2 * chunksize))
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(workers, _init_worker, (options,)) as pool:
+        for result in pool.imap(_analyze_task, _bounded(games, slots), chunksize):
+            slots.release()
+            stats.add(result)
+            stats.wall = time.perf_counter() - start
+            yield result
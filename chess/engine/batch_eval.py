@@ -0,0 +1,333 @@
+# batch_eval.py: Vectorized evaluation of many positions at once.
+#
+# Positions are stacked into a PositionBatch: one row of 13 piece bitboards
+# (indexed by piece code, like Position.bb) and the side to move per
+# position. Every term is then computed for all rows with numpy:
+#
+#   material + piece-square tables, tapered by game phase exactly as
+#   evaluate() does, by expanding the bitboards into bits and taking a
+#   matrix product with the signed tables;
+#
+#   pawn structure and king shelter, the same terms as evaluate(), from
+#   set-wise file masks and front-span fills instead of per pawn loops;
+#
+#   attack maps per side (equal to Position.attack_map), with slider
+#   attacks from Kogge-Stone occluded fills over uint64 columns;
+#
+#   mobility: squares each knight, bishop, rook and queen attacks that are
+#   not occupied by its own side, counted per piece by peeling one piece
+#   at a time off every row;
+#
+#   king pressure: squares next to the enemy king that a side attacks.
+#
+# The scores are from the side to move's point of view, like evaluate(),
+# and equal it when the mobility and king pressure weights are zero.
+
+from dataclasses import dataclass
+from typing import Iterable
+
+from chess.chess_exception import ChessException
+from chess.engine.evaluate import (DOUBLED, ISOLATED, PASSED_MG, PASSED_EG, SHELTER, FILES,
+                                   ADJACENT_FILES, SHELTER_MASKS)
+from chess.rules.psqt import MG_SCORES, EG_SCORES, PIECE_PHASE, MAX_PHASE
+from chess.rules import bitboard
+from chess.rules.position import Position, WHITE, BLACK, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Centipawns per square a piece can move to, by kind.
+MOBILITY_WEIGHTS = [0, 0, 4, 5, 2, 1, 0]
+# Centipawns per attacked square next to the enemy king.
+KING_PRESSURE_WEIGHT = 3
+
+# Rows evaluated at a time; bounds the (rows, 768) temporaries.
+CHUNK = 1 << 13
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise ChessException("Batch evaluation needs numpy (pip install numpy)")
+
+
+@dataclass
+class PositionBatch:
+    bb: "np.ndarray"    # (N, 13) uint64, piece bitboards by piece code
+    turn: "np.ndarray"  # (N,) int8, WHITE or BLACK
+
+    def __len__(self) -> int:
+        return self.bb.shape[0]
+
+    @classmethod
+    def from_positions(cls, positions: Iterable[Position]) -> "PositionBatch":
+        """
+        Stacks Position objects (e.g. ChessBoard.position, or positions
+        replayed from PGN).
+        """
+        _require_numpy()
+        bbs = []
+        turns = []
+        for position in positions:
+            bbs.append(position.bb)
+            turns.append(position.turn)
+        bb = np.array(bbs, dtype=np.uint64).reshape(-1, 13)
+        return cls(bb, np.array(turns, dtype=np.int8))
+
+    @classmethod
+    def from_fens(cls, fens: Iterable[str]) -> "PositionBatch":
+        """
+        Stacks positions given as FEN strings, reusing a single Position to
+        parse them.
+        """
+        _require_numpy()
+        position = Position()
+        rows = []
+        turns = []
+        for fen in fens:
+            position.set_fen(fen)
+            rows.append(list(position.bb))
+            turns.append(position.turn)
+        return cls(np.array(rows, dtype=np.uint64).reshape(-1, 13), np.array(turns, dtype=np.int8))
+
+    def occupancy(self, color: int) -> "np.ndarray":
+        o = 6 * color
+        return np.bitwise_or.reduce(self.bb[:, 1 + o:7 + o], axis=1)
+
+    def slice(self, lo: int, hi: int) -> "PositionBatch":
+        return PositionBatch(self.bb[lo:hi], self.turn[lo:hi])
+
+
+@dataclass
+class BatchTerms:
+    """
+    Every term of a batch evaluation, per position. Scores are centipawns
+    from white's point of view; attacks are (N, 2) bitboards by color.
+    """
+    mg: "np.ndarray"
+    eg: "np.ndarray"
+    phase: "np.ndarray"
+    pawn_mg: "np.ndarray"
+    pawn_eg: "np.ndarray"
+    mobility: "np.ndarray"
+    king_pressure: "np.ndarray"
+    attacks: "np.ndarray"
+
+    def white_score(self) -> "np.ndarray":
+        phase = np.minimum(self.phase, MAX_PHASE)
+        mg = self.mg + self.pawn_mg
+        eg = self.eg + self.pawn_eg
+        tapered = (mg * phase + eg * (MAX_PHASE - phase)) // MAX_PHASE
+        return tapered + self.mobility + self.king_pressure
+
+
+# --------------------------------------------------------------------- #
+# Bit twiddling on uint64 columns
+# --------------------------------------------------------------------- #
+_U = None
+
+
+class _Constants:
+    def __init__(self):
+        u = np.uint64
+        self.zero = u(0)
+        self.one = u(1)
+        self.not_a = u(bitboard.NOT_FILE_A)
+        self.not_h = u(bitboard.NOT_FILE_H)
+        self.not_ab = u(bitboard.NOT_FILE_A & (bitboard.NOT_FILE_A << 1) & bitboard.FULL)
+        self.not_gh = u(bitboard.NOT_FILE_H & (bitboard.NOT_FILE_H >> 1))
+        self.king_attacks = np.array(bitboard.KING_ATTACKS, dtype=np.uint64)
+        self.files = [u(f) for f in FILES]
+        self.adjacent_files = [u(f) for f in ADJACENT_FILES]
+        self.ranks = [u(0xFF << (8 * r)) for r in range(8)]
+        self.shelter = [np.array(masks, dtype=np.uint64) for masks in SHELTER_MASKS]
+        # (shift, mask) per direction: positive shifts go left (north/east).
+        self.rook_dirs = [(8, None), (-8, None), (1, self.not_a), (-1, self.not_h)]
+        self.bishop_dirs = [(9, self.not_a), (7, self.not_h), (-7, self.not_a), (-9, self.not_h)]
+        # (768, 3): middlegame, endgame and phase weight of every piece
+        # code (1-12) on every square.
+        self.weights = np.stack([np.array(MG_SCORES[1:]).reshape(-1),
+                                 np.array(EG_SCORES[1:]).reshape(-1),
+                                 np.repeat(PIECE_PHASE[1:], 64)], axis=1).astype(np.float32)
+
+
+def _constants() -> _Constants:
+    global _U
+    if _U is None:
+        _U = _Constants()
+    return _U
+
+
+def _shift(bb, n: int):
+    if n >= 0:
+        return bb << np.uint64(n)
+    return bb >> np.uint64(-n)
+
+
+if np is not None and hasattr(np, "bitwise_count"):
+    def popcount(bb) -> "np.ndarray":
+        return np.bitwise_count(bb).astype(np.int64)
+else:
+    def popcount(bb) -> "np.ndarray":
+        bits = np.unpackbits(np.ascontiguousarray(bb).view(np.uint8).reshape(bb.shape + (8,)), axis=-1)
+        return bits.sum(axis=-1, dtype=np.int64)
+
+
+def _slide(gen, empty, directions):
+    """
+    Squares attacked by sliders on gen along the given directions, stopping
+    at (and including) the first occupied square.
+    """
+    attacks = np.zeros_like(gen)
+    for step, mask in directions:
+        g = gen
+        pro = empty if mask is None else empty & mask
+        g = g | (pro & _shift(g, step))
+        pro = pro & _shift(pro, step)
+        g = g | (pro & _shift(g, 2 * step))
+        pro = pro & _shift(pro, 2 * step)
+        g = g | (pro & _shift(g, 4 * step))
+        reach = _shift(g, step)
+        attacks |= reach if mask is None else reach & mask
+    return attacks
+
+
+def _knight_attacks(c: _Constants, knights):
+    return ((knights << np.uint64(17)) & c.not_a) | ((knights << np.uint64(15)) & c.not_h) | \
+           ((knights << np.uint64(10)) & c.not_ab) | ((knights << np.uint64(6)) & c.not_gh) | \
+           ((knights >> np.uint64(17)) & c.not_h) | ((knights >> np.uint64(15)) & c.not_a) | \
+           ((knights >> np.uint64(10)) & c.not_gh) | ((knights >> np.uint64(6)) & c.not_ab)
+
+
+def _piece_attacks(c: _Constants, kind: int, pieces, empty):
+    if kind == KNIGHT:
+        return _knight_attacks(c, pieces)
+    if kind == BISHOP:
+        return _slide(pieces, empty, c.bishop_dirs)
+    if kind == ROOK:
+        return _slide(pieces, empty, c.rook_dirs)
+    return _slide(pieces, empty, c.rook_dirs + c.bishop_dirs)
+
+
+def _king_square(kings):
+    # A lone bit's index: count the bits below it.
+    return popcount(kings - np.uint64(1))
+
+
+def _south_fill(bb):
+    bb = bb | (bb >> np.uint64(8))
+    bb = bb | (bb >> np.uint64(16))
+    return bb | (bb >> np.uint64(32))
+
+
+def _north_fill(bb):
+    bb = bb | (bb << np.uint64(8))
+    bb = bb | (bb << np.uint64(16))
+    return bb | (bb << np.uint64(32))
+
+
+def _pawn_terms(c: _Constants, white, black, kings):
+    """
+    Pawn structure and king shelter (middlegame, endgame) from white's
+    point of view, as evaluate.pawn_structure and evaluate() compute them.
+    """
+    mg = np.zeros(white.shape, dtype=np.int64)
+    eg = np.zeros(white.shape, dtype=np.int64)
+    # Squares with an enemy pawn ahead on the same file; spread to the
+    # neighbouring files below, they are where a pawn is not passed.
+    white_blocked = _south_fill(black >> np.uint64(8))
+    black_blocked = _north_fill(white << np.uint64(8))
+    for color, pawns, blocked, sign in ((WHITE, white, white_blocked, 1),
+                                        (BLACK, black, black_blocked, -1)):
+        blocked = blocked | ((blocked << np.uint64(1)) & c.not_a) | ((blocked >> np.uint64(1)) & c.not_h)
+        for f in range(8):
+            count = popcount(pawns & c.files[f])
+            extra = np.maximum(count - 1, 0)
+            isolated = np.where((pawns & c.adjacent_files[f]) == 0, count, 0)
+            mg += sign * (DOUBLED[0] * extra + ISOLATED[0] * isolated)
+            eg += sign * (DOUBLED[1] * extra + ISOLATED[1] * isolated)
+        passed = pawns & ~blocked
+        for r in range(1, 7):
+            on_rank = popcount(passed & c.ranks[r if color == WHITE else 7 - r])
+            mg += sign * PASSED_MG[r] * on_rank
+            eg += sign * PASSED_EG[r] * on_rank
+        shelter = popcount(c.shelter[color][kings[color]] & pawns)
+        mg += sign * SHELTER * shelter
+    return mg, eg
+
+
+def _terms(batch: PositionBatch) -> BatchTerms:
+    c = _constants()
+    bb = batch.bb
+    n = len(batch)
+    # All twelve bitboards as 768 bits per row, piece-major like the
+    # weights, so the tables are one float matrix product. The sums are
+    # small integers, which float32 holds exactly.
+    bits = np.unpackbits(np.ascontiguousarray(bb[:, 1:]).view(np.uint8).reshape(n, 96),
+                         axis=1, bitorder="little")
+    placed = np.rint(bits.astype(np.float32) @ c.weights).astype(np.int64)
+    mg, eg, phase = placed[:, 0], placed[:, 1], placed[:, 2]
+    kings = [_king_square(bb[:, KING]) & 63, _king_square(bb[:, KING + 6]) & 63]
+    pawn_mg, pawn_eg = _pawn_terms(c, bb[:, PAWN], bb[:, PAWN + 6], kings)
+
+    occ = [batch.occupancy(WHITE), batch.occupancy(BLACK)]
+    empty = ~(occ[0] | occ[1])
+    attacks = np.zeros((n, 2), dtype=np.uint64)
+    mobility = np.zeros(n, dtype=np.int64)
+    for color in (WHITE, BLACK):
+        o = 6 * color
+        sign = 1 if color == WHITE else -1
+        pawns = bb[:, PAWN + o]
+        if color == WHITE:
+            seen = ((pawns << np.uint64(7)) & c.not_h) | ((pawns << np.uint64(9)) & c.not_a)
+        else:
+            seen = ((pawns >> np.uint64(9)) & c.not_h) | ((pawns >> np.uint64(7)) & c.not_a)
+        seen = seen | c.king_attacks[kings[color]]
+        target = ~occ[color]
+        for kind in (KNIGHT, BISHOP, ROOK, QUEEN):
+            rest = bb[:, kind + o].copy()
+            # One piece per row per round, so every piece's moves are counted
+            # separately; rows with fewer pieces simply run out.
+            while rest.any():
+                piece = rest & (~rest + c.one)
+                reach = _piece_attacks(c, kind, piece, empty)
+                seen |= reach
+                mobility += sign * MOBILITY_WEIGHTS[kind] * popcount(reach & target)
+                rest ^= piece
+        attacks[:, color] = seen
+
+    pressure = np.zeros(n, dtype=np.int64)
+    for color in (WHITE, BLACK):
+        zone = c.king_attacks[kings[color ^ 1]]
+        sign = 1 if color == WHITE else -1
+        pressure += sign * KING_PRESSURE_WEIGHT * popcount(attacks[:, color] & zone)
+
+    return BatchTerms(mg, eg, phase, pawn_mg, pawn_eg, mobility, pressure, attacks)
+
+
+def evaluate_terms(batch: PositionBatch) -> BatchTerms:
+    """
+    Computes every evaluation term of the batch, in chunks.
+    """
+    _require_numpy()
+    if len(batch) <= CHUNK:
+        return _terms(batch)
+    parts = [_terms(batch.slice(lo, lo + CHUNK)) for lo in range(0, len(batch), CHUNK)]
+    return BatchTerms(*(np.concatenate([getattr(p, name) for p in parts])
+                        for name in ("mg", "eg", "phase", "pawn_mg", "pawn_eg", "mobility",
+                                     "king_pressure", "attacks")))
+
+
+def evaluate_batch(batch: PositionBatch) -> "np.ndarray":
+    """
+    Returns the score of every position in centipawns, from the side to
+    move's point of view.
+    """
+    terms = evaluate_terms(batch)
+    score = terms.white_score()
+    return np.where(batch.turn == WHITE, score, -score)
+
+
+def evaluate_positions(positions: Iterable[Position]) -> "np.ndarray":
+    return evaluate_batch(PositionBatch.from_positions(positions))
@@ -0,0 +1,194 @@
+# book.py: Polyglot opening books.
+#
+# A Polyglot book is a file of 16 byte big-endian entries (key, move, weight,
+# learn) sorted by key. The file is memory-mapped and searched with a binary
+# search over the mapping, so opening a book costs nothing up front and every
+# process using the same book shares the operating system's page cache for it
+# instead of holding a private copy. The key is Position.hash (see
+# zobrist.py).
+
+import mmap
+import os
+import random
+import struct
+from typing import Dict, List, Optional, Tuple
+
+from chess.chess_exception import ChessException
+from chess.rules.move import KING_CASTLE, QUEEN_CASTLE, move_from, move_to, promotion_kind
+from chess.rules.position import Position, PIECE_KIND, KING
+
+ENTRY_SIZE = 16
+_ENTRY = struct.Struct(">QHHI")
+_KEY = struct.Struct(">Q")
+
+
+def decode_move(position: Position, raw: int, legal: List[int] = None) -> Optional[int]:
+    """
+    Returns the legal move a Polyglot move word stands for, or None. Polyglot
+    writes castling as the king capturing its own rook (e1h1).
+    """
+    to = raw & 63
+    frm = (raw >> 6) & 63
+    promotion = (raw >> 12) & 7
+    # 1-4 are knight to queen, which is KNIGHT..QUEEN - 1 in our kinds.
+    promotion = promotion + 1 if promotion else 0
+    castle = 0
+    if PIECE_KIND[position.board[frm]] == KING and abs((to & 7) - (frm & 7)) > 1:
+        castle = KING_CASTLE if to > frm else QUEEN_CASTLE
+    if legal is None:
+        legal = position.legal_moves()
+    for move in legal:
+        if castle:
+            if move >> 12 == castle and move_from(move) == frm:
+                return move
+        elif move_from(move) == frm and move_to(move) == to and promotion_kind(move) == promotion:
+            return move
+    return None
+
+
+class OpeningBook:
+    def __init__(self, path: str):
+        self.path = path
+        self.__file = open(path, "rb")
+        size = os.fstat(self.__file.fileno()).st_size
+        if size % ENTRY_SIZE:
+            self.__file.close()
+            raise ChessException(f"Not a Polyglot book (size is not a multiple of 16): {path}")
+        self.count = size // ENTRY_SIZE
+        # mmap refuses empty files; an empty book just has no entries.
+        self.data = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __enter__(self) -> "OpeningBook":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.__file.close()
+
+    def __first_index(self, key: int) -> int:
+        # Lower bound: the first entry whose key is not below key.
+        data = self.data
+        lo, hi = 0, self.count
+        unpack = _KEY.unpack_from
+        while lo < hi:
+            mid = (lo + hi) >> 1
+            if unpack(data, mid * ENTRY_SIZE)[0] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def raw_entries(self, key: int) -> List[Tuple[int, int, int]]:
+        """
+        Returns (move word, weight, learn) for every entry with the key.
+        """
+        entries = []
+        index = self.__first_index(key)
+        while index < self.count:
+            entry_key, raw, weight, learn = _ENTRY.unpack_from(self.data, index * ENTRY_SIZE)
+            if entry_key != key:
+                break
+            entries.append((raw, weight, learn))
+            index += 1
+        return entries
+
+    def moves(self, position: Position) -> List[Tuple[int, int]]:
+        """
+        Returns the book's legal moves for the position with their weights,
+        heaviest first.
+        """
+        entries = self.raw_entries(position.hash)
+        if not entries:
+            return []
+        legal = position.legal_moves()
+        weights: Dict[int, int] = {}
+        for raw, weight, _ in entries:
+            move = decode_move(position, raw, legal)
+            if move is not None:
+                weights[move] = weights.get(move, 0) + weight
+        return sorted(weights.items(), key=lambda item: -item[1])
+
+    def pick(self, position: Position, rng: random.Random = None, best: bool = False) -> Optional[int]:
+        """
+        Chooses a book move for the position, at random in proportion to the
+        weights (or the heaviest with best=True). None when out of book.
+        """
+        moves = self.moves(position)
+        if not moves:
+            return None
+        if best:
+            return moves[0][0]
+        total = sum(weight for _, weight in moves)
+        if total == 0:
+            return (rng or random).choice(moves)[0]
+        roll = (rng or random).randrange(total)
+        for move, weight in moves:
+            roll -= weight
+            if roll < 0:
+                return move
+        return moves[-1][0]
+
+
+# One mapping per book file and process.
+_books: Dict[str, Optional[OpeningBook]] = {}
+
+
+def open_book(path: str) -> Optional[OpeningBook]:
+    """
+    Returns the (shared) book at path, or None if there is no file there.
+    Raises ChessException if the file is not a readable Polyglot book; the
+    caller decides how to report it (UCI must not print to stdout).
+    """
+    if path not in _books:
+        try:
+            _books[path] = OpeningBook(path)
+        except FileNotFoundError:
+            _books[path] = None
+        except (OSError, ChessException) as e:
+            raise ChessException(f"No opening book: {e}")
+    return _books[path]
+
+
+def encode_move(move: int) -> int:
+    """
+    The Polyglot move word of a move (castling as king takes rook).
+    """
+    frm = move_from(move)
+    to = move_to(move)
+    flag = move >> 12
+    if flag == KING_CASTLE:
+        to = frm + 3
+    elif flag == QUEEN_CASTLE:
+        to = frm - 4
+    promotion = promotion_kind(move)
+    return to | (frm << 6) | ((promotion - 1 if promotion else 0) << 12)
+
+
+def build_book(games, path: str, max_ply: int = 16) -> int:
+    """
+    Writes a Polyglot book of the first max_ply moves of the games (any
+    iterable of PgnGame, e.g. read_pgn). A move's weight is how often it was
+    played, capped at 65535. Returns the number of entries written.
+    """
+    counts: Dict[Tuple[int, int], int] = {}
+    for game in games:
+        try:
+            position = game.start_position()
+        except ChessException:
+            continue
+        for move in game.moves[:max_ply]:
+            entry = (position.hash, encode_move(move))
+            counts[entry] = counts.get(entry, 0) + 1
+            position.make_move(move)
+
+    with open(path, "wb") as f:
+        for (key, raw), count in sorted(counts.items()):
+            f.write(_ENTRY.pack(key, raw, min(count, 0xFFFF), 0))
+    return len(counts)
@@ -0,0 +1,134 @@
+# elo.py: Match statistics from win/draw/loss counts: the Elo difference
+# with its 95% interval, the likelihood of superiority, and a sequential
+# probability ratio test (SPRT) that says when a match has played enough
+# games to accept or reject a change.
+#
+# The SPRT uses the usual normal approximation to the generalized SPRT on
+# the per-game score, with logistic Elo bounds:
+#
+#   LLR = N * (s1 - s0) * (2 * s - s0 - s1) / (2 * var)
+#
+# where s is the mean score, var its per-game variance and s0, s1 the
+# expected scores at elo0 and elo1.
+
+import math
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+# Two-sided 95% quantile of the normal distribution.
+_Z95 = 1.959964
+
+
+def elo_to_score(elo: float) -> float:
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+def score_to_elo(score: float) -> float:
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / score - 1)
+
+
+@dataclass
+class MatchScore:
+    """
+    Results from the first engine's point of view.
+    """
+    wins: int = 0
+    draws: int = 0
+    losses: int = 0
+
+    @property
+    def games(self) -> int:
+        return self.wins + self.draws + self.losses
+
+    @property
+    def score(self) -> float:
+        return (self.wins + self.draws / 2) / self.games if self.games else 0.5
+
+    def add(self, points: float) -> None:
+        if points == 1:
+            self.wins += 1
+        elif points == 0:
+            self.losses += 1
+        else:
+            self.draws += 1
+
+    def variance(self) -> float:
+        """
+        Per-game variance of the score.
+        """
+        n = self.games
+        if not n:
+            return 0.0
+        s = self.score
+        return (self.wins * (1 - s) ** 2 + self.draws * (0.5 - s) ** 2 + self.losses * s ** 2) / n
+
+    def elo(self) -> Tuple[float, float]:
+        """
+        Returns (elo, margin): the Elo difference and the half width of its
+        95% confidence interval.
+        """
+        n = self.games
+        if not n:
+            return 0.0, 0.0
+        s = self.score
+        deviation = math.sqrt(self.variance() / n)
+        low = score_to_elo(s - _Z95 * deviation)
+        high = score_to_elo(s + _Z95 * deviation)
+        return score_to_elo(s), (high - low) / 2
+
+    def los(self) -> float:
+        """
+        Likelihood of superiority: the chance that the first engine is the
+        stronger one, from wins and losses (draws say nothing either way).
+        """
+        decisive = self.wins + self.losses
+        if not decisive:
+            return 0.5
+        return 0.5 * (1 + math.erf((self.wins - self.losses) / math.sqrt(2 * decisive)))
+
+    def __str__(self) -> str:
+        elo, margin = self.elo()
+        return (f"+{self.wins} ={self.draws} -{self.losses}  score {self.score:.1%}  "
+                f"Elo {elo:+.1f} +/- {margin:.1f}  LOS {self.los():.1%}")
+
+
+@dataclass
+class Sprt:
+    elo0: float = 0.0
+    elo1: float = 5.0
+    alpha: float = 0.05
+    beta: float = 0.05
+
+    @property
+    def bounds(self) -> Tuple[float, float]:
+        return math.log(self.beta / (1 - self.alpha)), math.log((1 - self.beta) / self.alpha)
+
+    def llr(self, match: MatchScore) -> float:
+        n = match.games
+        var = match.variance()
+        if not n or var <= 0:
+            return 0.0
+        s0 = elo_to_score(self.elo0)
+        s1 = elo_to_score(self.elo1)
+        return n * (s1 - s0) * (2 * match.score - s0 - s1) / (2 * var)
+
+    def verdict(self, match: MatchScore) -> Optional[str]:
+        """
+        "H1" once the change is accepted (at least elo1 better), "H0" once
+        it is rejected (no better than elo0), None while undecided.
+        """
+        low, high = self.bounds
+        llr = self.llr(match)
+        if llr >= high:
+            return "H1"
+        if llr <= low:
+            return "H0"
+        return None
+
+    def describe(self, match: MatchScore) -> str:
+        low, high = self.bounds
+        verdict = self.verdict(match)
+        text = {"H1": "accepted", "H0": "rejected", None: "running"}[verdict]
+        return (f"SPRT elo0={self.elo0:g} elo1={self.elo1:g}: LLR {self.llr(match):.2f} "
+                f"({low:.2f}, {high:.2f}) {text}")
@@ -0,0 +1,154 @@
+# evaluate.py: Static evaluation. Material plus piece-square tables, tapered
+# between middlegame and endgame by the amount of material left on the board,
+# plus pawn structure and king shelter.
+#
+# Material, placement and phase are kept up to date by make_move (see
+# Position.psq_mg), so they cost nothing here. Pawn structure only changes
+# when a pawn moves or is captured, so its score is cached by the position's
+# pawn hash in PAWN_TABLE.
+
+from array import array
+from typing import List, Tuple
+
+from chess.rules.bitboard import FILE_A, iter_squares, popcount
+from chess.rules.position import Position, WHITE, BLACK, PAWN, KNIGHT, BISHOP, ROOK, QUEEN
+from chess.rules.psqt import MAX_PHASE
+
+# Pawn structure, in centipawns (middlegame, endgame).
+DOUBLED = (-10, -20)      # per pawn beyond the first on a file
+ISOLATED = (-10, -15)     # per pawn with no friendly pawn on a neighbouring file
+# Passed pawn bonus by rank, counted from the pawn's own side.
+PASSED_MG = [0, 5, 10, 15, 25, 45, 70, 0]
+PASSED_EG = [0, 10, 15, 25, 45, 75, 120, 0]
+# Middlegame bonus per own pawn on the three squares in front of the king.
+SHELTER = 12
+
+FILES = [FILE_A << f for f in range(8)]
+ADJACENT_FILES = [(FILES[f - 1] if f > 0 else 0) | (FILES[f + 1] if f < 7 else 0) for f in range(8)]
+
+
+def _passed_masks() -> List[List[int]]:
+    # The squares in front of a pawn on its own and neighbouring files; no
+    # enemy pawn there means it is passed.
+    masks = [[0] * 64, [0] * 64]
+    for sq in range(64):
+        files = FILES[sq & 7] | ADJACENT_FILES[sq & 7]
+        rank = sq >> 3
+        for r in range(8):
+            row = files & (0xFF << (8 * r))
+            if r > rank:
+                masks[WHITE][sq] |= row
+            elif r < rank:
+                masks[BLACK][sq] |= row
+    return masks
+
+
+def _shelter_masks() -> List[List[int]]:
+    masks = [[0] * 64, [0] * 64]
+    for sq in range(64):
+        files = FILES[sq & 7] | ADJACENT_FILES[sq & 7]
+        rank = sq >> 3
+        if rank < 7:
+            masks[WHITE][sq] = files & (0xFF << (8 * (rank + 1)))
+        if rank > 0:
+            masks[BLACK][sq] = files & (0xFF << (8 * (rank - 1)))
+    return masks
+
+
+PASSED_MASKS = _passed_masks()
+SHELTER_MASKS = _shelter_masks()
+
+
+def pawn_structure(white_pawns: int, black_pawns: int) -> Tuple[int, int]:
+    """
+    Returns the (middlegame, endgame) pawn structure score from white's
+    point of view.
+    """
+    mg = eg = 0
+    for color, pawns, enemy, sign in ((WHITE, white_pawns, black_pawns, 1),
+                                      (BLACK, black_pawns, white_pawns, -1)):
+        for f in range(8):
+            count = popcount(pawns & FILES[f])
+            if not count:
+                continue
+            if count > 1:
+                mg += sign * DOUBLED[0] * (count - 1)
+                eg += sign * DOUBLED[1] * (count - 1)
+            if not pawns & ADJACENT_FILES[f]:
+                mg += sign * ISOLATED[0] * count
+                eg += sign * ISOLATED[1] * count
+        masks = PASSED_MASKS[color]
+        for sq in iter_squares(pawns):
+            if not masks[sq] & enemy:
+                rank = sq >> 3 if color == WHITE else 7 - (sq >> 3)
+                mg += sign * PASSED_MG[rank]
+                eg += sign * PASSED_EG[rank]
+    return mg, eg
+
+
+class PawnTable:
+    """
+    Pawn structure scores by pawn hash. Like the transposition table it is
+    two preallocated arrays: the keys and the (middlegame, endgame) scores
+    packed into one word.
+    """
+
+    def __init__(self, bits: int = 14):
+        self.mask = (1 << bits) - 1
+        self.keys = array("Q")
+        self.scores = array("Q")
+        self.probes = 0
+        self.hits = 0
+        self.clear()
+
+    def clear(self) -> None:
+        size = self.mask + 1
+        self.keys = array("Q", [0]) * size
+        # Every slot starts out holding key 0, which is the position without
+        # pawns, so they all get its score (0, 0).
+        self.scores = array("Q", [32768 | (32768 << 16)]) * size
+
+    def probe(self, position: Position) -> Tuple[int, int]:
+        key = position.pawn_key
+        index = key & self.mask
+        self.probes += 1
+        if self.keys[index] == key:
+            self.hits += 1
+            packed = self.scores[index]
+            return (packed & 0xFFFF) - 32768, (packed >> 16) - 32768
+        bb = position.bb
+        mg, eg = pawn_structure(bb[PAWN], bb[PAWN + 6])
+        self.keys[index] = key
+        self.scores[index] = (mg + 32768) | ((eg + 32768) << 16)
+        return mg, eg
+
+    def hit_rate(self) -> float:
+        return self.hits / self.probes if self.probes else 0.0
+
+
+# Shared by every search in the process.
+PAWN_TABLE = PawnTable()
+
+
+def evaluate(position: Position) -> int:
+    """
+    Returns the static evaluation in centipawns from the side to move's point
+    of view.
+    """
+    pawn_mg, pawn_eg = PAWN_TABLE.probe(position)
+    bb = position.bb
+    kings = position.kings
+    shelter = popcount(SHELTER_MASKS[WHITE][kings[WHITE]] & bb[PAWN]) - \
+        popcount(SHELTER_MASKS[BLACK][kings[BLACK]] & bb[PAWN + 6])
+    mg = position.psq_mg + pawn_mg + SHELTER * shelter
+    eg = position.psq_eg + pawn_eg
+
+    phase = min(position.phase, MAX_PHASE)
+    score = (mg * phase + eg * (MAX_PHASE - phase)) // MAX_PHASE
+    return score if position.turn == WHITE else -score
+
+
+def has_non_pawn_material(position: Position, color: int) -> bool:
+    bb = position.bb
+    o = 6 * color
+    return bool(bb[KNIGHT + o] | bb[BISHOP + o] | bb[ROOK + o] | bb[QUEEN + o])
@@ -0,0 +1,394 @@
+# search.py: Iterative deepening alpha-beta search.
+#
+# Principal variation search with a transposition table, null move pruning,
+# late move reductions, check extensions and a captures-only quiescence
+# search. Moves are ordered TT move first, then captures by MVV-LVA, then
+# killer moves, then by the history heuristic. The search honors a hard
+# per-move time budget, a node budget and an external stop flag. With
+# endgame tablebases attached, positions they cover are scored exactly and
+# the root plays the tablebase move without searching.
+
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional, Callable
+
+from chess.engine.evaluate import evaluate, has_non_pawn_material
+from chess.engine.tablebase import WIN, LOSS
+from chess.engine.transposition import TranspositionTable, EXACT, LOWER, UPPER
+from chess.rules.bitboard import popcount
+from chess.rules.move import NULL_MOVE, to_uci
+from chess.rules.position import Position, PIECE_KIND, PAWN
+
+MATE = 30000
+INFINITY = 32000
+MAX_PLY = 64
+# Tablebase mates can be further away than MAX_PLY (KBNK takes up to 66
+# plies), so leave room for distances up to 255 plies.
+MATE_BOUND = MATE - MAX_PLY - 256
+
+# Captures (and en passant) have bit 14 set, promotions bit 15.
+TACTICAL_MASK = 0xC000
+
+_TT_MOVE_SCORE = 10_000_000
+_CAPTURE_SCORE = 1_000_000
+_PROMOTION_SCORE = 900_000
+_KILLER_SCORE = 800_000
+_HISTORY_LIMIT = 400_000
+
+# Checking the clock every node would cost more than the search itself.
+_CHECK_INTERVAL = 255
+
+
+class SearchAborted(Exception):
+    pass
+
+
+@dataclass
+class SearchLimits:
+    depth: int = MAX_PLY
+    movetime: Optional[float] = None  # hard budget in seconds
+    nodes: Optional[int] = None
+    infinite: bool = False
+
+
+@dataclass
+class SearchInfo:
+    depth: int = 0
+    seldepth: int = 0
+    score: int = 0
+    nodes: int = 0
+    time: float = 0.0
+    pv: List[int] = field(default_factory=list)
+    hashfull: int = 0
+
+    @property
+    def best_move(self) -> int:
+        return self.pv[0] if self.pv else 0
+
+    @property
+    def nps(self) -> int:
+        return int(self.nodes / self.time) if self.time > 0 else 0
+
+    @property
+    def mate_in(self) -> Optional[int]:
+        """
+        Moves to mate (negative when being mated), or None for a normal score.
+        """
+        if self.score > MATE_BOUND:
+            return (MATE - self.score + 1) // 2
+        if self.score < -MATE_BOUND:
+            return -((MATE + self.score) // 2)
+        return None
+
+    def score_text(self) -> str:
+        mate = self.mate_in
+        return f"mate {mate}" if mate is not None else f"cp {self.score}"
+
+    def __str__(self) -> str:
+        return (f"depth {self.depth} seldepth {self.seldepth} score {self.score_text()} "
+                f"nodes {self.nodes} nps {self.nps} hashfull {self.hashfull} "
+                f"time {int(self.time * 1000)} pv {' '.join(to_uci(m) for m in self.pv)}")
+
+
+def score_to_tt(score: int, ply: int) -> int:
+    # Mate scores are stored relative to the node, not the root.
+    if score > MATE_BOUND:
+        return score + ply
+    if score < -MATE_BOUND:
+        return score - ply
+    return score
+
+
+def score_from_tt(score: int, ply: int) -> int:
+    if score > MATE_BOUND:
+        return score - ply
+    if score < -MATE_BOUND:
+        return score + ply
+    return score
+
+
+def tablebase_score(wdl: int, dtm: int, ply: int) -> int:
+    """
+    The search score of a tablebase result (dtm in plies to mate) found
+    ply plies from the root.
+    """
+    if wdl == WIN:
+        return MATE - ply - dtm
+    if wdl == LOSS:
+        return -MATE + ply + dtm
+    return 0
+
+
+class Searcher:
+    def __init__(self, tt: TranspositionTable = None, tablebase=None):
+        self.tt = tt or TranspositionTable()
+        # A tablebase.Tablebases, or None.
+        self.tablebase = tablebase
+        self.tb_hits = 0
+        # Anything with an is_set() method (threading or multiprocessing
+        # Event); checked along with the clock.
+        self.stop_event = None
+        self.stopped = False
+        # Non-zero for the helpers of a parallel search (smp.py). Helpers
+        # skip some depths so they run ahead of the main search instead of
+        # repeating its work.
+        self.helper = 0
+
+        self.killers = [[0, 0] for _ in range(MAX_PLY + 1)]
+        self.history = [[0] * 64 for _ in range(13)]
+        self.pv_table: List[List[int]] = [[] for _ in range(MAX_PLY + 1)]
+
+        self.nodes = 0
+        self.seldepth = 0
+        self.start_time = 0.0
+        self.deadline: Optional[float] = None
+        self.node_limit: Optional[int] = None
+        self.can_abort = False
+
+    def stop(self) -> None:
+        self.stopped = True
+
+    def search(self,
+               position: Position,
+               limits: SearchLimits = None,
+               on_info: Callable[[SearchInfo], None] = None) -> SearchInfo:
+        """
+        Searches the position with iterative deepening and returns the info of
+        the last completed iteration. on_info is called after every
+        iteration. The position is returned to its original state even when
+        the search is cut off by the clock.
+        """
+        limits = limits or SearchLimits()
+        self.tt.new_search()
+        self.tt.reset_stats()
+        self.stopped = False
+        self.nodes = 0
+        self.seldepth = 0
+        self.tb_hits = 0
+        self.killers = [[0, 0] for _ in range(MAX_PLY + 1)]
+        for row in self.history:
+            for i in range(64):
+                row[i] >>= 1
+        self.start_time = time.perf_counter()
+        self.deadline = None if limits.movetime is None or limits.infinite \
+            else self.start_time + limits.movetime
+        self.node_limit = limits.nodes
+
+        best = SearchInfo()
+        if not position.legal_moves():
+            best.score = -MATE if position.in_check() else 0
+            return best
+
+        if self.tablebase is not None:
+            found = self.tablebase.best_move(position)
+            if found is not None and found[0] != NULL_MOVE:
+                move, wdl, dtm = found
+                self.tb_hits = 1
+                best = SearchInfo(1, 1, tablebase_score(wdl, dtm, 0), 1,
+                                  time.perf_counter() - self.start_time, [move], self.tt.hashfull())
+                if on_info is not None:
+                    on_info(best)
+                return best
+
+        root_len = len(position.stack)
+        for depth in range(1, max(limits.depth, 1) + 1):
+            if self.helper and depth > 1 and (depth + self.helper) % 2:
+                continue
+            # The first iteration always completes so there is a move to play.
+            self.can_abort = depth > 1
+            try:
+                score = self._negamax(position, depth, -INFINITY, INFINITY, 0, False)
+            except SearchAborted:
+                while len(position.stack) > root_len:
+                    if position.last_move() == NULL_MOVE:
+                        position.unmake_null_move()
+                    else:
+                        position.unmake_move()
+                break
+
+            elapsed = time.perf_counter() - self.start_time
+            best = SearchInfo(depth, self.seldepth, score, self.nodes, elapsed,
+                              list(self.pv_table[0]), self.tt.hashfull())
+            if on_info is not None:
+                on_info(best)
+
+            if limits.infinite:
+                continue
+            if abs(score) > MATE_BOUND and MATE - abs(score) <= depth:
+                break
+            # An iteration takes several times longer than the last one, so
+            # do not start one that cannot finish.
+            if self.deadline is not None and elapsed > limits.movetime * 0.5:
+                break
+        return best
+
+    def _check_limits(self) -> None:
+        if not self.can_abort:
+            return
+        if self.stopped or (self.stop_event is not None and self.stop_event.is_set()):
+            raise SearchAborted
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            raise SearchAborted
+        if self.node_limit is not None and self.nodes >= self.node_limit:
+            raise SearchAborted
+
+    def _order_moves(self, position: Position, moves: List[int], tt_move: int, ply: int) -> None:
+        board = position.board
+        killer_a, killer_b = self.killers[ply]
+        history = self.history
+
+        def score(move: int) -> int:
+            if move == tt_move:
+                return _TT_MOVE_SCORE
+            frm = move & 63
+            to = (move >> 6) & 63
+            if move & TACTICAL_MASK:
+                s = 0
+                if move & 0x4000:
+                    victim = PIECE_KIND[board[to]] or PAWN
+                    s = _CAPTURE_SCORE + 10 * victim - PIECE_KIND[board[frm]]
+                if move & 0x8000:
+                    s += _PROMOTION_SCORE + ((move >> 12) & 3)
+                return s
+            if move == killer_a:
+                return _KILLER_SCORE + 1
+            if move == killer_b:
+                return _KILLER_SCORE
+            return history[board[frm]][to]
+
+        moves.sort(key=score, reverse=True)
+
+    def _negamax(self, position: Position, depth: int, alpha: int, beta: int,
+                 ply: int, can_null: bool = True) -> int:
+        tablebase = self.tablebase
+        if ply and tablebase is not None and \
+                popcount(position.occ[0] | position.occ[1]) <= tablebase.max_pieces:
+            found = tablebase.probe(position)
+            if found is not None:
+                self.tb_hits += 1
+                self.pv_table[ply] = []
+                return tablebase_score(found[0], found[1], ply)
+
+        if depth <= 0:
+            return self._quiesce(position, alpha, beta, ply)
+
+        self.nodes += 1
+        if not self.nodes & _CHECK_INTERVAL:
+            self._check_limits()
+        self.pv_table[ply] = []
+
+        if ply:
+            if position.halfmove >= 100 or position.repetition_count():
+                return 0
+            # Mate distance pruning.
+            alpha = max(alpha, -MATE + ply)
+            beta = min(beta, MATE - ply - 1)
+            if alpha >= beta:
+                return alpha
+            if ply >= MAX_PLY:
+                return evaluate(position)
+
+        pv_node = beta - alpha > 1
+        key = position.hash
+        tt_move = 0
+        entry = self.tt.probe(key)
+        if entry is not None:
+            tt_move, tt_score, tt_depth, bound = entry
+            if not pv_node and tt_depth >= depth:
+                tt_score = score_from_tt(tt_score, ply)
+                if bound == EXACT or (bound == LOWER and tt_score >= beta) or \
+                        (bound == UPPER and tt_score <= alpha):
+                    return tt_score
+
+        in_check = position.in_check()
+        if in_check:
+            depth += 1
+
+        if can_null and not pv_node and not in_check and depth >= 3 and \
+                has_non_pawn_material(position, position.turn) and evaluate(position) >= beta:
+            position.make_null_move()
+            score = -self._negamax(position, depth - 3, -beta, -beta + 1, ply + 1, False)
+            position.unmake_null_move()
+            if score >= beta and abs(score) < MATE_BOUND:
+                return beta
+
+        moves = position.legal_moves()
+        if not moves:
+            return -MATE + ply if in_check else 0
+        self._order_moves(position, moves, tt_move, ply)
+
+        best_score = -INFINITY
+        best_move = 0
+        original_alpha = alpha
+        make_move = position.make_move
+        unmake_move = position.unmake_move
+        for i, move in enumerate(moves):
+            quiet = not (move & TACTICAL_MASK)
+            make_move(move)
+            if i == 0:
+                score = -self._negamax(position, depth - 1, -beta, -alpha, ply + 1)
+            else:
+                reduction = 1 if depth >= 3 and i >= 4 and quiet and not in_check else 0
+                score = -self._negamax(position, depth - 1 - reduction, -alpha - 1, -alpha, ply + 1)
+                if score > alpha and (reduction or score < beta):
+                    score = -self._negamax(position, depth - 1, -beta, -alpha, ply + 1)
+            unmake_move()
+
+            if score > best_score:
+                best_score = score
+                best_move = move
+                if score > alpha:
+                    alpha = score
+                    self.pv_table[ply] = [move] + self.pv_table[ply + 1]
+                    if score >= beta:
+                        if quiet:
+                            self._update_quiet_stats(position, move, depth, ply)
+                        break
+
+        if best_score >= beta:
+            bound = LOWER
+        elif best_score > original_alpha:
+            bound = EXACT
+        else:
+            bound = UPPER
+        self.tt.store(key, best_move, score_to_tt(best_score, ply), depth, bound)
+        return best_score
+
+    def _update_quiet_stats(self, position: Position, move: int, depth: int, ply: int) -> None:
+        killers = self.killers[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+        row = self.history[position.board[move & 63]]
+        to = (move >> 6) & 63
+        row[to] += depth * depth
+        if row[to] > _HISTORY_LIMIT:
+            for table in self.history:
+                for i in range(64):
+                    table[i] >>= 1
+
+    def _quiesce(self, position: Position, alpha: int, beta: int, ply: int) -> int:
+        self.nodes += 1
+        if not self.nodes & _CHECK_INTERVAL:
+            self._check_limits()
+        if ply > self.seldepth:
+            self.seldepth = ply
+        self.pv_table[min(ply, MAX_PLY)] = []
+
+        stand_pat = evaluate(position)
+        if ply >= MAX_PLY or stand_pat >= beta:
+            return stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+
+        moves = [m for m in position.legal_moves() if m & TACTICAL_MASK]
+        self._order_moves(position, moves, 0, min(ply, MAX_PLY))
+        for move in moves:
+            position.make_move(move)
+            score = -self._quiesce(position, -beta, -alpha, ply + 1)
+            position.unmake_move()
+            if score > alpha:
+                if score >= beta:
+                    return score
+                alpha = score
+        return alpha
@@ -0,0 +1,278 @@
+# smp.py: Lazy SMP, a parallel search over a shared transposition table.
+#
+# The main search runs in the calling process as usual. Each helper is a
+# process that searches the same root at the same time with no time limit,
+# skipping alternate depths so that it runs ahead of the main search. The
+# processes never talk during a search; they help each other only through
+# the shared table (transposition.SharedTranspositionTable), where a helper's
+# results turn into cutoffs and better move ordering for the main search.
+# Once the main search is done the helpers are stopped and its result is the
+# answer.
+
+import multiprocessing
+import queue
+import time
+from dataclasses import dataclass, field
+from typing import Callable, List
+
+from chess.chess_exception import ChessException
+from chess.engine.search import Searcher, SearchLimits, SearchInfo, MAX_PLY
+from chess.engine.tablebase import Tablebases
+from chess.engine.transposition import SharedTranspositionTable
+from chess.rules.position import Position
+
+# How long to wait for the helpers to report back after a stop.
+HELPER_TIMEOUT = 5.0
+
+# Positions measure_scaling uses by default: an opening, two middlegames and
+# an endgame.
+BENCH_FENS = [
+    "r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3",
+    "r1bq1rk1/pp2bppp/2n1pn2/3p4/2PP4/2N1PN2/PP3PPP/R2QKB1R w KQ - 0 8",
+    "r2q1rk1/1b2bppp/p2ppn2/1p6/3NP3/1BN1B3/PPP2PPP/R2Q1RK1 w - - 0 12",
+    "8/5pk1/6p1/3R4/1p5P/1r4P1/5PK1/8 w - - 0 40",
+]
+
+
+class _HelperFlag:
+    """
+    The helper's Searcher.stop_event. The search polls it every few hundred
+    nodes, which is also when the helper publishes its node count.
+    """
+
+    def __init__(self, search_id: int, stop_id, nodes, index: int, searcher: Searcher):
+        self.search_id = search_id
+        self.stop_id = stop_id
+        self.nodes = nodes
+        self.index = index
+        self.searcher = searcher
+
+    def is_set(self) -> bool:
+        self.nodes[self.index] = self.searcher.nodes
+        return self.stop_id.value >= self.search_id
+
+
+def _helper_main(index: int, commands, results, stop_id, nodes, tt_name: str):
+    tt = SharedTranspositionTable(name=tt_name)
+    searcher = Searcher(tt)
+    searcher.helper = index + 1
+    tablebase_dir = None
+    while True:
+        command = commands.get()
+        kind = command[0]
+        if kind == "quit":
+            break
+        elif kind == "attach":
+            tt.close()
+            tt = SharedTranspositionTable(name=command[1])
+            searcher.tt = tt
+        elif kind == "go":
+            _, search_id, fen, moves, directory = command
+            if directory != tablebase_dir:
+                if searcher.tablebase is not None:
+                    searcher.tablebase.close()
+                searcher.tablebase = (Tablebases(directory) or None) if directory else None
+                tablebase_dir = directory
+
+            position = Position(fen)
+            for move in moves:
+                position.make_move(move)
+            searcher.stop_event = _HelperFlag(search_id, stop_id, nodes, index, searcher)
+            nodes[index] = 0
+            if stop_id.value < search_id:
+                searcher.search(position, SearchLimits(depth=MAX_PLY, infinite=True))
+            nodes[index] = searcher.nodes
+            results.put((search_id, index, searcher.nodes))
+    tt.close()
+
+
+@dataclass
+class SmpReport:
+    """
+    Node totals of the last parallel search: the main search's first, then
+    one per helper. missing counts the helpers that did not report back in
+    time (their nodes count as 0).
+    """
+    nodes: List[int] = field(default_factory=list)
+    time: float = 0.0
+    missing: int = 0
+
+    @property
+    def total(self) -> int:
+        return sum(self.nodes)
+
+    @property
+    def nps(self) -> int:
+        return int(self.total / self.time) if self.time > 0 else 0
+
+
+class SmpSearcher(Searcher):
+    """
+    A Searcher that searches with workers processes: itself plus workers - 1
+    helpers. It is used like a Searcher; the info it reports counts the
+    nodes of every process. close() must be called to end the helpers and
+    free the shared table.
+    """
+
+    def __init__(self, tt: SharedTranspositionTable = None, tablebase=None, workers: int = 1):
+        super().__init__(tt or SharedTranspositionTable(), tablebase)
+        if not isinstance(self.tt, SharedTranspositionTable):
+            raise ChessException("SmpSearcher needs a SharedTranspositionTable")
+        self._ctx = multiprocessing.get_context("spawn")
+        self._results = self._ctx.Queue()
+        self._stop_id = self._ctx.Value("i", 0)
+        self._nodes = None
+        self._helpers = []
+        self._tt_name = self.tt.name
+        self.search_id = 0
+        self.report = SmpReport()
+        self.set_workers(workers)
+
+    @property
+    def workers(self) -> int:
+        return len(self._helpers) + 1
+
+    def set_workers(self, workers: int) -> None:
+        """
+        Starts or ends helper processes so that searches use this many
+        processes in total.
+        """
+        workers = max(1, workers)
+        if workers == self.workers and self._nodes is not None:
+            return
+        self._stop_helpers()
+        # One node counter per helper, written without a lock by its owner.
+        self._nodes = self._ctx.RawArray("q", max(workers - 1, 1))
+        self._tt_name = self.tt.name
+        for index in range(workers - 1):
+            commands = self._ctx.Queue()
+            process = self._ctx.Process(target=_helper_main,
+                                        args=(index, commands, self._results, self._stop_id,
+                                              self._nodes, self._tt_name),
+                                        daemon=True)
+            process.start()
+            self._helpers.append((process, commands))
+
+    def _stop_helpers(self) -> None:
+        for process, commands in self._helpers:
+            commands.put(("quit",))
+        for process, _ in self._helpers:
+            process.join(timeout=1.0)
+            if process.is_alive():
+                process.terminate()
+        self._helpers = []
+
+    def close(self) -> None:
+        self._stop_helpers()
+        self.tt.close()
+
+    def search(self,
+               position: Position,
+               limits: SearchLimits = None,
+               on_info: Callable[[SearchInfo], None] = None) -> SearchInfo:
+        """
+        Searches with every worker and returns the main search's result. The
+        nodes in the info include the helpers'.
+        """
+        self.search_id += 1
+        self.tt.next_generation()
+        start = time.perf_counter()
+        if self._helpers:
+            if self.tt.name != self._tt_name:
+                # The table was resized into a new block.
+                self._tt_name = self.tt.name
+                for _, commands in self._helpers:
+                    commands.put(("attach", self._tt_name))
+            moves = position.moves()
+            root = position.copy()
+            for _ in moves:
+                root.unmake_move()
+            directory = self.tablebase.directory if self.tablebase is not None else None
+            for _, commands in self._helpers:
+                commands.put(("go", self.search_id, root.fen(), moves, directory))
+
+        def count_helpers(info: SearchInfo) -> None:
+            info.nodes += sum(self._nodes[:len(self._helpers)])
+            if on_info is not None:
+                on_info(info)
+
+        try:
+            info = super().search(position, limits, count_helpers if self._helpers else on_info)
+        finally:
+            self._stop_id.value = self.search_id
+
+        nodes = [self.nodes] + [0] * len(self._helpers)
+        pending = len(self._helpers)
+        deadline = time.perf_counter() + HELPER_TIMEOUT
+        while pending:
+            try:
+                search_id, index, count = self._results.get(timeout=max(deadline - time.perf_counter(), 0.01))
+            except queue.Empty:
+                break
+            if search_id == self.search_id:
+                nodes[index + 1] = count
+                pending -= 1
+        self.report = SmpReport(nodes, time.perf_counter() - start, pending)
+        if self._helpers:
+            info.nodes = self.report.total
+        return info
+
+
+@dataclass
+class ScalingResult:
+    workers: int
+    depth: int
+    seconds: float
+    nodes: int
+
+    @property
+    def nps(self) -> int:
+        return int(self.nodes / self.seconds) if self.seconds > 0 else 0
+
+
+def measure_scaling(fens: List[str], worker_counts: List[int], depth: int,
+                    hash_mb: int = 64, verbose: bool = True) -> List[ScalingResult]:
+    """
+    Searches every position to a fixed depth with each worker count, from an
+    empty table each time, and returns the summed time and nodes per count.
+    """
+    results = []
+    searcher = SmpSearcher(SharedTranspositionTable(hash_mb))
+    try:
+        for workers in worker_counts:
+            searcher.set_workers(workers)
+            # Wait for new helpers to start up before timing anything: a
+            # search only returns once every helper has reported back.
+            searcher.search(Position(fens[0]), SearchLimits(depth=1))
+            seconds = 0.0
+            nodes = 0
+            for fen in fens:
+                searcher.tt.clear()
+                start = time.perf_counter()
+                searcher.search(Position(fen), SearchLimits(depth=depth))
+                seconds += time.perf_counter() - start
+                nodes += searcher.report.total
+            result = ScalingResult(workers, depth, seconds, nodes)
+            if verbose:
+                print(f"{workers:3d} workers  {seconds:8.2f}s  {nodes:10d} nodes  {result.nps:8d} nps")
+            results.append(result)
+    finally:
+        searcher.close()
+    return results
+
+
+def scaling_report(results: List[ScalingResult]) -> str:
+    """
+    A table of nps and time to depth per worker count, each relative to the
+    first row. Efficiency is the time-to-depth speedup divided by the worker
+    count.
+    """
+    base = results[0]
+    lines = [f"{'workers':>7}  {'time':>8}  {'speedup':>7}  {'efficiency':>10}  {'nps':>9}  {'nps x':>6}"]
+    for result in results:
+        speedup = base.seconds / result.seconds if result.seconds > 0 else 0.0
+        efficiency = speedup * base.workers / result.workers
+        nps_scale = result.nps / base.nps if base.nps else 0.0
+        lines.append(f"{result.workers:7d}  {result.seconds:7.2f}s  {speedup:6.2f}x  "
+                     f"{efficiency:9.0%}  {result.nps:9d}  {nps_scale:5.2f}x")
+    return "\n".join(lines)
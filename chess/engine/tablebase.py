@@ -0,0 +1,251 @@
+# tablebase.py: Probing the endgame tablebases made by tablebase_gen.py.
+#
+# A table covers one material signature with a lone defending king, e.g.
+# "KQK" or "KBNK" (the strong side's pieces, then "K"). Positions are indexed
+# as if the strong side were white:
+#
+#   index = stm + 2 * (sq0 + 64 * sq1 + 64**2 * sq2 + ...)
+#
+# with stm 0 when the strong side is to move and the squares ordered strong
+# king, weak king, then the other pieces in signature order. Black-strong
+# positions are mirrored vertically first.
+#
+# Each table is two files. <sig>.wdl holds 2 bits per position (draw, win or
+# loss for the side to move, or illegal). <sig>.dtm holds the distance to
+# mate in plies, bit-packed at the width the table needs. Both files are
+# memory-mapped and read a few bytes at a time, so probing needs neither
+# numpy nor memory beyond the page cache.
+
+import mmap
+import os
+import struct
+from typing import Dict, List, Optional, Tuple
+
+from chess.chess_exception import ChessException
+from chess.rules.bitboard import iter_squares, popcount
+from chess.rules.move import NULL_MOVE
+from chess.rules.position import Position, WHITE, BLACK, KING, make_piece
+
+TB_DIR = "resource/tablebases"
+
+(DRAW,
+ WIN,
+ LOSS,
+ ILLEGAL) = range(0, 4)
+
+# The strong side's piece kinds in signature order, by letter.
+KIND_ORDER = "KQRBNP"
+_KIND_OF_LETTER = {"Q": 5, "R": 4, "B": 3, "N": 2, "P": 1}
+
+MAGIC = b"CPTB"
+VERSION = 1
+HEADER = struct.Struct("<4sBBxx8sQ8x")
+
+
+def parse_signature(signature: str) -> List[int]:
+    """
+    Returns the piece kinds of the strong side's non-king pieces in table
+    order. Raises ChessException for anything but "K<pieces>K".
+    """
+    signature = signature.upper()
+    if len(signature) < 2 or signature[0] != "K" or signature[-1] != "K" or \
+            any(c not in _KIND_OF_LETTER for c in signature[1:-1]):
+        raise ChessException(f"Unsupported tablebase signature: {signature}")
+    letters = sorted(signature[1:-1], key=KIND_ORDER.index)
+    if "".join(letters) != signature[1:-1]:
+        raise ChessException(f"Pieces out of order in signature {signature}, expected "
+                             f"K{''.join(letters)}K")
+    return [_KIND_OF_LETTER[c] for c in letters]
+
+
+def signature_of(kinds: List[int]) -> str:
+    letters = sorted(("PNBRQ"[kind - 1] for kind in kinds), key=KIND_ORDER.index)
+    return "K" + "".join(letters) + "K"
+
+
+def is_insufficient(kinds: List[int]) -> bool:
+    # A lone king, or king and one minor piece, can never mate.
+    return not kinds or (len(kinds) == 1 and kinds[0] in (2, 3))
+
+
+def table_size(signature: str) -> int:
+    return 2 * 64 ** (len(signature))
+
+
+def write_header(f, signature: str, bits: int, count: int) -> None:
+    f.write(HEADER.pack(MAGIC, VERSION, bits, signature.encode("ascii"), count))
+
+
+class Table:
+    """
+    One signature's WDL and DTM files, memory-mapped.
+    """
+
+    def __init__(self, directory: str, signature: str):
+        self.signature = signature
+        self.kinds = parse_signature(signature)
+        self.__files = []
+        self.wdl, self.wdl_bits, self.count = self.__map(os.path.join(directory, signature + ".wdl"))
+        self.dtm, self.dtm_bits, _ = self.__map(os.path.join(directory, signature + ".dtm"))
+        self.dtm_mask = (1 << self.dtm_bits) - 1
+
+    def __map(self, path: str):
+        f = open(path, "rb")
+        self.__files.append(f)
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(data) < HEADER.size:
+            raise ChessException(f"Not a {self.signature} tablebase file: {path}")
+        magic, version, bits, signature, count = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION or \
+                signature.rstrip(b"\0").decode("ascii") != self.signature:
+            raise ChessException(f"Not a {self.signature} tablebase file: {path}")
+        return data, bits, count
+
+    def close(self) -> None:
+        self.wdl.close()
+        self.dtm.close()
+        for f in self.__files:
+            f.close()
+
+    def probe_index(self, index: int) -> Tuple[int, int]:
+        wdl = (self.wdl[HEADER.size + (index >> 2)] >> ((index & 3) * 2)) & 3
+        if self.dtm_bits == 0:
+            return wdl, 0
+        bit = index * self.dtm_bits
+        offset = HEADER.size + (bit >> 3)
+        # The width is at most 8 bits, so a value spans at most two bytes;
+        # the writer pads the file by one byte.
+        word = self.dtm[offset] | (self.dtm[offset + 1] << 8)
+        return wdl, (word >> (bit & 7)) & self.dtm_mask
+
+
+class Tablebases:
+    """
+    Every table found in a directory. probe() takes a Position and answers
+    from the point of view of the side to move; positions without a table
+    return None. Tables that could not be opened are listed in skipped as
+    (signature, reason), for the caller to report.
+    """
+
+    def __init__(self, directory: str = TB_DIR):
+        self.directory = directory
+        self.tables: Dict[str, Table] = {}
+        self.max_pieces = 0
+        self.skipped: List[Tuple[str, str]] = []
+        if os.path.isdir(directory):
+            for name in sorted(os.listdir(directory)):
+                signature, ext = os.path.splitext(name)
+                if ext != ".wdl" or not os.path.exists(os.path.join(directory, signature + ".dtm")):
+                    continue
+                try:
+                    self.tables[signature] = Table(directory, signature)
+                except (OSError, ValueError, ChessException) as e:
+                    self.skipped.append((signature, str(e)))
+                    continue
+                self.max_pieces = max(self.max_pieces, len(signature))
+
+    def __len__(self) -> int:
+        return len(self.tables)
+
+    def close(self) -> None:
+        for table in self.tables.values():
+            table.close()
+        self.tables.clear()
+
+    @staticmethod
+    def lookup_key(position: Position) -> Optional[Tuple[str, int, List[int]]]:
+        """
+        Returns (signature, index) for a position with a lone king on one
+        side, plus the strong side's non-king piece kinds, or None.
+        """
+        bb = position.bb
+        white = position.occ[WHITE] ^ bb[make_piece(WHITE, KING)]
+        black = position.occ[BLACK] ^ bb[make_piece(BLACK, KING)]
+        if white and black:
+            return None
+        strong = WHITE if white or not black else BLACK
+        flip = 56 if strong == BLACK else 0
+        weak = strong ^ 1
+
+        pieces = []
+        for kind in (5, 4, 3, 2, 1):
+            for sq in iter_squares(bb[make_piece(strong, kind)]):
+                pieces.append((kind, sq ^ flip))
+        kinds = [kind for kind, _ in pieces]
+        squares = [position.king_square(strong) ^ flip, position.king_square(weak) ^ flip]
+        squares += [sq for _, sq in pieces]
+
+        index = 0 if position.turn == strong else 1
+        for i, sq in enumerate(squares):
+            index += sq << (6 * i + 1)
+        return signature_of(kinds), index, kinds
+
+    def probe(self, position: Position) -> Optional[Tuple[int, int]]:
+        """
+        Returns (wdl, dtm) for the side to move: wdl is DRAW, WIN or LOSS and
+        dtm the plies to mate. None when there is no table for the position
+        (or it has castling rights, which the tables leave out).
+        """
+        # Bare kings and a lone minor piece are answered without a table.
+        if position.castling or popcount(position.occ[0] | position.occ[1]) > max(self.max_pieces, 3):
+            return None
+        key = self.lookup_key(position)
+        if key is None:
+            return None
+        signature, index, kinds = key
+        if is_insufficient(kinds):
+            return DRAW, 0
+        table = self.tables.get(signature)
+        if table is None:
+            return None
+        return table.probe_index(index)
+
+    def best_move(self, position: Position) -> Optional[Tuple[int, int, int]]:
+        """
+        Returns (move, wdl, dtm) of the move that keeps the best result: the
+        fastest mate when winning, the longest defence when losing, any
+        drawing move otherwise. None without a table for the position.
+        """
+        here = self.probe(position)
+        if here is None or here[0] == ILLEGAL:
+            return None
+        best = None
+        best_rank = None
+        for move in position.legal_moves():
+            position.make_move(move)
+            after = self.probe(position)
+            position.unmake_move()
+            if after is None:
+                continue
+            # The result after the move is the opponent's; turn it around.
+            wdl = {WIN: LOSS, LOSS: WIN}.get(after[0], DRAW)
+            dtm = after[1] + 1 if wdl != DRAW else 0
+            if wdl == WIN:
+                rank = (2, -dtm)
+            elif wdl == DRAW:
+                rank = (1, 0)
+            else:
+                rank = (0, dtm)
+            if best_rank is None or rank > best_rank:
+                best, best_rank = (move, wdl, dtm), rank
+        if best is None:
+            return NULL_MOVE, here[0], here[1]
+        return best
+
+
+def describe(result: Optional[Tuple[int, int]], turn: int) -> str:
+    """
+    A one-line summary of a probe result for the side to move, e.g.
+    "White mates in 12".
+    """
+    if result is None:
+        return "Not in the tablebases"
+    wdl, dtm = result
+    if wdl == DRAW:
+        return "Draw"
+    if wdl == ILLEGAL:
+        return "Illegal position"
+    winner = "White" if (turn if wdl == WIN else turn ^ 1) == WHITE else "Black"
+    if dtm == 0:
+        return f"{winner} has mated"
+    return f"{winner} mates in {(dtm + 1) // 2} ({dtm} plies)"
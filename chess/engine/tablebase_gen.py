@@ -0,0 +1,433 @@
+# tablebase_gen.py: Retrograde generation of the endgame tablebases.
+#
+# Tables are built with numpy over every index of a signature at once (in
+# chunks). Setup marks illegal positions, counts the defending king's moves
+# and finds the checkmates. From then on, pass d turns the positions that
+# were resolved in pass d - 1 into their predecessors ("unmoves"):
+#
+#   odd d:  a white position with a move into a black loss in d - 1 plies is
+#           a win in d plies (the first such pass gives the shortest mate);
+#   even d: every black predecessor of a white win loses one escape; when a
+#           black position runs out of escapes it is lost in d plies (the
+#           last escape to go gives the longest defence).
+#
+# Captures by the king and promotions leave the table. Their results are
+# read from the smaller tables up front and scheduled for the pass their
+# distance falls in. Whatever is left when no pass changes anything is a
+# draw. Only pieces against a lone king are supported, up to four men.
+
+import os
+import time
+from typing import Dict, List, Tuple
+
+from chess.chess_exception import ChessException
+from chess.engine.tablebase import (DRAW, WIN, LOSS, ILLEGAL, HEADER, TB_DIR, parse_signature,
+                                    signature_of, is_insufficient, table_size, write_header)
+from chess.rules import bitboard
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+MAX_MEN = 4
+CHUNK = 1 << 20
+
+# Added to a black position's escape count for a move that leaves the table
+# without losing, so it never runs out.
+CANNOT_LOSE = 1000
+
+(PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING) = range(1, 7)
+
+
+class _Tables:
+    """
+    Move and attack tables from bitboard.py as numpy arrays.
+    """
+
+    def __init__(self):
+        self.king_targets = self.__targets(bitboard.KING_ATTACKS)
+        self.knight_targets = self.__targets(bitboard.KNIGHT_ATTACKS)
+        # RAYS[dir, sq, step]: the squares walking from sq, -1 off the board.
+        directions = bitboard.ROOK_DIRECTIONS + bitboard.BISHOP_DIRECTIONS
+        self.rays = np.full((8, 64, 7), -1, dtype=np.int64)
+        for d, (df, dr) in enumerate(directions):
+            for sq in range(64):
+                f, r = (sq & 7) + df, (sq >> 3) + dr
+                step = 0
+                while 0 <= f < 8 and 0 <= r < 8:
+                    self.rays[d, sq, step] = r * 8 + f
+                    f, r, step = f + df, r + dr, step + 1
+        self.slider_dirs = {ROOK: range(0, 4), BISHOP: range(4, 8), QUEEN: range(0, 8)}
+        self.attacks = {
+            PAWN: np.array(bitboard.PAWN_ATTACKS[0], dtype=np.uint64),
+            KNIGHT: np.array(bitboard.KNIGHT_ATTACKS, dtype=np.uint64),
+            BISHOP: np.array(bitboard.BISHOP_EMPTY, dtype=np.uint64),
+            ROOK: np.array(bitboard.ROOK_EMPTY, dtype=np.uint64),
+            QUEEN: np.array([r | b for r, b in zip(bitboard.ROOK_EMPTY, bitboard.BISHOP_EMPTY)],
+                            dtype=np.uint64),
+            KING: np.array(bitboard.KING_ATTACKS, dtype=np.uint64),
+        }
+        self.between = np.array(bitboard.BETWEEN, dtype=np.uint64)
+
+    @staticmethod
+    def __targets(attacks: List[int]):
+        targets = np.full((64, 8), -1, dtype=np.int64)
+        for sq in range(64):
+            for i, to in enumerate(bitboard.iter_squares(attacks[sq])):
+                targets[sq, i] = to
+        return targets
+
+
+def _bit(squares):
+    return np.left_shift(np.uint64(1), squares.astype(np.uint64))
+
+
+def _has(bb, squares):
+    return (np.right_shift(bb, squares.astype(np.uint64)) & np.uint64(1)).astype(bool)
+
+
+class _Generator:
+    def __init__(self, signature: str, subtables: Dict[str, tuple], tables: _Tables, verbose: bool):
+        self.signature = signature
+        self.kinds = parse_signature(signature)
+        self.men = 2 + len(self.kinds)
+        self.size = table_size(signature)
+        self.subtables = subtables
+        self.t = tables
+        self.verbose = verbose
+        self.state = np.zeros(self.size, dtype=np.uint8)
+        self.dtm = np.zeros(self.size, dtype=np.uint8)
+        # Escapes left for black positions; CANNOT_LOSE is added for any
+        # move that leaves the table without losing.
+        self.count = np.zeros(self.size, dtype=np.int16)
+        self.pending: Dict[int, List] = {}
+
+    # ----------------------------------------------------------------- #
+    # Indexing
+    # ----------------------------------------------------------------- #
+    def squares(self, idx) -> list:
+        return [(idx >> (1 + 6 * i)) & 63 for i in range(self.men)]
+
+    @staticmethod
+    def index_of(stm, squares) -> "np.ndarray":
+        idx = np.asarray(stm, dtype=np.int64).copy()
+        for i, sq in enumerate(squares):
+            idx = idx + (sq.astype(np.int64) << (1 + 6 * i))
+        return idx
+
+    def occupancy(self, sq) -> "np.ndarray":
+        occ = np.zeros(sq[0].shape, dtype=np.uint64)
+        for s in sq:
+            occ |= _bit(s)
+        return occ
+
+    def attacked(self, target, sq, occ) -> "np.ndarray":
+        """
+        Whether white attacks target. A piece standing on target attacks
+        nothing, so a king capture is tested against the other pieces.
+        """
+        hit = _has(self.t.attacks[KING][sq[0]], target)
+        for kind, s in zip(self.kinds, sq[2:]):
+            ray = _has(self.t.attacks[kind][s], target)
+            if kind in self.t.slider_dirs:
+                ray &= (self.t.between[s, target] & occ) == 0
+            hit |= ray
+        return hit
+
+    def subtable_lookup(self, kinds: List[int], stm: int, sq: list):
+        """
+        Returns (state, dtm) arrays from the table of kinds for the given
+        squares (white king, black king, then kinds in that order).
+        """
+        signature = signature_of(kinds)
+        if is_insufficient(kinds):
+            return np.full(sq[0].shape, DRAW, dtype=np.uint8), np.zeros(sq[0].shape, dtype=np.uint8)
+        order = sorted(range(len(kinds)), key=lambda i: "QRBNP".index("PNBRQ"[kinds[i] - 1]))
+        idx = self.index_of(np.full(sq[0].shape, stm), sq[:2] + [sq[2 + i] for i in order])
+        state, dtm = self.subtables[signature]
+        return state[idx], dtm[idx]
+
+    def schedule(self, ply, idx) -> None:
+        for d in np.unique(ply):
+            self.pending.setdefault(int(d), []).append(idx[ply == d])
+
+    # ----------------------------------------------------------------- #
+    # Setup
+    # ----------------------------------------------------------------- #
+    def setup(self) -> np.ndarray:
+        mates = []
+        for lo in range(0, self.size, CHUNK):
+            idx = np.arange(lo, min(lo + CHUNK, self.size), dtype=np.int64)
+            mates.append(self.setup_chunk(idx))
+        return np.concatenate(mates)
+
+    def setup_chunk(self, idx) -> np.ndarray:
+        t = self.t
+        stm = idx & 1
+        sq = self.squares(idx)
+        legal = ~_has(t.attacks[KING][sq[0]], sq[1])
+        for i in range(self.men):
+            for j in range(i + 1, self.men):
+                legal &= sq[i] != sq[j]
+        for kind, s in zip(self.kinds, sq[2:]):
+            if kind == PAWN:
+                legal &= (s >= 8) & (s < 56)
+        occ = self.occupancy(sq)
+        in_check = self.attacked(sq[1], sq, occ)
+        legal &= ~((stm == 0) & in_check)
+        self.state[idx] = np.where(legal, DRAW, ILLEGAL)
+
+        black = legal & (stm == 1)
+        self.setup_black(idx[black], [s[black] for s in sq], occ[black])
+        white = legal & (stm == 0)
+        self.setup_promotions(idx[white], [s[white] for s in sq], occ[white])
+
+        mated = black & in_check
+        mated[black] &= self.count[idx[black]] == 0
+        self.state[idx[mated]] = LOSS
+        return idx[mated]
+
+    def setup_black(self, idx, sq, occ) -> None:
+        t = self.t
+        bk = sq[1]
+        occ_without = occ ^ _bit(bk)
+        count = np.zeros(idx.shape, dtype=np.int16)
+        for j in range(8):
+            to = t.king_targets[bk, j]
+            ok = to >= 0
+            to = np.where(ok, to, 0)
+            ok &= ~self.attacked(to, sq, occ_without)
+            count += ok
+            for i, kind in enumerate(self.kinds):
+                captures = ok & (sq[2 + i] == to)
+                if not captures.any():
+                    continue
+                kinds = self.kinds[:i] + self.kinds[i + 1:]
+                rest = [sq[0][captures], to[captures]] + \
+                       [s[captures] for k, s in enumerate(sq[2:]) if k != i]
+                state, dtm = self.subtable_lookup(kinds, 0, rest)
+                wins = state == WIN
+                count[np.flatnonzero(captures)[~wins]] += CANNOT_LOSE
+                self.schedule(dtm[wins].astype(np.int64) + 1, idx[captures][wins])
+        self.count[idx] = count
+
+    def setup_promotions(self, idx, sq, occ) -> None:
+        for i, kind in enumerate(self.kinds):
+            if kind != PAWN:
+                continue
+            s = sq[2 + i]
+            push = (s >= 48) & ~_has(occ, s + 8)
+            if not push.any():
+                continue
+            for promotion in (QUEEN, ROOK, BISHOP, KNIGHT):
+                kinds = list(self.kinds)
+                kinds[i] = promotion
+                moved = [x[push] for x in sq]
+                moved[2 + i] = moved[2 + i] + 8
+                state, dtm = self.subtable_lookup(kinds, 1, moved)
+                wins = state == LOSS
+                self.schedule(dtm[wins].astype(np.int64) + 1, idx[push][wins])
+
+    # ----------------------------------------------------------------- #
+    # Unmoves
+    # ----------------------------------------------------------------- #
+    def empty(self, to, sq) -> np.ndarray:
+        free = to >= 0
+        for s in sq:
+            free &= to != s
+        return free
+
+    def unmove(self, idx, sq, slot: int, kind: int) -> List:
+        """
+        Returns the indices reached by moving the piece in slot backwards,
+        with the other side to move.
+        """
+        t = self.t
+        frm = sq[slot]
+        shift = 1 + 6 * slot
+        flip = 1 - 2 * (idx & 1)
+        found = []
+
+        def emit(to, mask):
+            found.append(idx[mask] + flip[mask] + ((to[mask] - frm[mask]) << shift))
+
+        if kind in (KING, KNIGHT):
+            targets = t.king_targets if kind == KING else t.knight_targets
+            for j in range(8):
+                to = targets[frm, j]
+                emit(to, self.empty(to, sq))
+        elif kind == PAWN:
+            one = frm - 8
+            ok = (frm >= 16) & self.empty(one, sq)
+            emit(one, ok)
+            two = frm - 16
+            emit(two, ok & (frm >> 3 == 3) & self.empty(two, sq))
+        else:
+            for d in t.slider_dirs[kind]:
+                alive = np.ones(idx.shape, dtype=bool)
+                for step in range(7):
+                    to = t.rays[d, frm, step]
+                    alive &= self.empty(to, sq)
+                    if not alive.any():
+                        break
+                    emit(to, alive)
+        return found
+
+    def predecessors(self, frontier, white: bool) -> np.ndarray:
+        found = []
+        for lo in range(0, frontier.size, CHUNK // 8):
+            idx = frontier[lo:lo + CHUNK // 8]
+            sq = self.squares(idx)
+            if white:
+                found += self.unmove(idx, sq, 0, KING)
+                for i, kind in enumerate(self.kinds):
+                    found += self.unmove(idx, sq, 2 + i, kind)
+            else:
+                found += self.unmove(idx, sq, 1, KING)
+        if not found:
+            return np.zeros(0, dtype=np.int64)
+        preds = np.concatenate(found)
+        return preds[self.state[preds] == DRAW]
+
+    # ----------------------------------------------------------------- #
+    # Passes
+    # ----------------------------------------------------------------- #
+    def run(self) -> None:
+        start = time.perf_counter()
+        frontier = self.setup()
+        self.log(f"setup {time.perf_counter() - start:.1f}s, {frontier.size} mates")
+        d = 1
+        while frontier.size or self.pending:
+            scheduled = self.pending.pop(d, [])
+            if d & 1:
+                preds = np.concatenate([self.predecessors(frontier, True)] + scheduled)
+                new = np.unique(preds[self.state[preds] == DRAW])
+                self.state[new] = WIN
+            else:
+                preds = np.concatenate([self.predecessors(frontier, False)] + scheduled)
+                preds = preds[self.state[preds] == DRAW]
+                cand, hits = np.unique(preds, return_counts=True)
+                self.count[cand] -= hits.astype(np.int16)
+                new = cand[self.count[cand] == 0]
+                self.state[new] = LOSS
+            self.dtm[new] = d
+            if new.size:
+                self.log(f"ply {d:3d}: {new.size:9d} {'wins' if d & 1 else 'losses'}")
+            frontier = new
+            d += 1
+        self.log(f"done in {time.perf_counter() - start:.1f}s, longest mate {int(self.dtm.max())} plies")
+
+    def log(self, text: str) -> None:
+        if self.verbose:
+            print(f"{self.signature}: {text}")
+
+
+# --------------------------------------------------------------------- #
+# Files
+# --------------------------------------------------------------------- #
+def write_table(directory: str, signature: str, state, dtm) -> Tuple[str, str]:
+    os.makedirs(directory, exist_ok=True)
+    wdl_path = os.path.join(directory, signature + ".wdl")
+    dtm_path = os.path.join(directory, signature + ".dtm")
+    size = state.size
+
+    quads = state.reshape(-1, 4).astype(np.uint8)
+    packed = quads[:, 0] | (quads[:, 1] << 2) | (quads[:, 2] << 4) | (quads[:, 3] << 6)
+    with open(wdl_path, "wb") as f:
+        write_header(f, signature, 2, size)
+        f.write(packed.astype(np.uint8).tobytes())
+
+    width = int(dtm.max()).bit_length()
+    if width > 8:
+        raise ChessException(f"{signature}: distances over 255 plies are not supported")
+    with open(dtm_path, "wb") as f:
+        write_header(f, signature, width, size)
+        if width:
+            for lo in range(0, size, CHUNK):
+                bits = np.unpackbits(dtm[lo:lo + CHUNK, None], axis=1, bitorder="little")[:, :width]
+                f.write(np.packbits(bits.reshape(-1), bitorder="little").tobytes())
+        # The reader loads two bytes at a time.
+        f.write(b"\0")
+    return wdl_path, dtm_path
+
+
+def read_table(directory: str, signature: str) -> Tuple["np.ndarray", "np.ndarray"]:
+    """
+    Returns the (state, dtm) arrays of a table on disk.
+    """
+    size = table_size(signature)
+    with open(os.path.join(directory, signature + ".wdl"), "rb") as f:
+        header = HEADER.unpack(f.read(HEADER.size))
+        packed = np.frombuffer(f.read(), dtype=np.uint8)
+    if header[4] != size or packed.size != size // 4:
+        raise ChessException(f"Bad {signature} tablebase in {directory}")
+    state = np.stack([(packed >> shift) & 3 for shift in (0, 2, 4, 6)], axis=1).reshape(-1)
+
+    with open(os.path.join(directory, signature + ".dtm"), "rb") as f:
+        width = HEADER.unpack(f.read(HEADER.size))[2]
+        raw = np.frombuffer(f.read(), dtype=np.uint8)
+    if not width:
+        return state, np.zeros(size, dtype=np.uint8)
+    bits = np.unpackbits(raw[:size * width // 8], bitorder="little").reshape(-1, width)
+    weights = (1 << np.arange(width)).astype(np.uint8)
+    return state, (bits * weights).sum(axis=1).astype(np.uint8)
+
+
+def dependencies(signature: str) -> List[str]:
+    """
+    The tables that captures and promotions in signature lead into.
+    """
+    kinds = parse_signature(signature)
+    found = []
+    for i, kind in enumerate(kinds):
+        rest = kinds[:i] + kinds[i + 1:]
+        options = [rest] if kind != PAWN else [rest] + [rest + [p] for p in (QUEEN, ROOK, BISHOP, KNIGHT)]
+        for sub in options:
+            if not is_insufficient(sub) and signature_of(sub) not in found:
+                found.append(signature_of(sub))
+    return found
+
+
+def generate(signatures: List[str], directory: str = TB_DIR, force: bool = False,
+             verbose: bool = True) -> List[str]:
+    """
+    Generates the tables (and the smaller ones they depend on) into
+    directory, skipping tables already there unless force is set. Returns
+    the signatures written.
+    """
+    if np is None:
+        raise ChessException("Generating tablebases needs numpy (pip install numpy)")
+    tables = _Tables()
+    done: Dict[str, tuple] = {}
+    written = []
+
+    def build(signature: str, requested: bool) -> None:
+        if signature in done:
+            return
+        if 2 + len(parse_signature(signature)) > MAX_MEN:
+            raise ChessException(f"{signature}: only tables of up to {MAX_MEN} men are supported")
+        for sub in dependencies(signature):
+            build(sub, False)
+        on_disk = os.path.exists(os.path.join(directory, signature + ".dtm"))
+        if on_disk and not (force and requested):
+            done[signature] = read_table(directory, signature)
+            return
+        generator = _Generator(signature, done, tables, verbose)
+        generator.run()
+        write_table(directory, signature, generator.state, generator.dtm)
+        done[signature] = generator.state, generator.dtm
+        written.append(signature)
+
+    for signature in signatures:
+        build(signature.upper(), True)
+    return written
+
+
+def table_stats(state, dtm) -> Dict[str, int]:
+    """
+    Counts of wins, losses and draws and the longest mate, for reports.
+    """
+    return {"wins": int((state == WIN).sum()), "losses": int((state == LOSS).sum()),
+            "draws": int((state == DRAW).sum()), "illegal": int((state == ILLEGAL).sum()),
+            "longest": int(dtm.max())}
@@ -0,0 +1,474 @@
+# tournament.py: Self-play matches between engine configurations on a pool
+# of worker processes.
+#
+# A configuration is a name, a search budget (depth, movetime or nodes per
+# move), a hash size and overrides for the evaluation terms in evaluate.py.
+# Every pair of configurations plays each opening of the suite twice, once
+# with each color, so the openings' own bias cancels out. Games are
+# independent tasks handed to the pool as workers free up. Results come back
+# in completion order and update the Elo/SPRT statistics as they arrive; a
+# decided SPRT ends the match early.
+#
+# Games end by the rules or by adjudication: a tablebase result, both
+# engines agreeing one side is lost (resign), a long run of near-zero scores
+# (draw), or the ply limit.
+
+import json
+import multiprocessing
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from itertools import combinations
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import chess.engine.evaluate as evaluate
+from chess.chess_exception import ChessException
+from chess.engine.analysis import format_eval
+from chess.engine.elo import MatchScore, Sprt
+from chess.engine.search import Searcher, SearchLimits, MAX_PLY
+from chess.engine.tablebase import Tablebases, TB_DIR, WIN, LOSS, ILLEGAL
+from chess.engine.transposition import TranspositionTable
+from chess.rules.pgn import PgnGame, read_pgn, game_result
+from chess.rules.position import Position, START_FEN, WHITE
+
+# Evaluation terms a configuration may override, with their defaults.
+EVAL_TERMS = ("DOUBLED", "ISOLATED", "PASSED_MG", "PASSED_EG", "SHELTER")
+DEFAULT_EVAL = {name: getattr(evaluate, name) for name in EVAL_TERMS}
+
+# A short built-in suite of balanced openings, used without --openings.
+BUILTIN_OPENINGS = [
+    "e2e4 e7e5 g1f3 b8c6 f1b5 a7a6",
+    "e2e4 e7e5 g1f3 b8c6 f1c4 f8c5",
+    "e2e4 c7c5 g1f3 d7d6 d2d4 c5d4 f3d4 g8f6",
+    "e2e4 c7c5 b1c3 b8c6 g2g3 g7g6",
+    "e2e4 e7e6 d2d4 d7d5 b1c3 g8f6",
+    "e2e4 c7c6 d2d4 d7d5 e4e5 c8f5",
+    "e2e4 d7d6 d2d4 g8f6 b1c3 g7g6",
+    "d2d4 d7d5 c2c4 e7e6 b1c3 g8f6",
+    "d2d4 d7d5 c2c4 c7c6 g1f3 g8f6",
+    "d2d4 g8f6 c2c4 g7g6 b1c3 f8g7 e2e4 d7d6",
+    "d2d4 g8f6 c2c4 e7e6 b1c3 f8b4",
+    "d2d4 g8f6 c2c4 e7e6 g1f3 b7b6",
+    "c2c4 e7e5 b1c3 g8f6 g1f3 b8c6",
+    "c2c4 c7c5 g1f3 g8f6 b1c3 b8c6",
+    "g1f3 d7d5 g2g3 g8f6 f1g2 e7e6",
+    "d2d4 f7f5 g2g3 g8f6 f1g2 e7e6",
+]
+
+
+@dataclass
+class EngineConfig:
+    name: str
+    depth: Optional[int] = None
+    movetime: Optional[float] = None
+    nodes: Optional[int] = None
+    hash_mb: int = 16
+    eval: Dict[str, object] = field(default_factory=dict)
+
+    def limits(self) -> SearchLimits:
+        return SearchLimits(depth=self.depth or MAX_PLY, movetime=self.movetime, nodes=self.nodes)
+
+    @property
+    def has_budget(self) -> bool:
+        return self.depth is not None or self.movetime is not None or self.nodes is not None
+
+
+def parse_engine(text: str) -> EngineConfig:
+    """
+    Reads a configuration from "key=value" words, e.g.
+    "name=shelter20 nodes=20000 eval.SHELTER=20". Keys are name, depth,
+    movetime (seconds), nodes, hash (MB) and eval.<term> with a JSON value
+    for any of EVAL_TERMS.
+    """
+    config = EngineConfig(name="")
+    for word in text.split():
+        key, sep, value = word.partition("=")
+        if not sep:
+            raise ChessException(f"Expected key=value in engine spec, got {word}")
+        try:
+            if key == "name":
+                config.name = value
+            elif key == "depth":
+                config.depth = int(value)
+            elif key == "movetime":
+                config.movetime = float(value)
+            elif key == "nodes":
+                config.nodes = int(value)
+            elif key == "hash":
+                config.hash_mb = int(value)
+            elif key.startswith("eval."):
+                term = key[5:]
+                if term not in EVAL_TERMS:
+                    raise ChessException(f"Unknown evaluation term {term}; one of {', '.join(EVAL_TERMS)}")
+                parsed = json.loads(value)
+                config.eval[term] = tuple(parsed) if isinstance(DEFAULT_EVAL[term], tuple) else parsed
+            else:
+                raise ChessException(f"Unknown engine option {key}")
+        except ValueError:
+            raise ChessException(f"Bad value for {key}: {value}")
+    config.name = config.name or " ".join(f"{k}={v}" for k, v in config.eval.items()) or "default"
+    return config
+
+
+@dataclass
+class Adjudication:
+    tablebase: bool = True
+    tablebase_dir: str = TB_DIR
+    # Resign once both engines have scored the game at least resign_score
+    # centipawns for the same side for resign_moves moves each.
+    resign_score: int = 600
+    resign_moves: int = 4
+    # Draw from move draw_start on, once both engines have scored the game
+    # within draw_score of zero for draw_moves moves each.
+    draw_score: int = 10
+    draw_moves: int = 8
+    draw_start: int = 40
+    max_plies: int = 400
+
+
+@dataclass
+class Opening:
+    fen: str
+    moves: List[int]
+
+
+def builtin_openings() -> List[Opening]:
+    openings = []
+    for line in BUILTIN_OPENINGS:
+        position = Position()
+        moves = []
+        for text in line.split():
+            moves.append(position.parse_uci(text))
+            position.make_move(moves[-1])
+        openings.append(Opening(START_FEN, moves))
+    return openings
+
+
+def load_openings(path: str, plies: int = 8) -> List[Opening]:
+    """
+    Reads an opening suite: the first plies moves of every game of a PGN
+    file, or one FEN/EPD per line of any other file.
+    """
+    if path.lower().endswith(".pgn"):
+        return [Opening(game.fen, game.moves[:plies]) for game in read_pgn(path) if not game.error]
+    openings = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            fields = line.split(";")[0].split()
+            if not fields:
+                continue
+            # EPD has only the first four FEN fields.
+            fen = " ".join(fields[:6]) if len(fields) >= 6 and fields[4].isdigit() \
+                else " ".join(fields[:4] + ["0", "1"])
+            Position(fen)
+            openings.append(Opening(fen, []))
+    return openings
+
+
+@dataclass
+class GameTask:
+    index: int
+    round: int
+    white: int
+    black: int
+    opening: Opening
+
+
+@dataclass
+class GameRecord:
+    index: int
+    white: int
+    black: int
+    game: PgnGame
+    termination: str = ""
+    plies: int = 0
+    nodes: int = 0
+    seconds: float = 0.0
+    cpu: float = 0.0
+    worker: int = 0
+
+    @property
+    def white_points(self) -> float:
+        return {"1-0": 1.0, "0-1": 0.0}.get(self.game.result, 0.5)
+
+
+# --------------------------------------------------------------------- #
+# Playing a game (in a worker)
+# --------------------------------------------------------------------- #
+class _Player:
+    def __init__(self, config: EngineConfig):
+        self.config = config
+        self.searcher = Searcher(TranspositionTable(config.hash_mb))
+        self.pawn_table = evaluate.PawnTable()
+        self.terms = dict(DEFAULT_EVAL, **config.eval)
+        self.limits = config.limits()
+
+    def activate(self) -> None:
+        # Both players share the process, so each move first installs the
+        # mover's evaluation terms and its own pawn cache (whose scores
+        # depend on those terms).
+        evaluate.PAWN_TABLE = self.pawn_table
+        for name, value in self.terms.items():
+            setattr(evaluate, name, value)
+
+
+def _adjudicate(scores: List[int], position: Position, rules: Adjudication) -> Optional[Tuple[str, str]]:
+    """
+    Result and reason from the engines' recent scores (white's point of
+    view, one per ply), or None to play on.
+    """
+    n = 2 * rules.resign_moves
+    if rules.resign_moves and len(scores) >= n:
+        recent = scores[-n:]
+        if all(s >= rules.resign_score for s in recent):
+            return "1-0", "adjudication: black resigns"
+        if all(s <= -rules.resign_score for s in recent):
+            return "0-1", "adjudication: white resigns"
+    n = 2 * rules.draw_moves
+    if rules.draw_moves and position.fullmove >= rules.draw_start and len(scores) >= n and \
+            all(abs(s) <= rules.draw_score for s in scores[-n:]):
+        return "1/2-1/2", "adjudication: draw"
+    return None
+
+
+def play_game(task: GameTask, players: List[_Player], tablebase: Optional[Tablebases],
+              rules: Adjudication) -> GameRecord:
+    start = time.perf_counter()
+    cpu = time.process_time()
+    position = Position(task.opening.fen)
+    for move in task.opening.moves:
+        position.make_move(move)
+    white, black = players[task.white], players[task.black]
+    for player in (white, black):
+        player.searcher.tt.clear()
+
+    headers = {"Event": "ChessPygame tournament", "Site": "?",
+               "Date": time.strftime("%Y.%m.%d"), "Round": f"{task.round + 1}.{task.index + 1}",
+               "White": white.config.name, "Black": black.config.name}
+    if task.opening.fen != START_FEN:
+        headers["FEN"] = task.opening.fen
+    game = PgnGame(headers, list(task.opening.moves))
+    if task.opening.moves:
+        game.comments[len(task.opening.moves)] = "opening"
+    scores: List[int] = []
+    nodes = 0
+    termination = "normal"
+    while True:
+        result = game_result(position)
+        if result != "*":
+            break
+        if tablebase is not None:
+            probed = tablebase.probe(position)
+            if probed is not None and probed[0] != ILLEGAL:
+                wdl = probed[0]
+                if wdl == WIN:
+                    result = "1-0" if position.turn == WHITE else "0-1"
+                elif wdl == LOSS:
+                    result = "0-1" if position.turn == WHITE else "1-0"
+                else:
+                    result = "1/2-1/2"
+                termination = "adjudication: tablebase"
+                break
+        if len(game.moves) >= rules.max_plies:
+            result, termination = "1/2-1/2", "adjudication: move limit"
+            break
+
+        player = white if position.turn == WHITE else black
+        player.activate()
+        info = player.searcher.search(position, player.limits)
+        nodes += info.nodes
+        move = info.best_move or position.legal_moves()[0]
+        scores.append(info.score if position.turn == WHITE else -info.score)
+        comment = f"{format_eval(info.score, position.turn)} d{info.depth}"
+        position.make_move(move)
+        game.moves.append(move)
+        game.comments[len(game.moves)] = comment
+
+        adjudicated = _adjudicate(scores, position, rules)
+        if adjudicated is not None:
+            result, termination = adjudicated
+            break
+
+    game.result = result
+    game.headers["Termination"] = termination
+    game.headers["PlyCount"] = str(len(game.moves))
+    return GameRecord(task.index, task.white, task.black, game, termination,
+                      len(game.moves) - len(task.opening.moves), nodes,
+                      time.perf_counter() - start, time.process_time() - cpu, os.getpid())
+
+
+# --------------------------------------------------------------------- #
+# Worker pool
+# --------------------------------------------------------------------- #
+_players: List[_Player] = []
+_tablebase: Optional[Tablebases] = None
+_rules: Optional[Adjudication] = None
+
+
+def _init_worker(configs: List[EngineConfig], rules: Adjudication) -> None:
+    global _players, _tablebase, _rules
+    _players = [_Player(config) for config in configs]
+    # Even without table files this adjudicates bare kings and a lone minor
+    # piece as draws.
+    _tablebase = Tablebases(rules.tablebase_dir) if rules.tablebase else None
+    _rules = rules
+
+
+def _play_task(task: GameTask) -> GameRecord:
+    return play_game(task, _players, _tablebase, _rules)
+
+
+def schedule(configs: List[EngineConfig], openings: List[Opening], rounds: int) -> Iterator[GameTask]:
+    """
+    Every pair of configurations plays each round's opening with both
+    colors. Rounds cycle through the openings.
+    """
+    index = 0
+    for round_number in range(rounds):
+        opening = openings[round_number % len(openings)]
+        for a, b in combinations(range(len(configs)), 2):
+            for white, black in ((a, b), (b, a)):
+                yield GameTask(index, round_number, white, black, opening)
+                index += 1
+
+
+@dataclass
+class TournamentStats:
+    configs: List[EngineConfig]
+    sprt: Optional[Sprt] = None
+    games: int = 0
+    plies: int = 0
+    nodes: int = 0
+    wall: float = 0.0
+    workers: int = 1
+    # Match scores by (a, b) pair with a < b, from b's point of view: with
+    # the baseline first on the command line, each reads as the change
+    # against the baseline.
+    matches: Dict[Tuple[int, int], MatchScore] = field(default_factory=dict)
+    points: Dict[int, float] = field(default_factory=dict)
+    terminations: Dict[str, int] = field(default_factory=dict)
+    busy: Dict[int, float] = field(default_factory=dict)
+    cpu: Dict[int, float] = field(default_factory=dict)
+
+    def add(self, record: GameRecord) -> None:
+        self.games += 1
+        self.plies += record.plies
+        self.nodes += record.nodes
+        a, b = sorted((record.white, record.black))
+        points = record.white_points if record.white == b else 1 - record.white_points
+        self.matches.setdefault((a, b), MatchScore()).add(points)
+        self.points[b] = self.points.get(b, 0.0) + points
+        self.points[a] = self.points.get(a, 0.0) + 1 - points
+        self.terminations[record.termination] = self.terminations.get(record.termination, 0) + 1
+        self.busy[record.worker] = self.busy.get(record.worker, 0.0) + record.seconds
+        self.cpu[record.worker] = self.cpu.get(record.worker, 0.0) + record.cpu
+
+    @property
+    def games_per_second(self) -> float:
+        return self.games / self.wall if self.wall > 0 else 0.0
+
+    @property
+    def utilization(self) -> float:
+        """
+        CPU time spent playing games over the wall time of every worker.
+        """
+        return sum(self.cpu.values()) / (self.wall * self.workers) if self.wall > 0 else 0.0
+
+    def first_match(self) -> MatchScore:
+        return self.matches.get((0, 1), MatchScore())
+
+    def decided(self) -> bool:
+        # The SPRT is run on the first two configurations: the baseline and
+        # the change under test.
+        return self.sprt is not None and self.sprt.verdict(self.first_match()) is not None
+
+    def status(self, total: int) -> str:
+        match = self.first_match()
+        elo, margin = match.elo()
+        text = (f"{self.games}/{total} games  {self.games_per_second:.2f} games/s  "
+                f"util {self.utilization:.0%}  {self.configs[1].name} vs {self.configs[0].name}: "
+                f"+{match.wins} ={match.draws} -{match.losses}  Elo {elo:+.1f} +/- {margin:.1f}")
+        if self.sprt is not None:
+            text += f"  LLR {self.sprt.llr(match):.2f}"
+        return text
+
+    def report(self) -> str:
+        wall = self.wall or 1e-9
+        lines = [f"{self.games} games, {self.plies} plies, {self.nodes:,} nodes in {self.wall:.1f}s: "
+                 f"{self.games / wall:.2f} games/s, {self.nodes / wall:,.0f} nodes/s, "
+                 f"utilization {self.utilization:.0%} of {self.workers} workers"]
+        lines.append("")
+        ranking = sorted(range(len(self.configs)), key=lambda i: -self.points.get(i, 0.0))
+        for i in ranking:
+            lines.append(f"  {self.configs[i].name:<24} {self.points.get(i, 0.0):6.1f} points")
+        lines.append("")
+        for (a, b), match in sorted(self.matches.items()):
+            lines.append(f"  {self.configs[b].name} vs {self.configs[a].name}: {match}")
+        if self.sprt is not None:
+            lines.append(f"  {self.sprt.describe(self.first_match())}")
+        lines.append("")
+        for reason, count in sorted(self.terminations.items(), key=lambda item: -item[1]):
+            lines.append(f"  {count:6d}  {reason}")
+        for pid in sorted(self.busy):
+            lines.append(f"  worker {pid:>7}: busy {self.busy[pid]:7.1f}s  cpu {self.cpu[pid]:7.1f}s  "
+                         f"utilization {self.cpu[pid] / wall:6.1%}")
+        return "\n".join(lines)
+
+
+def _bounded(tasks: Iterator[GameTask], slots: threading.Semaphore, stop: threading.Event) -> Iterator[GameTask]:
+    # Only a bounded number of games is queued ahead, so a decided SPRT
+    # stops the match after the games already in flight.
+    for task in tasks:
+        slots.acquire()
+        if stop.is_set():
+            return
+        yield task
+
+
+def run_tournament(configs: List[EngineConfig],
+                   openings: List[Opening],
+                   rounds: int,
+                   rules: Adjudication = None,
+                   workers: int = None,
+                   sprt: Sprt = None,
+                   stats: TournamentStats = None) -> Iterator[GameRecord]:
+    """
+    Plays the tournament on a process pool (workers=0 plays in this
+    process) and yields each game as it finishes, updating stats. With an
+    SPRT, the tournament stops once it has decided.
+    """
+    if len(configs) < 2:
+        raise ChessException("A tournament needs at least two engines")
+    rules = rules or Adjudication()
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    stats = stats if stats is not None else TournamentStats(configs)
+    stats.sprt = sprt
+    stats.workers = max(workers, 1)
+    tasks = schedule(configs, openings, rounds)
+    start = time.perf_counter()
+
+    if workers == 0:
+        _init_worker(configs, rules)
+        for task in tasks:
+            record = _play_task(task)
+            stats.add(record)
+            stats.wall = time.perf_counter() - start
+            yield record
+            if stats.decided():
+                return
+        return
+
+    slots = threading.Semaphore(2 * workers)
+    stop = threading.Event()
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(workers, _init_worker, (configs, rules)) as pool:
+        for record in pool.imap_unordered(_play_task, _bounded(tasks, slots, stop)):
+            slots.release()
+            stats.add(record)
+            stats.wall = time.perf_counter() - start
+            yield record
+            if stats.decided() and not stop.is_set():
+                stop.set()
+                # Wake the feeder so it sees the stop.
+                slots.release()
@@ -0,0 +1,280 @@
+# transposition.py: Fixed size transposition table keyed by the position's
+# Zobrist hash.
+#
+# The table is two preallocated arrays of 64-bit words (keys and packed data)
+# grouped into buckets of two slots. Nothing is allocated after construction,
+# so the memory used is exactly what was asked for no matter how long the
+# search runs.
+#
+# A slot stores key ^ data rather than the key, so a slot only matches when
+# both words were written by the same store. That makes the table safe to
+# share between processes without locks (SharedTranspositionTable): a slot
+# torn by two processes storing at once fails the check and reads as a miss.
+# Each data word packs:
+#
+#   bits  0-15  best move
+#   bits 16-31  score + 32768
+#   bits 32-39  depth
+#   bits 40-41  bound (EXACT, LOWER, UPPER; 0 means the slot is empty)
+#   bits 42-47  age (search generation)
+
+from array import array
+from multiprocessing import shared_memory
+from typing import Optional, Tuple
+
+EXACT = 1
+LOWER = 2
+UPPER = 3
+
+ENTRY_BYTES = 16
+BUCKET_SIZE = 2
+AGE_MASK = 63
+# Words ahead of the slots in a shared table: the search generation and the
+# entry count.
+HEADER_WORDS = 8
+
+TTEntry = Tuple[int, int, int, int]
+
+
+def pack(move: int, score: int, depth: int, bound: int, age: int) -> int:
+    return (move | ((score + 32768) << 16) | (max(depth, 0) << 32)
+            | (bound << 40) | (age << 42))
+
+
+def unpack(data: int) -> TTEntry:
+    """
+    Returns (move, score, depth, bound) from a packed data word.
+    """
+    return (data & 0xFFFF, ((data >> 16) & 0xFFFF) - 32768,
+            (data >> 32) & 0xFF, (data >> 40) & 3)
+
+
+def entry_count(size_mb: int) -> int:
+    """
+    The largest power of two number of entries that fits in size_mb
+    megabytes.
+    """
+    entries = BUCKET_SIZE
+    while entries * 2 * ENTRY_BYTES <= max(size_mb, 1) * 1024 * 1024:
+        entries *= 2
+    return entries
+
+
+class TranspositionTable:
+    def __init__(self, size_mb: int = 16):
+        self.size_mb = size_mb
+        self.keys: array = array("Q")
+        self.data: array = array("Q")
+        self.mask = 0
+        self.age = 0
+
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.replacements = 0
+
+        self.resize(size_mb)
+
+    def resize(self, size_mb: int) -> None:
+        """
+        Reallocates the table with entry_count(size_mb) entries.
+        """
+        self.size_mb = size_mb
+        entries = self._allocate(entry_count(size_mb))
+        # Index of the first slot of a bucket: low bits of the key with the
+        # bucket offset bit cleared.
+        self.mask = (entries - 1) & ~(BUCKET_SIZE - 1)
+        self.age = 0
+        self.reset_stats()
+
+    def _allocate(self, entries: int) -> int:
+        self.keys = array("Q", bytes(8 * entries))
+        self.data = array("Q", bytes(8 * entries))
+        return entries
+
+    def clear(self) -> None:
+        zeros = bytes(8 * len(self.keys))
+        memoryview(self.keys).cast("B")[:] = zeros
+        memoryview(self.data).cast("B")[:] = zeros
+        self.age = 0
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.replacements = 0
+
+    def new_search(self) -> None:
+        """
+        Starts a new search generation, so entries left over from earlier
+        searches become the first candidates for replacement.
+        """
+        self.age = (self.age + 1) & AGE_MASK
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def probe(self, key: int) -> Optional[TTEntry]:
+        self.probes += 1
+        i = key & self.mask
+        keys = self.keys
+        data = self.data
+        d = data[i]
+        if d and keys[i] ^ d == key:
+            self.hits += 1
+            return unpack(d)
+        d = data[i + 1]
+        if d and keys[i + 1] ^ d == key:
+            self.hits += 1
+            return unpack(d)
+        return None
+
+    def store(self, key: int, move: int, score: int, depth: int, bound: int) -> None:
+        """
+        Stores a search result. A slot already holding this position is
+        updated in place (keeping its move if the new result has none).
+        Otherwise the slot with the lowest depth, counting entries from older
+        searches as eight plies shallower, is replaced.
+        """
+        self.stores += 1
+        i = key & self.mask
+        keys = self.keys
+        data = self.data
+        age = self.age
+
+        if keys[i] ^ data[i] == key or keys[i + 1] ^ data[i + 1] == key:
+            slot = i if keys[i] ^ data[i] == key else i + 1
+            old = data[slot]
+            if move == 0:
+                move = old & 0xFFFF
+            # Keep a much deeper result from this search over a shallow
+            # bound.
+            if bound != EXACT and ((old >> 42) & AGE_MASK) == age and ((old >> 32) & 0xFF) > depth + 2:
+                return
+        else:
+            slot = i
+            worst = 1 << 30
+            for s in (i, i + 1):
+                old = data[s]
+                if old == 0:
+                    slot = s
+                    break
+                relative_age = (age - ((old >> 42) & AGE_MASK)) & AGE_MASK
+                worth = ((old >> 32) & 0xFF) - 8 * relative_age
+                if worth < worst:
+                    worst = worth
+                    slot = s
+            if data[slot]:
+                self.replacements += 1
+
+        packed = pack(move, score, depth, bound, age)
+        keys[slot] = key ^ packed
+        data[slot] = packed
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.probes if self.probes else 0.0
+
+    def hashfull(self) -> int:
+        """
+        Returns how full the table is in permille, counting only entries from
+        the current search (sampled from the first 1000 slots, as UCI does).
+        """
+        sample = min(1000, len(self.data))
+        used = 0
+        for i in range(sample):
+            d = self.data[i]
+            if d and ((d >> 42) & AGE_MASK) == self.age:
+                used += 1
+        return used * 1000 // sample
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self.keys),
+            "probes": self.probes,
+            "hits": self.hits,
+            "hit_rate": self.hit_rate,
+            "stores": self.stores,
+            "replacements": self.replacements,
+            "hashfull": self.hashfull(),
+        }
+
+
+class SharedTranspositionTable(TranspositionTable):
+    """
+    A table in a multiprocessing.shared_memory block, so every process of a
+    parallel search reads and writes the same entries. The process that
+    creates it owns the block and unlinks it on close(); others attach by
+    name. The search generation lives in the block as well: the owner
+    advances it with next_generation() and every process picks it up in
+    new_search().
+    """
+
+    def __init__(self, size_mb: int = 16, name: str = None):
+        self.shm: Optional[shared_memory.SharedMemory] = None
+        self.owner = name is None
+        self.words: Optional[memoryview] = None
+        self._attach_name = name
+        super().__init__(size_mb)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def _allocate(self, entries: int) -> int:
+        name, self._attach_name = self._attach_name, None
+        self._release()
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=8 * (HEADER_WORDS + 2 * entries))
+            self.words = self.shm.buf.cast("Q")
+            self.words[1] = entries
+        else:
+            # Helpers are started by the owner and share its resource
+            # tracker, so attaching registers nothing new and the owner's
+            # unlink is the only cleanup.
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.words = self.shm.buf.cast("Q")
+            entries = self.words[1]
+        self.keys = self.words[HEADER_WORDS:HEADER_WORDS + entries]
+        self.data = self.words[HEADER_WORDS + entries:HEADER_WORDS + 2 * entries]
+        return entries
+
+    def resize(self, size_mb: int) -> None:
+        # Attached tables follow the owner's size; resizing one makes it the
+        # owner of a new block. It lets go of the shared block first, while
+        # it is still not the owner, so that block is not unlinked.
+        if self.shm is not None and not self.owner:
+            self._release()
+            self.owner = True
+        super().resize(size_mb)
+
+    def clear(self) -> None:
+        super().clear()
+        self.words[0] = 0
+
+    def new_search(self) -> None:
+        self.age = self.words[0]
+
+    def next_generation(self) -> None:
+        """
+        Advances the search generation for every process sharing the table.
+        """
+        self.words[0] = (self.words[0] + 1) & AGE_MASK
+
+    def _release(self) -> None:
+        if self.shm is None:
+            return
+        # Views of the buffer must go before the block can be closed.
+        self.keys.release()
+        self.data.release()
+        self.words.release()
+        self.keys = self.data = array("Q")
+        self.words = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+        self.shm = None
+
+    def close(self) -> None:
+        self._release()
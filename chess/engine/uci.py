@@ -0,0 +1,307 @@
+# uci.py: The Universal Chess Interface front-end.
+#
+# Three threads are involved. A reader thread turns input lines into a
+# queue, so reading never waits on the engine. The main thread takes
+# commands off the queue and answers them. Each "go" starts a search thread
+# that streams "info" lines while it runs and ends with "bestmove". "stop"
+# only sets the search's stop event, which the search checks every few
+# hundred nodes, so it is honored within milliseconds even mid-iteration.
+
+import os
+import queue
+import sys
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, TextIO
+
+from chess.chess_exception import ChessException
+from chess.engine.book import open_book
+from chess.engine.evaluate import PAWN_TABLE
+from chess.engine.search import SearchLimits, SearchInfo, MAX_PLY
+from chess.engine.smp import SmpSearcher
+from chess.engine.tablebase import Tablebases
+from chess.engine.transposition import SharedTranspositionTable
+from chess.rules.move import to_uci
+from chess.rules.position import Position, START_FEN, WHITE
+
+ENGINE_NAME = "ChessPygame"
+ENGINE_AUTHOR = "bill-baggins"
+
+# Time kept back on every move for the harness and process overhead.
+MOVE_OVERHEAD = 0.05
+# Moves the remaining clock is shared across when the harness gives no
+# movestogo.
+DEFAULT_MOVES_TO_GO = 30
+
+
+@dataclass
+class UciOption:
+    name: str
+    kind: str  # "spin", "check" or "string"
+    default: object
+    low: int = 0
+    high: int = 0
+
+    def describe(self) -> str:
+        text = f"option name {self.name} type {self.kind} default "
+        if self.kind == "check":
+            text += "true" if self.default else "false"
+        else:
+            text += str(self.default) if self.default != "" else "<empty>"
+        if self.kind == "spin":
+            text += f" min {self.low} max {self.high}"
+        return text
+
+    def parse(self, text: str):
+        if self.kind == "spin":
+            return max(self.low, min(self.high, int(text)))
+        if self.kind == "check":
+            return text.lower() == "true"
+        return "" if text == "<empty>" else text
+
+
+OPTIONS = [
+    UciOption("Hash", "spin", 16, 1, 1024),
+    UciOption("Threads", "spin", 1, 1, os.cpu_count() or 1),
+    UciOption("OwnBook", "check", False),
+    UciOption("BookFile", "string", "resource/books/book.bin"),
+    UciOption("TablebasePath", "string", "resource/tablebases"),
+]
+
+
+def time_budget(turn: int, params: Dict[str, int]) -> Optional[float]:
+    """
+    Seconds to spend on a move from the "go" clock fields (milliseconds), or
+    None without a clock.
+    """
+    left = params.get("wtime" if turn == WHITE else "btime")
+    if left is None:
+        return None
+    increment = params.get("winc" if turn == WHITE else "binc", 0) / 1000
+    left /= 1000
+    moves = params.get("movestogo") or DEFAULT_MOVES_TO_GO
+    budget = left / moves + increment * 0.75
+    # Never plan to use more than half of what is left.
+    return max(0.01, min(budget, left * 0.5) - MOVE_OVERHEAD)
+
+
+class UciEngine:
+    def __init__(self, output: Callable[[str], None]):
+        self.output = output
+        self.options = {option.name.lower(): option for option in OPTIONS}
+        self.values = {option.name.lower(): option.default for option in OPTIONS}
+        self.searcher = SmpSearcher(SharedTranspositionTable(self.values["hash"]),
+                                    workers=self.values["threads"])
+        self.searcher.stop_event = threading.Event()
+        self.position = Position()
+        self.book = None
+        self.search_thread: Optional[threading.Thread] = None
+        self.load_tablebase()
+
+    def send(self, line: str) -> None:
+        self.output(line)
+
+    # ----------------------------------------------------------------- #
+    # Commands
+    # ----------------------------------------------------------------- #
+    def handle(self, line: str) -> bool:
+        """
+        Runs one command line. Returns False on "quit".
+        """
+        words = line.split()
+        if not words:
+            return True
+        command, args = words[0], words[1:]
+        if command == "quit":
+            self.stop()
+            return False
+        handler = getattr(self, "cmd_" + command, None)
+        if handler is None:
+            self.send(f"info string unknown command {command}")
+            return True
+        try:
+            handler(args)
+        except (ChessException, ValueError, IndexError) as e:
+            self.send(f"info string error in '{line.strip()}': {e}")
+        return True
+
+    def cmd_uci(self, args: List[str]) -> None:
+        self.send(f"id name {ENGINE_NAME}")
+        self.send(f"id author {ENGINE_AUTHOR}")
+        for option in OPTIONS:
+            self.send(option.describe())
+        self.send("uciok")
+
+    def cmd_isready(self, args: List[str]) -> None:
+        self.send("readyok")
+
+    def cmd_ucinewgame(self, args: List[str]) -> None:
+        self.stop()
+        self.searcher.tt.clear()
+        PAWN_TABLE.clear()
+        self.position = Position()
+
+    def cmd_setoption(self, args: List[str]) -> None:
+        # setoption name <words...> [value <words...>]
+        text = " ".join(args)
+        if not text.startswith("name "):
+            raise ValueError("expected 'setoption name <id> [value <x>]'")
+        name, _, value = text[5:].partition(" value ")
+        key = name.strip().lower()
+        option = self.options.get(key)
+        if option is None:
+            self.send(f"info string unknown option {name.strip()}")
+            return
+        self.stop()
+        self.values[key] = option.parse(value.strip())
+        if key == "hash":
+            self.searcher.tt.resize(self.values[key])
+        elif key == "threads":
+            # Threads are search processes (smp.py); the name is UCI's.
+            self.searcher.set_workers(self.values[key])
+        elif key == "tablebasepath":
+            self.load_tablebase()
+        elif key in ("ownbook", "bookfile"):
+            self.book = None
+
+    def cmd_position(self, args: List[str]) -> None:
+        if "moves" in args:
+            split = args.index("moves")
+            setup, moves = args[:split], args[split + 1:]
+        else:
+            setup, moves = args, []
+        if setup and setup[0] == "startpos":
+            position = Position(START_FEN)
+        elif setup and setup[0] == "fen":
+            position = Position(" ".join(setup[1:]))
+        else:
+            raise ValueError("expected 'position startpos|fen <fen> [moves ...]'")
+        for text in moves:
+            move = position.parse_uci(text)
+            if move is None:
+                raise ChessException(f"illegal move {text}")
+            position.make_move(move)
+        self.stop()
+        self.position = position
+
+    def cmd_go(self, args: List[str]) -> None:
+        self.stop()
+        params: Dict[str, int] = {}
+        infinite = False
+        i = 0
+        while i < len(args):
+            word = args[i]
+            if word == "infinite":
+                infinite = True
+            elif word in ("depth", "movetime", "nodes", "wtime", "btime", "winc", "binc", "movestogo"):
+                params[word] = int(args[i + 1])
+                i += 1
+            i += 1
+
+        movetime = params["movetime"] / 1000 if "movetime" in params else \
+            time_budget(self.position.turn, params)
+        limits = SearchLimits(depth=min(params.get("depth", MAX_PLY), MAX_PLY), movetime=movetime,
+                              nodes=params.get("nodes"), infinite=infinite)
+
+        if self.values["ownbook"] and not infinite:
+            move = self.book_move()
+            if move is not None:
+                self.send(f"bestmove {to_uci(move)}")
+                return
+
+        self.searcher.stop_event.clear()
+        position = self.position.copy()
+        self.search_thread = threading.Thread(target=self.search, args=(position, limits),
+                                              name="uci-search", daemon=True)
+        self.search_thread.start()
+
+    def cmd_stop(self, args: List[str]) -> None:
+        self.stop()
+
+    # ----------------------------------------------------------------- #
+    # Search
+    # ----------------------------------------------------------------- #
+    def search(self, position: Position, limits: SearchLimits) -> None:
+        def on_info(info: SearchInfo) -> None:
+            self.send(f"info {info}")
+
+        info = self.searcher.search(position, limits, on_info)
+        if self.searcher.report.missing:
+            self.send(f"info string {self.searcher.report.missing} search helper(s) did not report back")
+        if limits.infinite:
+            # UCI forbids answering an infinite search before "stop".
+            self.searcher.stop_event.wait()
+        best = info.best_move or (position.legal_moves() or [0])[0]
+        text = f"bestmove {to_uci(best)}"
+        if len(info.pv) > 1:
+            text += f" ponder {to_uci(info.pv[1])}"
+        self.send(text)
+
+    def stop(self) -> None:
+        """
+        Ends the running search, if any, once it has sent its bestmove.
+        Commands that change the engine's state call this rather than
+        waiting, since an infinite search only ends on "stop" and the
+        command loop would never get to read it.
+        """
+        self.searcher.stop_event.set()
+        self.wait()
+
+    def wait(self) -> None:
+        if self.search_thread is not None:
+            self.search_thread.join()
+            self.search_thread = None
+
+    def close(self) -> None:
+        self.stop()
+        self.searcher.close()
+
+    def book_move(self) -> Optional[int]:
+        if self.book is None:
+            try:
+                self.book = open_book(self.values["bookfile"]) or False
+            except ChessException as e:
+                self.book = False
+                self.send(f"info string {e}")
+        return self.book.pick(self.position) if self.book else None
+
+    def load_tablebase(self) -> None:
+        path = self.values["tablebasepath"]
+        tablebase = Tablebases(path) if path and os.path.isdir(path) else None
+        if tablebase is not None:
+            for signature, reason in tablebase.skipped:
+                self.send(f"info string Skipping tablebase {signature}: {reason}")
+        self.searcher.tablebase = tablebase or None
+
+
+def _read_lines(stream: TextIO, lines: "queue.Queue[Optional[str]]") -> None:
+    for line in stream:
+        lines.put(line)
+    lines.put(None)
+
+
+def run(stream: TextIO = None, out: TextIO = None) -> None:
+    """
+    Speaks UCI on stdin/stdout (or the given streams) until "quit" or the
+    end of the input.
+    """
+    stream = stream or sys.stdin
+    out = out or sys.stdout
+    lock = threading.Lock()
+
+    def output(line: str) -> None:
+        # The search thread and the main thread both write.
+        with lock:
+            out.write(line + "\n")
+            out.flush()
+
+    engine = UciEngine(output)
+    lines: "queue.Queue[Optional[str]]" = queue.Queue()
+    threading.Thread(target=_read_lines, args=(stream, lines), name="uci-input", daemon=True).start()
+    try:
+        while True:
+            line = lines.get()
+            if line is None or not engine.handle(line):
+                break
+    finally:
+        engine.close()
@@ -0,0 +1,210 @@
+# worker.py: Runs the search in a separate process so the render loop never
+# waits on it.
+#
+# The game sends a position and limits with go(), then calls poll() once per
+# frame to collect what the search has produced so far: an EngineInfo after
+# every completed iteration and an EngineBestMove when the search ends.
+# Stopping and ponderhit go through shared memory values rather than the
+# command queue, because the worker does not read commands while it searches.
+
+import multiprocessing
+import queue
+import time
+from dataclasses import dataclass
+from typing import List, Optional, Union
+
+from chess.engine.search import Searcher, SearchLimits, SearchInfo
+from chess.engine.tablebase import Tablebases
+from chess.engine.transposition import TranspositionTable
+from chess.rules.position import Position
+
+
+@dataclass
+class EngineInfo:
+    search_id: int
+    info: SearchInfo
+
+
+@dataclass
+class EngineBestMove:
+    search_id: int
+    best_move: int
+    ponder_move: int
+    info: SearchInfo
+
+
+EngineMessage = Union[EngineInfo, EngineBestMove]
+
+
+class _StopFlag:
+    """
+    Stands in for an Event in Searcher.stop_event. A search is stopped when
+    its id has been stopped, or once its time budget has run out after a
+    ponderhit.
+    """
+
+    def __init__(self, search_id: int, stop_id, ponderhit_id, ponderhit_time, movetime):
+        self.search_id = search_id
+        self.stop_id = stop_id
+        self.ponderhit_id = ponderhit_id
+        self.ponderhit_time = ponderhit_time
+        self.movetime = movetime
+
+    def is_set(self) -> bool:
+        if self.stop_id.value >= self.search_id:
+            return True
+        if self.ponderhit_id.value == self.search_id and self.movetime is not None:
+            return time.time() - self.ponderhit_time.value >= self.movetime
+        return False
+
+    def ponderhit(self) -> bool:
+        return self.ponderhit_id.value == self.search_id
+
+
+def _worker_main(commands, results, stop_id, ponderhit_id, ponderhit_time, hash_mb: int,
+                 tablebase_dir: Optional[str]):
+    tablebase = Tablebases(tablebase_dir) if tablebase_dir else None
+    # A directory without tables leaves the search without probes.
+    searcher = Searcher(TranspositionTable(hash_mb), tablebase or None)
+    while True:
+        command = commands.get()
+        kind = command[0]
+        if kind == "quit":
+            break
+        elif kind == "hash":
+            searcher.tt.resize(command[1])
+        elif kind == "clear":
+            searcher.tt.clear()
+        elif kind == "go":
+            _, search_id, fen, moves, limits, ponder = command
+            if stop_id.value >= search_id:
+                continue
+
+            position = Position(fen)
+            for move in moves:
+                position.make_move(move)
+
+            flag = _StopFlag(search_id, stop_id, ponderhit_id, ponderhit_time, limits.movetime)
+            searcher.stop_event = flag
+            if ponder:
+                # Search without a clock until the opponent moves; the budget
+                # starts counting at ponderhit.
+                limits = SearchLimits(depth=limits.depth, nodes=limits.nodes, infinite=True)
+
+            def on_info(info: SearchInfo, sid=search_id):
+                results.put(EngineInfo(sid, info))
+
+            info = searcher.search(position, limits, on_info)
+            if ponder or limits.infinite:
+                # An infinite search may only answer once it has been told to.
+                while not flag.is_set() and not (ponder and flag.ponderhit()):
+                    time.sleep(0.005)
+            ponder_move = info.pv[1] if len(info.pv) > 1 else 0
+            results.put(EngineBestMove(search_id, info.best_move, ponder_move, info))
+
+
+class EngineWorker:
+    def __init__(self, hash_mb: int = 16, tablebase_dir: str = None):
+        # spawn keeps the child free of the parent's SDL state; the child
+        # only imports the headless engine modules.
+        ctx = multiprocessing.get_context("spawn")
+        self._commands = ctx.Queue()
+        self._results = ctx.Queue()
+        self._stop_id = ctx.Value("i", 0)
+        self._ponderhit_id = ctx.Value("i", 0)
+        self._ponderhit_time = ctx.Value("d", 0.0)
+        self._process = ctx.Process(target=_worker_main,
+                                    args=(self._commands, self._results, self._stop_id,
+                                          self._ponderhit_id, self._ponderhit_time, hash_mb,
+                                          tablebase_dir),
+                                    daemon=True)
+        self._process.start()
+
+        self.search_id = 0
+        self.busy = False
+        self.pondering = False
+        self.latest: Optional[SearchInfo] = None
+
+    def go(self, position: Position, limits: SearchLimits, ponder: bool = False) -> int:
+        """
+        Starts searching the position, cancelling any search still running.
+        The game history is sent along so the worker can see repetitions.
+        Returns the id that results for this search will carry.
+        """
+        if self.busy:
+            self.stop()
+        self.search_id += 1
+        moves = position.moves()
+        root = position.copy()
+        for _ in moves:
+            root.unmake_move()
+        self._commands.put(("go", self.search_id, root.fen(), moves, limits, ponder))
+        self.busy = True
+        self.pondering = ponder
+        self.latest = None
+        return self.search_id
+
+    def ponderhit(self) -> None:
+        """
+        The opponent played the expected move: the ponder search becomes a
+        normal timed search from now on.
+        """
+        if self.busy and self.pondering:
+            self._ponderhit_time.value = time.time()
+            self._ponderhit_id.value = self.search_id
+            self.pondering = False
+
+    def stop(self) -> None:
+        self._stop_id.value = self.search_id
+        self.pondering = False
+
+    def set_hash(self, size_mb: int) -> None:
+        self._commands.put(("hash", size_mb))
+
+    def clear_hash(self) -> None:
+        self._commands.put(("clear",))
+
+    def poll(self) -> List[EngineMessage]:
+        """
+        Returns every message from the current search that has arrived since
+        the last call, without blocking.
+        """
+        messages = []
+        while True:
+            try:
+                message = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if message.search_id != self.search_id:
+                continue
+            if isinstance(message, EngineInfo):
+                self.latest = message.info
+            else:
+                self.latest = message.info
+                self.busy = False
+                self.pondering = False
+            messages.append(message)
+        return messages
+
+    def wait(self, timeout: float = None) -> Optional[EngineBestMove]:
+        """
+        Blocks until the current search reports its best move. Meant for
+        headless tools, not the render loop.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        while self.busy:
+            for message in self.poll():
+                if isinstance(message, EngineBestMove):
+                    return message
+            if deadline is not None and time.time() >= deadline:
+                return None
+            time.sleep(0.001)
+        return None
+
+    def close(self) -> None:
+        if self._process.is_alive():
+            self.stop()
+            self._commands.put(("quit",))
+            self._process.join(timeout=1.0)
+            if self._process.is_alive():
+                self._process.terminate()
@@ -1,49 +1,473 @@
+import os
+import time
+
 import pygame
 from pygame.constants import *
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
-from base.window import Window, MenuState
+from base.window import Window, MenuState, GameState
 from base.common import Color
+from base.events import EVENTS
+from base.gui import TextBox
+from base.profiler import FRAME_PROFILER
+from base.scheduler import IdleScheduler
+from base.settings import SCREEN_SETTING
 from chess.game_component.board import ChessBoard
+from chess.game_component.timeline import Timeline
+from chess.engine.book import open_book
+from chess.engine.search import SearchLimits, SearchInfo
+from chess.engine.tablebase import Tablebases, describe
+from chess.engine.worker import EngineWorker, EngineBestMove
+from chess.net.client import GameViewer
+from chess.rules.move import to_uci
+from chess.rules.pgn import write_pgn
+from chess.rules.san import to_san
+from chess.chess_exception import ChessException
+from chess.user_option import USER_OPTION, PlayerType
+
+SAVE_DIR = "saved_games"
+PLAYER_NAMES = ["Human", "Computer"]
 
 
 @dataclass
 class GameSystem:
     grid: ChessBoard = None
+    players: list = field(default_factory=lambda: [PlayerType.Human, PlayerType.Human])
+    timeline: Timeline = None
+    engine: EngineWorker = None
+    search_id: int = 0
+    ponder_move: int = 0
+    status_box: TextBox = None
+    status_info: SearchInfo = None
+    status_dirty: bool = False
+    tablebase: Tablebases = None
+    dtm_box: TextBox = None
+    dtm_key: int = -1
+    dtm_dirty: bool = False
+    viewer: GameViewer = None
+    clock: list = None
+    clock_time: float = 0.0
+    clock_turn: int = 0
+    viewer_result: str = ""
+    viewer_error: str = ""
+    full_redraw: bool = True
 
 
 def initialize(window: Window, g_sys: GameSystem):
     window.screen = pygame.display.get_surface()
     window.clock = pygame.time.Clock()
+    window.scheduler = IdleScheduler(window.clock, SCREEN_SETTING["fps"])
     window.screen_width = window.screen.get_width()
     window.screen_height = window.screen.get_height()
+    window.game_state = GameState.Active
 
     g_sys.grid = ChessBoard(window.screen_width, window.screen_height,
                             Color.Gray, Color.Coffee)
+    grid = g_sys.grid
+    g_sys.timeline = Timeline(grid.x, grid.y + grid.grid_surface_height + 12, grid.grid_surface_width)
+    if USER_OPTION["ai_use_book"]:
+        try:
+            grid.book = open_book(USER_OPTION["ai_book_path"])
+        except ChessException as e:
+            print(e)
+    tablebase_dir = USER_OPTION["ai_tablebase_path"] if USER_OPTION["ai_use_tablebase"] else None
+    if tablebase_dir:
+        g_sys.tablebase = Tablebases(tablebase_dir)
+        for signature, reason in g_sys.tablebase.skipped:
+            print(f"Skipping tablebase {signature}: {reason}")
+    if USER_OPTION["watch_server"]:
+        start_watching(window, g_sys)
+        return
+    g_sys.players = [USER_OPTION["player_one_type"], USER_OPTION["player_two_type"]]
+    if PlayerType.Computer in g_sys.players:
+        g_sys.engine = EngineWorker(USER_OPTION["ai_hash_mb"], tablebase_dir)
+        g_sys.status_box = TextBox(pos=[20, 20],
+                                   size=[260, 40],
+                                   background_color=[150, 150, 150],
+                                   text="",
+                                   text_size=20)
+
+
+def shutdown(g_sys: GameSystem):
+    if g_sys.viewer is not None:
+        g_sys.viewer.close()
+        g_sys.viewer = None
+    if g_sys.engine is not None:
+        g_sys.engine.close()
+        g_sys.engine = None
+    if g_sys.tablebase is not None:
+        g_sys.tablebase.close()
+        g_sys.tablebase = None
+
+
+def is_computer_turn(g_sys: GameSystem) -> bool:
+    return g_sys.players[g_sys.grid.position.turn] == PlayerType.Computer
+
+
+def check_game_over(window: Window, g_sys: GameSystem):
+    position = g_sys.grid.position
+    if not position.legal_moves():
+        result = "Checkmate" if position.in_check() else "Stalemate"
+    elif position.halfmove >= 100:
+        result = "Draw by the fifty move rule"
+    elif position.repetition_count() >= 2:
+        result = "Draw by threefold repetition"
+    else:
+        return
+    print(result)
+    window.game_state = GameState.GameOver
+    if g_sys.engine is not None:
+        g_sys.engine.stop()
+
+
+def start_search(g_sys: GameSystem, ponder: bool = False):
+    position = g_sys.grid.position
+    limits = SearchLimits(movetime=USER_OPTION["ai_move_time"])
+    if ponder:
+        # Search the position after the reply the engine expects, so that
+        # its time is not wasted while the human thinks.
+        position = position.copy()
+        position.make_move(g_sys.ponder_move)
+    g_sys.search_id = g_sys.engine.go(position, limits, ponder)
+
+
+def on_human_move(g_sys: GameSystem, move: int):
+    engine = g_sys.engine
+    if engine is None:
+        return
+    if engine.pondering and move == g_sys.ponder_move:
+        engine.ponderhit()
+    elif engine.busy:
+        # Wrong guess: starting the real search cancels the ponder search.
+        start_search(g_sys)
+
+
+def on_navigate(window: Window, g_sys: GameSystem):
+    """
+    Called after undo, redo or a jump on the timeline. Whatever the engine
+    was searching no longer matches the board, so its result is dropped; it
+    only searches again once the board is back at the end of the game.
+    """
+    if g_sys.engine is not None:
+        if g_sys.engine.busy:
+            g_sys.engine.stop()
+        g_sys.search_id = 0
+    window.game_state = GameState.Active
+    check_game_over(window, g_sys)
+
+
+def navigate_key(grid: ChessBoard, key: int) -> bool:
+    history = grid.history
+    if key == K_LEFT and history.can_undo():
+        grid.undo_move()
+    elif key == K_RIGHT and history.can_redo():
+        grid.redo_move()
+    elif key == K_HOME:
+        grid.seek(0)
+    elif key == K_END:
+        grid.seek(len(history))
+    else:
+        return False
+    return True
+
+
+def save_game(g_sys: GameSystem) -> str:
+    """
+    Writes the game so far to SAVE_DIR as PGN and returns the file path.
+    """
+    now = time.localtime()
+    game = g_sys.grid.to_game({
+        "Event": "ChessPygame game",
+        "Site": "?",
+        "Date": time.strftime("%Y.%m.%d", now),
+        "Round": "-",
+        "White": PLAYER_NAMES[g_sys.players[0]],
+        "Black": PLAYER_NAMES[g_sys.players[1]],
+    })
+    os.makedirs(SAVE_DIR, exist_ok=True)
+    path = os.path.join(SAVE_DIR, time.strftime("game-%Y%m%d-%H%M%S.pgn", now))
+    write_pgn([game], path)
+    return path
+
+
+def toggle_hints(grid: ChessBoard):
+    grid.show_hints = not grid.show_hints and grid.book is not None
+    if grid.show_hints:
+        position = grid.position
+        moves = grid.book.moves(position)
+        print("Book: " + (", ".join(f"{to_san(position, m)} ({w})" for m, w in moves) or "no moves"))
+
+
+def toggle_dtm(g_sys: GameSystem):
+    """
+    Shows or hides the tablebase result of the board position.
+    """
+    if g_sys.dtm_box is not None:
+        g_sys.dtm_box = None
+        g_sys.full_redraw = True
+        return
+    if not g_sys.tablebase:
+        print("No tablebases loaded")
+        return
+    g_sys.dtm_box = TextBox(pos=[20, 70],
+                            size=[260, 40],
+                            background_color=[150, 150, 150],
+                            text="",
+                            text_size=20)
+    g_sys.dtm_key = -1
+
+
+def update_dtm(g_sys: GameSystem):
+    position = g_sys.grid.position
+    if position.hash == g_sys.dtm_key:
+        return
+    g_sys.dtm_key = position.hash
+    g_sys.dtm_box.text = describe(g_sys.tablebase.probe(position), position.turn)
+    g_sys.dtm_box.update_text_pos()
+    g_sys.dtm_dirty = True
+
+
+def play_book_move(window: Window, g_sys: GameSystem) -> bool:
+    """
+    Plays a move from the opening book for the computer, if there is one.
+    """
+    book = g_sys.grid.book
+    if book is None:
+        return False
+    move = book.pick(g_sys.grid.position)
+    if move is None:
+        return False
+    g_sys.grid.play_move(move)
+    check_game_over(window, g_sys)
+    return True
+
+
+def start_watching(window: Window, g_sys: GameSystem):
+    """
+    Shows a game hosted by a game server (server.py) instead of a local one.
+    The board follows the server's moves and takes no input of its own.
+    """
+    try:
+        g_sys.viewer = GameViewer(USER_OPTION["watch_server"], USER_OPTION["watch_game"])
+    except ChessException as e:
+        print(e)
+        window.menu_state = MenuState.Menu
+        return
+    g_sys.status_box = TextBox(pos=[20, 20],
+                               size=[260, 40],
+                               background_color=[150, 150, 150],
+                               text="Connecting...",
+                               text_size=20)
+    window.scheduler.busy = True
+
+
+def format_clock(seconds: float) -> str:
+    seconds = max(seconds, 0.0)
+    if seconds < 10:
+        return f"{seconds:.1f}"
+    return f"{int(seconds) // 60}:{int(seconds) % 60:02d}"
+
+
+def apply_server_message(window: Window, g_sys: GameSystem, message: dict):
+    viewer = g_sys.viewer
+    grid = g_sys.grid
+    history = grid.history
+    op = message["op"]
+    if op == "error":
+        # Errors carry no game id. One in reply to the join means there is
+        # no such game, so there is nothing left to wait for.
+        print(f"Server: {message['reason']}")
+        g_sys.viewer_error = f"Server: {message['reason']}"
+        if message.get("request") == "join":
+            viewer.close()
+        return
+    if message.get("game") != viewer.game_id:
+        return
+    if op == "state":
+        grid.load_fen(message["fen"])
+        for text in message["moves"]:
+            grid.history.push(grid.position.parse_uci(text))
+        window.game_state = GameState.Active
+    elif op == "delta":
+        if message["ply"] != len(history) + 1:
+            # A move was missed; start over from the full state.
+            viewer.resync()
+            return
+        # Keep the ply the user is looking at if they have stepped back.
+        shown = None if history.at_end else history.ply
+        if shown is not None:
+            grid.seek(len(history))
+        grid.play_move(grid.position.parse_uci(message["move"]))
+        if shown is not None:
+            grid.seek(shown)
+
+    if "clock" in message:
+        g_sys.clock = message["clock"]
+        g_sys.clock_time = time.monotonic()
+        g_sys.clock_turn = message["turn"]
+    result = message.get("result", "*")
+    if result != "*":
+        g_sys.viewer_result = f"{result} {message.get('reason') or ''}".strip()
+        window.game_state = GameState.GameOver
+
+
+def update_viewer(window: Window, g_sys: GameSystem):
+    viewer = g_sys.viewer
+    for message in viewer.poll():
+        apply_server_message(window, g_sys, message)
+
+    if g_sys.viewer_error:
+        text = g_sys.viewer_error
+    elif not viewer.connected:
+        text = "Disconnected"
+    elif g_sys.viewer_result:
+        text = g_sys.viewer_result
+    elif g_sys.clock is not None:
+        clock = list(g_sys.clock)
+        if len(g_sys.grid.history):
+            clock[g_sys.clock_turn] -= time.monotonic() - g_sys.clock_time
+        text = f"White {format_clock(clock[0])}  Black {format_clock(clock[1])}"
+    else:
+        text = f"Game {viewer.game_id}"
+    if text != g_sys.status_box.text:
+        g_sys.status_box.text = text
+        g_sys.status_box.update_text_pos()
+        g_sys.status_dirty = True
+    window.scheduler.busy = viewer.connected
 
 
 def event_loop(window: Window, g_sys: GameSystem):
     grid = g_sys.grid
-    for event in pygame.event.get():
+    for event in EVENTS.get():
         if event.type == QUIT:
             window.menu_state = MenuState.Quit
 
+        if event.type in (VIDEOEXPOSE, WINDOWEXPOSED):
+            g_sys.full_redraw = True
+
         if event.type == KEYDOWN:
-            pass
+            if event.key == K_s and event.mod & KMOD_CTRL:
+                print(f"Saved {save_game(g_sys)}")
+                print(f"FEN {grid.fen()}")
+            elif event.key == K_h:
+                toggle_hints(grid)
+            elif event.key == K_d:
+                toggle_dtm(g_sys)
+            elif event.key == K_F3:
+                FRAME_PROFILER.toggle_overlay(window.scheduler)
+                g_sys.full_redraw = True
+            elif event.key == K_F4:
+                print("Profile written to " + ", ".join(FRAME_PROFILER.export()))
+            elif navigate_key(grid, event.key):
+                on_navigate(window, g_sys)
+
+        if event.type == MOUSEMOTION:
+            ply = g_sys.timeline.on_mouse_motion(event.pos, len(grid.history))
+            if ply is not None and ply != grid.history.ply:
+                grid.seek(ply)
+                on_navigate(window, g_sys)
+
+        if event.type == MOUSEBUTTONUP:
+            g_sys.timeline.on_mouse_up()
 
         if event.type == MOUSEBUTTONDOWN:
-            grid.get_input(pygame.mouse.get_pos())
+            ply = g_sys.timeline.on_mouse_down(event.pos, len(grid.history))
+            if ply is not None:
+                if ply != grid.history.ply:
+                    grid.seek(ply)
+                    on_navigate(window, g_sys)
+            elif window.game_state == GameState.Active and g_sys.viewer is None and \
+                    not is_computer_turn(g_sys):
+                move = grid.get_input(event.pos)
+                if move is not None:
+                    check_game_over(window, g_sys)
+                    if window.game_state == GameState.Active:
+                        on_human_move(g_sys, move)
 
 
 def update(window: Window, g_sys: GameSystem):
     window.dt = window.ms / 1000.0
-    pass
+
+    if g_sys.dtm_box is not None:
+        update_dtm(g_sys)
+
+    if g_sys.viewer is not None:
+        update_viewer(window, g_sys)
+        return
+
+    engine = g_sys.engine
+    if engine is None:
+        return
+
+    # The search runs in the worker process; only collect what it has
+    # produced since the last frame.
+    for message in engine.poll():
+        if message.search_id != g_sys.search_id:
+            continue
+        if not isinstance(message, EngineBestMove):
+            # Info is shown from engine.latest below.
+            continue
+        if window.game_state != GameState.Active or not is_computer_turn(g_sys):
+            continue
+        g_sys.grid.play_move(message.best_move)
+        check_game_over(window, g_sys)
+        g_sys.ponder_move = message.ponder_move
+        if window.game_state == GameState.Active and g_sys.ponder_move and USER_OPTION["ai_ponder"]:
+            start_search(g_sys, ponder=True)
+
+    if window.game_state == GameState.Active and is_computer_turn(g_sys) and \
+            not engine.busy and g_sys.grid.history.at_end:
+        if not play_book_move(window, g_sys):
+            start_search(g_sys)
+
+    if engine.latest is not g_sys.status_info:
+        g_sys.status_info = engine.latest
+        info = engine.latest
+        if info is None:
+            g_sys.status_box.text = "Thinking..."
+        else:
+            score = info.score_text().replace("cp ", "")
+            g_sys.status_box.text = f"Depth {info.depth}  {score}  {to_uci(info.best_move)}"
+        g_sys.status_box.update_text_pos()
+        g_sys.status_dirty = True
+
+    # Keep waking up to collect results while the worker is searching.
+    window.scheduler.busy = engine.busy
 
 
 def draw(window: Window, g_sys: GameSystem):
-    window.screen.fill([150, 150, 150])
+    # Only the rects that changed are pushed to the display. The whole
+    # screen is repainted on the first frame and when the window is exposed.
+    full = g_sys.full_redraw
+    if full:
+        window.screen.fill([150, 150, 150])
+        g_sys.grid.invalidate()
 
-    g_sys.grid.draw_to(window.screen)
+    rects = g_sys.grid.draw_to(window.screen)
+    grid = g_sys.grid
+    # Board blits, plus one for each other piece drawn below.
+    board_rects = len(rects)
+    timeline_rect = g_sys.timeline.draw_to(window.screen, grid.history.ply, len(grid.history), full)
+    if timeline_rect is not None:
+        rects.append(timeline_rect)
+    if g_sys.status_box is not None and (full or g_sys.status_dirty):
+        g_sys.status_box.draw_to(window.screen)
+        rects.append(g_sys.status_box.rect)
+        g_sys.status_dirty = False
+    if g_sys.dtm_box is not None and (full or g_sys.dtm_dirty):
+        g_sys.dtm_box.draw_to(window.screen)
+        rects.append(g_sys.dtm_box.rect)
+        g_sys.dtm_dirty = False
+    overlay_rect = FRAME_PROFILER.draw_overlay(window.screen, full or bool(rects))
+    if overlay_rect is not None:
+        rects.append(overlay_rect)
+    blits = grid.renderer.blits + len(rects) - board_rects
 
-    pygame.display.update()
+    if full:
+        pygame.display.update()
+        g_sys.full_redraw = False
+        FRAME_PROFILER.count_draw(blits, [window.screen.get_rect()])
+    elif rects:
+        pygame.display.update(rects)
+        FRAME_PROFILER.count_draw(blits, rects)
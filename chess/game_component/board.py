@@ -1,4 +1,4 @@
-from typing import Union, Tuple, List
+from typing import Union, Tuple, List, Optional
 
 import pygame
 
@@ -7,14 +7,25 @@ from chess.chess_exception import ChessException
 
 from chess.user_option import USER_OPTION
 
-from chess.game_component.pieces import (
-    ChessPiece, Empty, Pawn, Rook, Knight, Bishop, Queen, King
-)
+from chess.game_component.pieces import ChessPiece, piece_for
 
-from chess.game_component.id import EntityID
+from chess.game_component.piece_texture import chess_texture
+from chess.game_component.board_renderer import BoardRenderer
+from chess.rules.bitboard import square
+from chess.engine.book import OpeningBook
+from chess.rules.move import move_from, move_to, promotion_kind
+from chess.rules.history import GameHistory
+from chess.rules.pgn import PgnGame, game_result
+from chess.rules.position import Position, QUEEN, START_FEN
 
 
 class ChessBoard:
+    """
+    The on-screen board. It owns no rules of its own: the game state is the
+    headless chess.rules Position, and this class only maps clicks to its
+    moves and hands piece codes to the renderer.
+    """
+
     def __init__(self,
                  screen_width: int,
                  screen_height: int,
@@ -29,24 +40,23 @@ class ChessBoard:
 
         self.first_square_color = first_square_color
         self.second_square_color = second_square_color
-
-        self.arr: List[List[ChessPiece]] = [
-            [Empty(x, y) for x in range(self.arr_width)] for y in range(self.arr_height)
-        ]
-
-        self.arr[0][self.arr_width - 1] = \
-            King(0,
-                 len(self.arr[0]) - 1,
-                 ent_id=EntityID.KingP1,
-                 texture=EntityID.KingP1[1],
-                 empty=False)
-
-        self.arr[0][0] = \
-            King(x=0,
-                 y=len(self.arr[0]) - 1,
-                 ent_id=EntityID.KingP2,
-                 texture=EntityID.KingP2[1],
-                 empty=False)
+        self.selected_color = (246, 246, 105, 255)
+        self.hint_color = (120, 150, 200, 255)
+        self.target_color = (106, 160, 90, 255)
+
+        # The position is the source of truth; pieces are looked up from its
+        # mailbox as shared flyweights, so making a move allocates nothing.
+        self.position = Position()
+        self.history = GameHistory(self.position)
+        self.selected_square = -1
+        self.selected_moves: List[int] = []
+
+        # Opening book hints: the from and to squares of every book move in
+        # the position on screen, looked up once per position.
+        self.book: Optional[OpeningBook] = None
+        self.show_hints = False
+        self.__hint_key = None
+        self.__hint_moves: List[int] = []
 
         self.grid_square_width = USER_OPTION.get("grid_square_width")
         self.grid_square_height = USER_OPTION.get("grid_square_height")
@@ -61,39 +71,154 @@ class ChessBoard:
         self.x = (screen_width / 2) - (self.grid_surface_width / 2)
         self.y = (screen_height / 2) - (self.grid_surface_height / 2)
 
+        # grid_surface only ever holds the checkered squares; pieces and
+        # highlights are composited onto the screen by the renderer.
+        self.renderer = BoardRenderer(self.x, self.y, self.grid_surface,
+                                      self.grid_square_width, self.grid_square_height,
+                                      chess_texture.piece_textures(self.grid_square_width,
+                                                                   self.grid_square_height))
+
+    def load_fen(self, fen: str):
+        """
+        Sets up the board from a FEN string and starts a new history there.
+        Raises ChessException for an invalid FEN and leaves the board as it
+        was.
+        """
+        position = Position(fen)
+        self.position.restore(position.snapshot())
+        self.history = GameHistory(self.position)
+        self.deselect()
+        self.invalidate()
+
+    def fen(self) -> str:
+        return self.position.fen()
+
+    def load_game(self, game: PgnGame):
+        """
+        Sets up the board at the start of a PGN game and records its moves,
+        then shows the final position.
+        """
+        self.load_fen(game.fen)
+        for move in game.moves:
+            self.history.push(move)
+
+    def to_game(self, headers: dict = None) -> PgnGame:
+        """
+        Returns the moves played so far (up to the end of the history, not
+        just up to the ply on screen) as a PgnGame.
+        """
+        history = self.history
+        shown = history.ply
+        history.seek(0)
+        headers = dict(headers or {})
+        start = self.position.fen()
+        if start != START_FEN:
+            headers["FEN"] = start
+        history.seek(len(history))
+        game = PgnGame(headers, list(history.moves), result=game_result(self.position))
+        history.seek(shown)
+        return game
+
+    def piece_at(self, x: int, y: int) -> ChessPiece:
+        return piece_for(self.position.board[square(x, y)])
+
     def update(self):
         pass
 
-    def get_input(self, clicked_position: Tuple[int, int]):
+    def play_move(self, move: int):
+        self.history.push(move)
+        self.deselect()
+
+    def undo_move(self) -> int:
+        move = self.history.undo()
+        self.deselect()
+        return move
+
+    def redo_move(self) -> int:
+        move = self.history.redo()
+        self.deselect()
+        return move
+
+    def seek(self, ply: int):
+        """
+        Shows the position after the given ply of the game. The renderer
+        only redraws the squares that differ from what is on screen.
+        """
+        self.history.seek(ply)
+        self.deselect()
+
+    def deselect(self):
+        self.selected_square = -1
+        self.selected_moves = []
+
+    def square_at(self, clicked_position: Tuple[int, int]) -> Optional[Tuple[int, int]]:
         mx, my = clicked_position
-        if (mx < self.x or mx > self.x + self.grid_surface_width) or \
-            (my < self.y or my > self.y + self.grid_surface_height):
-            print("bad coords!")
-            return
+        if (mx < self.x or mx >= self.x + self.grid_surface_width) or \
+                (my < self.y or my >= self.y + self.grid_surface_height):
+            return None
 
         rx = int((mx - self.x) // self.grid_square_width)
         ry = abs(int((my - self.y) // self.grid_square_height) - 7)
-
-        print(f"Rel X: {rx}, Rel Y: {ry}")
-        print(f"Chess Position: {chr(ord('a')+rx)}{ry+1}")
-
-        if rx < self.arr_width and ry < self.arr_height:
-            piece = self.arr[rx][ry]
-            if piece.ent_id != EntityID.Empty:
-                piece.move(clicked_position)
-
-    def draw_to(self, screen: pygame.Surface):
-        if self.arr is None:
-            raise ChessException("Error: The grid array is empty!")
-
-        for x in range(len(self.arr)):
-            for y in range(len(self.arr[x])):
-                piece = self.arr[x][y]
-                if piece.ent_id[0] != 0:
-                    self.grid_surface.blit(piece.texture, [x * self.grid_square_width,
-                                                           y * self.grid_square_height])
-
-        screen.blit(self.grid_surface, [self.x, self.y])
+        return rx, ry
+
+    def get_input(self, clicked_position: Tuple[int, int]) -> Optional[int]:
+        """
+        Handles a click on the board. The first click selects a piece of the
+        side to move, the second click plays one of its legal moves (pawns
+        promote to a queen). Returns the move played, if any.
+        """
+        coords = self.square_at(clicked_position)
+        if coords is None:
+            print("bad coords!")
+            return None
+
+        rx, ry = coords
+        sq = square(rx, ry)
+        for move in self.selected_moves:
+            if move_to(move) == sq and promotion_kind(move) in (0, QUEEN):
+                self.play_move(move)
+                return move
+
+        piece = self.piece_at(rx, ry)
+        if not piece.empty and piece.color == self.position.turn:
+            self.selected_square = sq
+            self.selected_moves = piece.get_legal_moves(self.position, sq)
+        else:
+            self.deselect()
+        return None
+
+    def book_moves(self) -> List[int]:
+        if self.book is None:
+            return []
+        if self.__hint_key != self.position.hash:
+            self.__hint_key = self.position.hash
+            self.__hint_moves = [move for move, _ in self.book.moves(self.position)]
+        return self.__hint_moves
+
+    def highlights(self) -> dict:
+        squares = {}
+        if self.show_hints:
+            for move in self.book_moves():
+                squares[move_from(move)] = self.hint_color
+                squares[move_to(move)] = self.hint_color
+        if self.selected_square != -1:
+            squares[self.selected_square] = self.selected_color
+            for move in self.selected_moves:
+                squares[move_to(move)] = self.target_color
+        return squares
+
+    def invalidate(self, sq: int = None):
+        self.renderer.invalidate(sq)
+
+    def draw_to(self, screen: pygame.Surface) -> List[pygame.Rect]:
+        """
+        Draws the squares that changed since the last call and returns their
+        screen rects for pygame.display.update.
+        """
+        if self.position is None:
+            raise ChessException("Error: The board has no position!")
+
+        return self.renderer.render(screen, self.position.board, self.highlights())
 
     def __draw_rect_on_grid_surf(self, x: int, y: int, color: Color):
         pygame.draw.rect(self.grid_surface,
@@ -109,4 +234,4 @@ class ChessBoard:
                 if (x + y) % 2 == 0:
                     self.__draw_rect_on_grid_surf(x, y, self.second_square_color)
                 else:
-                    self.__draw_rect_on_grid_surf(x, y, self.first_square_color)
\ No newline at end of file
+                    self.__draw_rect_on_grid_surf(x, y, self.first_square_color)
@@ -0,0 +1,95 @@
+# board_renderer.py: Draws the chess board to the screen one square at a time,
+# only where something changed since the last frame.
+
+from typing import Dict, List, Optional, Tuple, Union
+
+import pygame
+
+from base.common import Color
+
+
+class BoardRenderer:
+    """
+    Layered board renderer. The checkered squares live on a static background
+    surface that is never drawn over. For every square the renderer remembers
+    what it last put on screen (piece code and highlight color); a square is
+    redrawn only when that changes or it has been invalidated, e.g. by an
+    animation passing over it. render() returns the screen rects it touched
+    so that only those are handed to pygame.display.update.
+    """
+
+    def __init__(self,
+                 x: float,
+                 y: float,
+                 background: pygame.Surface,
+                 square_width: int,
+                 square_height: int,
+                 textures: List[pygame.Surface]):
+        self.x = int(x)
+        self.y = int(y)
+        self.background = background
+        self.square_width = square_width
+        self.square_height = square_height
+        self.textures = textures
+
+        self.drawn: List[Optional[Tuple[int, Optional[tuple]]]] = [None] * 64
+        self.full_redraw = True
+        # Blits and fills made by the last render, for the frame profiler.
+        self.blits = 0
+
+    def square_rect(self, sq: int) -> pygame.Rect:
+        return pygame.Rect(self.x + (sq & 7) * self.square_width,
+                           self.y + (7 - (sq >> 3)) * self.square_height,
+                           self.square_width,
+                           self.square_height)
+
+    @property
+    def rect(self) -> pygame.Rect:
+        return pygame.Rect(self.x, self.y, self.background.get_width(), self.background.get_height())
+
+    def invalidate(self, sq: int = None) -> None:
+        """
+        Forces a square (or, without an argument, the whole board) to be
+        redrawn on the next render.
+        """
+        if sq is None:
+            self.full_redraw = True
+        else:
+            self.drawn[sq] = None
+
+    def render(self,
+               screen: pygame.Surface,
+               codes: List[int],
+               highlights: Dict[int, Union[tuple, Color]]) -> List[pygame.Rect]:
+        full = self.full_redraw
+        blits = 0
+        if full:
+            screen.blit(self.background, (self.x, self.y))
+            blits += 1
+
+        rects = []
+        drawn = self.drawn
+        for sq in range(64):
+            state = (codes[sq], highlights.get(sq))
+            if not full and drawn[sq] == state:
+                continue
+            drawn[sq] = state
+
+            rect = self.square_rect(sq)
+            if state[1] is not None:
+                screen.fill(state[1], rect)
+                blits += 1
+            elif not full:
+                screen.blit(self.background, rect,
+                            pygame.Rect(rect.x - self.x, rect.y - self.y, rect.w, rect.h))
+                blits += 1
+            if state[0]:
+                screen.blit(self.textures[state[0]], rect)
+                blits += 1
+            rects.append(rect)
+
+        self.blits = blits
+        if full:
+            self.full_redraw = False
+            return [self.rect]
+        return rects
@@ -1,31 +1,124 @@
+import os
+from typing import Dict, List, Tuple
+
 import pygame
 from chess.chess_exception import ChessException
 from chess.user_option import USER_OPTION
 
+ATLAS_PATH = "resource/images/chess_atlas.png"
+CACHE_DIR = "resource/cache/textures"
+
 
 class __ChessTexture:
+    """
+    Piece texture sets from the atlas. Each row of the atlas is one set of six
+    pieces (pawn, knight, bishop, rook, queen, king). Sets are only built
+    when asked for, and each set scaled to a square size is written to
+    CACHE_DIR as a single strip, so later launches load that small file
+    instead of decoding and scaling the whole atlas.
+    """
+
     def __init__(self):
-        self.chess_set = []
         self.image_size = 128
-        self.atlas = pygame.image.load("resource/images/chess_atlas.png").convert()
-        for y in range(0, self.atlas.get_height() // self.image_size):
-            lst = []
-            for x in range(0, self.atlas.get_width() // self.image_size):
-                rect = pygame.Rect(x * self.image_size,
-                                   y * self.image_size,
-                                   self.image_size,
-                                   self.image_size)
-
-                subsurface = self.atlas.subsurface(rect)
-                if subsurface is None:
-                    raise ChessException("Unable to get subsurface from atlas.")
-                subsurface = subsurface.convert()
-                subsurface = pygame.transform.scale(subsurface, [USER_OPTION["grid_square_width"],
-                                                                 USER_OPTION["grid_square_height"]])
-                subsurface.set_colorkey([0, 0, 0])
-                lst.append(subsurface)
-
-            self.chess_set.append(lst)
+        self.atlas = None
+        self.__sets: Dict[Tuple[int, int, int], List[pygame.Surface]] = {}
+        self.__pieces: Dict[Tuple[int, int, int, int], List[pygame.Surface]] = {}
+
+    def __load_atlas(self) -> pygame.Surface:
+        if self.atlas is None:
+            self.atlas = pygame.image.load(ATLAS_PATH).convert()
+        return self.atlas
+
+    @staticmethod
+    def __cache_path(index: int, width: int, height: int) -> str:
+        return os.path.join(CACHE_DIR, f"set{index}_{width}x{height}.png")
+
+    def __load_cached(self, path: str) -> List[pygame.Surface]:
+        # A cache file older than the atlas is stale.
+        if not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(ATLAS_PATH):
+            return []
+        try:
+            strip = pygame.image.load(path).convert()
+        except pygame.error:
+            return []
+        width = strip.get_width() // 6
+        height = strip.get_height()
+        tiles = []
+        for x in range(6):
+            tile = strip.subsurface(pygame.Rect(x * width, 0, width, height)).copy()
+            tile.set_colorkey([0, 0, 0])
+            tiles.append(tile)
+        return tiles
+
+    def __build(self, index: int, width: int, height: int) -> List[pygame.Surface]:
+        atlas = self.__load_atlas()
+        if not 0 <= index < atlas.get_height() // self.image_size:
+            raise ChessException(f"No texture set {index} in the atlas.")
+
+        tiles = []
+        for x in range(0, atlas.get_width() // self.image_size):
+            rect = pygame.Rect(x * self.image_size,
+                               index * self.image_size,
+                               self.image_size,
+                               self.image_size)
+
+            subsurface = atlas.subsurface(rect)
+            if subsurface is None:
+                raise ChessException("Unable to get subsurface from atlas.")
+            subsurface = subsurface.convert()
+            subsurface = pygame.transform.scale(subsurface, [width, height])
+            subsurface.set_colorkey([0, 0, 0])
+            tiles.append(subsurface)
+        return tiles
+
+    def __save_cached(self, path: str, tiles: List[pygame.Surface]) -> None:
+        width, height = tiles[0].get_size()
+        strip = pygame.Surface([width * len(tiles), height]).convert()
+        for x, tile in enumerate(tiles):
+            strip.blit(tile, [x * width, 0])
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            pygame.image.save(strip, path)
+        except (OSError, pygame.error):
+            # The cache only saves time; a read-only install still works.
+            pass
+
+    def get_set(self, index: int, width: int = None, height: int = None) -> List[pygame.Surface]:
+        """
+        Returns the six piece textures of one atlas row scaled to the given
+        size (the grid square size by default).
+        """
+        width = width or USER_OPTION["grid_square_width"]
+        height = height or USER_OPTION["grid_square_height"]
+        key = (index, width, height)
+        tiles = self.__sets.get(key)
+        if tiles is not None:
+            return tiles
+
+        path = self.__cache_path(index, width, height)
+        tiles = self.__load_cached(path)
+        if not tiles:
+            tiles = self.__build(index, width, height)
+            self.__save_cached(path, tiles)
+        self.__sets[key] = tiles
+        return tiles
+
+    def piece_textures(self, width: int = None, height: int = None) -> List[pygame.Surface]:
+        """
+        Returns the textures of the two chosen sets indexed by piece code
+        (entity id): index 0 is an empty surface, 1-6 are player one's set and
+        7-12 player two's.
+        """
+        width = width or USER_OPTION["grid_square_width"]
+        height = height or USER_OPTION["grid_square_height"]
+        key = (USER_OPTION["player_one_index"], USER_OPTION["player_two_index"], width, height)
+        textures = self.__pieces.get(key)
+        if textures is None:
+            textures = [pygame.Surface([0, 0])]
+            textures += self.get_set(key[0], width, height)
+            textures += self.get_set(key[1], width, height)
+            self.__pieces[key] = textures
+        return textures
 
 
 chess_texture = __ChessTexture()
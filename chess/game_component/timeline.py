@@ -0,0 +1,81 @@
+# timeline.py: The scrubber under the board. A bar spanning the whole game
+# with a knob at the ply on screen; clicking or dragging on it jumps there.
+
+from typing import Optional, Union
+
+import pygame
+
+from base.common import Color
+from base.font_cache import FONTS, TEXT_CACHE
+
+
+class Timeline:
+    def __init__(self,
+                 x: float,
+                 y: float,
+                 width: int,
+                 height: int = 24,
+                 bar_color: Union[Color, tuple] = Color.Silver,
+                 knob_color: Union[Color, tuple] = Color.DarkGreen,
+                 background_color: Union[Color, tuple] = (150, 150, 150)):
+        self.rect = pygame.Rect(int(x), int(y), width, height)
+        self.bar_color = bar_color
+        self.knob_color = knob_color
+        self.background_color = background_color
+        self.label_width = 110
+        self.bar = pygame.Rect(self.rect.x, self.rect.y + height // 3,
+                               width - self.label_width, height // 3)
+        self.font = FONTS.get(size=20)
+
+        self.dragging = False
+        self.drawn = None
+
+    def ply_at(self, mouse_pos: tuple, length: int) -> Optional[int]:
+        """
+        Returns the ply under the mouse, or None when it is off the bar.
+        While dragging, positions past either end clamp to it.
+        """
+        mx, my = mouse_pos
+        if not self.dragging and not self.rect.collidepoint(mx, my):
+            return None
+        if not self.dragging and mx >= self.bar.right:
+            return None
+        fraction = (mx - self.bar.x) / max(self.bar.width, 1)
+        return max(0, min(length, round(fraction * length)))
+
+    def on_mouse_down(self, mouse_pos: tuple, length: int) -> Optional[int]:
+        ply = self.ply_at(mouse_pos, length)
+        self.dragging = ply is not None
+        return ply
+
+    def on_mouse_motion(self, mouse_pos: tuple, length: int) -> Optional[int]:
+        if not self.dragging:
+            return None
+        return self.ply_at(mouse_pos, length)
+
+    def on_mouse_up(self) -> None:
+        self.dragging = False
+
+    def draw_to(self, screen: pygame.Surface, ply: int, length: int, force: bool = False) -> Optional[pygame.Rect]:
+        """
+        Draws the bar if the ply or the game length changed since the last
+        call and returns its rect, or None when nothing was drawn.
+        """
+        state = (ply, length)
+        if not force and self.drawn == state:
+            return None
+        self.drawn = state
+
+        # The knob may stick out half its width past the bar, so clear that
+        # margin too or the old knob leaves a sliver behind.
+        dirty = self.rect.inflate(8, 0)
+        screen.fill(self.background_color, dirty)
+        screen.fill(self.bar_color, self.bar)
+        knob_x = self.bar.x + (self.bar.width * ply // length if length else 0)
+        knob = pygame.Rect(0, self.rect.y, 8, self.rect.height)
+        knob.centerx = knob_x
+        screen.fill(self.knob_color, knob)
+
+        label = TEXT_CACHE.render(self.font, f"{ply} / {length}", Color.Black)
+        screen.blit(label, (self.bar.right + 12, self.rect.centery - label.get_height() // 2))
+        return dirty
@@ -1,17 +1,22 @@
 import pygame
 from pygame.constants import *
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 from base.window import Window, MenuState
 from base.common import Color, GameFont, MouseButton
+from base.events import EVENTS
+from base.profiler import FRAME_PROFILER
+from base.scheduler import IdleScheduler
+from base.settings import SCREEN_SETTING
 from chess.menu_entities import MainMenuFamily, OptionMenuFamily
 
 
 @dataclass
 class MenuSystem:
-    main_menu: MainMenuFamily = MainMenuFamily()
-    option_menu: OptionMenuFamily = OptionMenuFamily()
+    main_menu: MainMenuFamily = field(default_factory=MainMenuFamily)
+    option_menu: OptionMenuFamily = field(default_factory=OptionMenuFamily)
+    dirty: bool = True
 
 
 def initialize(window: Window, m_sys: MenuSystem):
@@ -19,6 +24,7 @@ def initialize(window: Window, m_sys: MenuSystem):
     window.screen_width = window.screen.get_width()
     window.screen_height = window.screen.get_height()
     window.clock = pygame.time.Clock()
+    window.scheduler = IdleScheduler(window.clock, SCREEN_SETTING["fps"])
     window.screen_width = window.screen.get_width()
     window.screen_height = window.screen.get_height()
 
@@ -32,16 +38,25 @@ def initialize(window: Window, m_sys: MenuSystem):
 
 
 def event_loop(window: Window, m_sys: MenuSystem):
-    for event in pygame.event.get():
+    for event in EVENTS.get():
         if event.type == QUIT:
             window.menu_state = MenuState.Quit
 
+        if event.type in (VIDEOEXPOSE, WINDOWEXPOSED):
+            m_sys.dirty = True
+
         if event.type == KEYDOWN:
-            pass
+            if event.key == K_F3:
+                FRAME_PROFILER.toggle_overlay(window.scheduler)
+                m_sys.dirty = True
+            elif event.key == K_F4:
+                print("Profile written to " + ", ".join(FRAME_PROFILER.export()))
 
         if event.type == MOUSEBUTTONDOWN:
             if event.button == MouseButton.Left:
-                mouse_pos = pygame.mouse.get_pos()
+                # Any click may change a label or switch menus.
+                m_sys.dirty = True
+                mouse_pos = event.pos
                 if window.menu_state == MenuState.Menu:
                     m_sys.main_menu.listen_for_button_events(mouse_pos, window)
                 elif window.menu_state == MenuState.Options:
@@ -53,13 +68,24 @@ def update(window: Window, m_sys: MenuSystem):
 
 
 def draw(window: Window, m_sys: MenuSystem):
+    # The menus are static between clicks, so only draw after one.
+    if not m_sys.dirty:
+        overlay_rect = FRAME_PROFILER.draw_overlay(window.screen)
+        if overlay_rect is not None:
+            pygame.display.update(overlay_rect)
+            FRAME_PROFILER.count_draw(1, [overlay_rect])
+        return
+    m_sys.dirty = False
     window.screen.fill(Color.Silver)
 
+    entities = []
     if window.menu_state == MenuState.Menu:
-        for ent in m_sys.main_menu.entities:
-            ent.draw_to(window.screen)
+        entities = m_sys.main_menu.entities
     elif window.menu_state == MenuState.Options:
-        for ent in m_sys.option_menu.entities:
-            ent.draw_to(window.screen)
+        entities = m_sys.option_menu.entities
+    for ent in entities:
+        ent.draw_to(window.screen)
+    FRAME_PROFILER.draw_overlay(window.screen, True)
 
     pygame.display.update()
+    FRAME_PROFILER.count_draw(len(entities) + FRAME_PROFILER.overlay_visible, [window.screen.get_rect()])
@@ -5,6 +5,7 @@ from base.gui import TextBox, Button
 from base.family import Family
 from base.window import Window
 from base.state_classes import MenuState
+from chess.user_option import USER_OPTION, PlayerType
 
 
 @dataclass
@@ -76,6 +77,7 @@ class MainMenuFamily(Family):
 class OptionMenuFamily(Family):
     options_text_box: TextBox = None
     sounds_button: Button = None
+    opponent_button: Button = None
     mm_button: Button = None
 
     __toggle_sound: bool = False
@@ -89,6 +91,19 @@ class OptionMenuFamily(Family):
             self.sounds_button.update_text_pos()
         self.__toggle_sound = not self.__toggle_sound
 
+    def __opponent_button_text(self) -> str:
+        if USER_OPTION["player_two_type"] == PlayerType.Computer:
+            return "Opponent: Computer"
+        return "Opponent: Human"
+
+    def __opponent_button_action(self, window: Window):
+        if USER_OPTION["player_two_type"] == PlayerType.Computer:
+            USER_OPTION["player_two_type"] = PlayerType.Human
+        else:
+            USER_OPTION["player_two_type"] = PlayerType.Computer
+        self.opponent_button.text = self.__opponent_button_text()
+        self.opponent_button.update_text_pos()
+
     def __mm_button_action(self, window: Window):
         window.menu_state = MenuState.Menu
 
@@ -113,6 +128,17 @@ class OptionMenuFamily(Family):
         self.sounds_button.update_text_pos()
         self.sounds_button.set_pos([window.screen_width // 2 - self.sounds_button.width // 2, 140])
 
+        self.opponent_button = Button(pos=[0, 0],
+                                      size=[200, 50],
+                                      background_color=Color.RayWhite,
+                                      text=self.__opponent_button_text(),
+                                      text_size=20,
+                                      text_color=Color.Black,
+                                      action=self.__opponent_button_action)
+
+        self.opponent_button.update_text_pos()
+        self.opponent_button.set_pos([window.screen_width // 2 - self.opponent_button.width // 2, 210])
+
         self.mm_button = Button(pos=[0, 0],
                                 size=[200, 50],
                                 background_color=Color.RayWhite,
@@ -0,0 +1,191 @@
+# bench.py: Load test for the game server.
+#
+# Opens a number of client connections, each of which creates its share of
+# the games, takes both seats and plays random legal moves round-robin over
+# them. Each move is timed from sending it to receiving its delta. By
+# default the server runs in this process (so its own latency figures are
+# available directly); given an address it load-tests a running server.
+
+import asyncio
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+from base.stats import RollingStats
+from chess.chess_exception import ChessException
+from chess.net.protocol import MAX_LINE, encode, decode, parse_address
+from chess.net.server import GameServer, measure_game_memory
+from chess.rules.move import to_uci
+from chess.rules.position import Position
+
+
+@dataclass
+class BenchResult:
+    games: int = 0
+    connections: int = 0
+    moves: int = 0
+    errors: int = 0
+    seconds: float = 0.0
+    round_trip: RollingStats = field(default_factory=lambda: RollingStats(1 << 16))
+    server: dict = field(default_factory=dict)
+    traced_game_bytes: int = 0
+
+    @property
+    def moves_per_second(self) -> float:
+        return self.moves / self.seconds if self.seconds > 0 else 0.0
+
+    def report(self) -> str:
+        trip = self.round_trip.summary()
+        latency = self.server.get("move_latency_ms", {})
+        lines = [
+            f"{self.games} games over {self.connections} connections: {self.moves} moves in "
+            f"{self.seconds:.2f}s ({self.moves_per_second:.0f} moves/s), {self.errors} errors",
+            f"round trip ms     p50 {trip['p50'] * 1000:7.3f}  p95 {trip['p95'] * 1000:7.3f}  "
+            f"p99 {trip['p99'] * 1000:7.3f}  max {trip['max'] * 1000:7.3f}",
+        ]
+        if latency:
+            lines.append(f"server handling   p50 {latency['p50']:7.3f}  p95 {latency['p95']:7.3f}  "
+                         f"p99 {latency['p99']:7.3f}  max {latency['max']:7.3f}")
+        if self.server:
+            lines.append(f"memory per game   {self.server['game_bytes']:,} bytes (object sizes, "
+                         f"{self.server['games']} games open)")
+        if self.traced_game_bytes:
+            lines.append(f"                  {self.traced_game_bytes:,} bytes (tracemalloc)")
+        return "\n".join(lines)
+
+
+async def _open(address: str):
+    kind = parse_address(address)
+    if kind[0] == "unix":
+        return await asyncio.open_unix_connection(kind[1], limit=MAX_LINE)
+    return await asyncio.open_connection(kind[1], kind[2], limit=MAX_LINE)
+
+
+async def _read(reader) -> dict:
+    while True:
+        line = await reader.readline()
+        if not line:
+            raise ChessException("server closed the connection")
+        message = decode(line)
+        if message is not None:
+            return message
+
+
+async def _request(reader, writer, message: dict, ops: tuple) -> dict:
+    writer.write(encode(message))
+    while True:
+        reply = await _read(reader)
+        if reply["op"] in ops + ("error",):
+            return reply
+
+
+async def _move(reader, writer, game_id: int, ply: int, text: str, finished: set) -> dict:
+    """
+    Sends a move and returns its reply: the delta for that game and ply, or
+    the error. Requests on a connection are answered in order, so an error
+    is this request's. Ends that arrive meanwhile (clocks that ran out) go
+    to finished.
+    """
+    writer.write(encode({"op": "move", "game": game_id, "move": text}))
+    while True:
+        reply = await _read(reader)
+        op = reply["op"]
+        if op == "error":
+            return reply
+        if op == "end":
+            finished.add(reply["game"])
+        elif op == "delta" and reply["game"] == game_id and reply["ply"] == ply:
+            return reply
+
+
+async def _drain_end(reader, game_id: int, finished: set) -> None:
+    """
+    Reads up to the "end" the server sends after the delta of a game's last
+    move, so it is not taken for the reply to a later request.
+    """
+    while True:
+        reply = await _read(reader)
+        if reply["op"] == "end":
+            finished.add(reply["game"])
+            if reply["game"] == game_id:
+                return
+
+
+async def _player(address: str, games: int, plies: int, clock: Optional[list], seed: int,
+                  result: BenchResult) -> None:
+    rng = random.Random(seed)
+    reader, writer = await _open(address)
+    boards = {}
+    finished = set()
+    try:
+        for _ in range(games):
+            created = await _request(reader, writer, {"op": "create", "clock": clock}, ("created",))
+            game_id = created["game"]
+            for seat in ("white", "black"):
+                await _request(reader, writer, {"op": "join", "game": game_id, "as": seat}, ("state",))
+            boards[game_id] = Position()
+
+        for _ in range(plies):
+            for game_id, position in list(boards.items()):
+                moves = position.legal_moves()
+                if not moves or game_id in finished:
+                    del boards[game_id]
+                    continue
+                move = rng.choice(moves)
+                start = time.perf_counter()
+                reply = await _move(reader, writer, game_id, len(position.stack) + 1, to_uci(move), finished)
+                result.round_trip.record(time.perf_counter() - start)
+                if reply["op"] == "error":
+                    # A game whose clock ran out is over, not a failure.
+                    if game_id not in finished:
+                        result.errors += 1
+                    del boards[game_id]
+                    continue
+                result.moves += 1
+                position.make_move(move)
+                if reply.get("result", "*") != "*":
+                    await _drain_end(reader, game_id, finished)
+                    del boards[game_id]
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+
+async def run_bench(games: int = 1000, connections: int = 50, plies: int = 40,
+                    clock: Optional[list] = None, address: str = None, seed: int = 1) -> BenchResult:
+    """
+    Plays games random games to at most plies plies over the given number
+    of connections. Without an address a server is started in this process
+    on a free local port.
+    """
+    server = None
+    if address is None:
+        server = GameServer()
+        address = await server.start("127.0.0.1:0")
+    result = BenchResult(games=games, connections=connections)
+    shares = [games // connections + (1 if i < games % connections else 0) for i in range(connections)]
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(_player(address, share, plies, clock, seed + i, result)
+                               for i, share in enumerate(shares) if share))
+        result.seconds = time.perf_counter() - start
+        if server is not None:
+            result.server = server.stats()
+        else:
+            reader, writer = await _open(address)
+            result.server = await _request(reader, writer, {"op": "stats"}, ("stats",))
+            writer.close()
+            await writer.wait_closed()
+    finally:
+        if server is not None:
+            await server.close()
+    return result
+
+
+def bench(games: int = 1000, connections: int = 50, plies: int = 40, clock: Optional[list] = None,
+          address: str = None, trace_memory: bool = True) -> BenchResult:
+    result = asyncio.run(run_bench(games, connections, plies, clock, address))
+    if trace_memory:
+        result.traced_game_bytes = measure_game_memory(min(games, 1000), plies)
+    return result
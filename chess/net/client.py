@@ -0,0 +1,110 @@
+# client.py: A blocking connection to the game server for the pygame
+# client.
+#
+# The render loop must never wait on the network, so a background thread
+# reads the socket and queues each message. The game calls poll() once per
+# frame to collect whatever has arrived, the same way it polls the engine
+# worker.
+
+import queue
+import socket
+import threading
+from typing import List, Optional
+
+from chess.chess_exception import ChessException
+from chess.net.protocol import encode, decode, parse_address
+
+
+def connect(address: str, timeout: float = 5.0) -> socket.socket:
+    kind = parse_address(address)
+    try:
+        if kind[0] == "unix":
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(timeout)
+            sock.connect(kind[1])
+        else:
+            sock = socket.create_connection(kind[1:], timeout=timeout)
+    except OSError as e:
+        raise ChessException(f"Cannot connect to {address}: {e}")
+    sock.settimeout(None)
+    return sock
+
+
+class ServerConnection:
+    def __init__(self, address: str):
+        self.address = address
+        self.sock = connect(address)
+        self.messages: "queue.Queue[dict]" = queue.Queue()
+        self.connected = True
+        self.__send_lock = threading.Lock()
+        self.__reader = threading.Thread(target=self.__read, name="server-reader", daemon=True)
+        self.__reader.start()
+
+    def __read(self) -> None:
+        stream = self.sock.makefile("rb")
+        try:
+            for line in stream:
+                message = decode(line)
+                if message is not None:
+                    self.messages.put(message)
+        except (OSError, ValueError):
+            pass
+        self.connected = False
+
+    def send(self, message: dict) -> None:
+        with self.__send_lock:
+            try:
+                self.sock.sendall(encode(message))
+            except OSError:
+                self.connected = False
+
+    def poll(self) -> List[dict]:
+        """
+        Returns every message that has arrived since the last call, without
+        blocking.
+        """
+        messages = []
+        while True:
+            try:
+                messages.append(self.messages.get_nowait())
+            except queue.Empty:
+                return messages
+
+    def wait(self, op: str, timeout: float = 5.0) -> Optional[dict]:
+        """
+        Blocks until a message with the given op (or an error) arrives and
+        returns it; other messages are dropped. Meant for headless tools.
+        """
+        while True:
+            try:
+                message = self.messages.get(timeout=timeout)
+            except queue.Empty:
+                return None
+            if message["op"] in (op, "error"):
+                return message
+
+    def close(self) -> None:
+        self.connected = False
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+
+class GameViewer(ServerConnection):
+    """
+    Watches one game. The first message after connecting is its full
+    "state"; every move after that arrives as a "delta".
+    """
+
+    def __init__(self, address: str, game_id: int):
+        super().__init__(address)
+        self.game_id = game_id
+        self.resync()
+
+    def resync(self) -> None:
+        """
+        Asks for the full state again, e.g. after missing a delta.
+        """
+        self.send({"op": "join", "game": self.game_id, "as": "watch"})
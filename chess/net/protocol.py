@@ -0,0 +1,72 @@
+# protocol.py: The game server's wire format.
+#
+# Every message is one line of JSON with an "op" field, in both directions.
+#
+#   client -> server
+#     {"op": "create", "fen": <fen>?, "clock": [seconds, increment]?}
+#     {"op": "join", "game": id, "as": "white" | "black" | "watch"}
+#     {"op": "leave", "game": id}
+#     {"op": "move", "game": id, "move": "e2e4"}
+#     {"op": "resign", "game": id}
+#     {"op": "list"}
+#     {"op": "stats"}
+#
+#   server -> client
+#     {"op": "created", "game": id}
+#     {"op": "state", "game": id, "fen": <start fen>, "moves": [...],
+#      "turn": 0 | 1, "clock": [white, black], "result": "*" | "1-0" | ...,
+#      "reason": ...}
+#     {"op": "delta", "game": id, "ply": n, "move": "e2e4",
+#      "squares": [[square, piece], ...], "turn": 0 | 1,
+#      "clock": [white, black], "result": ..., "reason": ...}
+#     {"op": "end", "game": id, "result": ..., "reason": ...}
+#     {"op": "games", "games": [...]}
+#     {"op": "stats", ...}
+#     {"op": "error", "reason": <text>, "request": <the op that failed>}
+#
+# A join answers with the full "state" of the game; after that the client
+# gets a "delta" per move: the move, the squares it changed (square index
+# 0-63 from a1, piece code 0-12 as in Position.board), the side to move
+# (0 white) and both clocks in seconds as of the message. From the first
+# move on, the side to move's clock keeps running after the message. Clocks
+# are null for games without one. Every move is answered with its "delta" or
+# an "error"; an "end" goes to every viewer when the game is over, after the
+# last "delta" or on its own when a clock runs out.
+
+import json
+from typing import Optional, Tuple
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 7654
+# Longest line either side accepts; a full state of a very long game fits
+# comfortably.
+MAX_LINE = 1 << 16
+
+
+def parse_address(text: str) -> Tuple[str, ...]:
+    """
+    Returns ("unix", path) for a path (anything with a "/") or
+    ("tcp", host, port) for "host:port", ":port" or "port".
+    """
+    if "/" in text:
+        return "unix", text
+    host, _, port = text.rpartition(":")
+    return "tcp", host or DEFAULT_HOST, int(port or DEFAULT_PORT)
+
+
+def encode(message: dict) -> bytes:
+    return json.dumps(message, separators=(",", ":")).encode("utf-8") + b"\n"
+
+
+def decode(line: bytes) -> Optional[dict]:
+    """
+    Returns the message on a line, or None if it is not a JSON object with
+    an "op".
+    """
+    try:
+        message = json.loads(line)
+    except (ValueError, UnicodeDecodeError):
+        return None
+    if not isinstance(message, dict) or not isinstance(message.get("op"), str):
+        return None
+    return message
@@ -0,0 +1,444 @@
+# server.py: An asyncio server hosting many headless games in one process.
+#
+# Games are plain objects held in a dict: a Position, the connections in
+# its seats and its viewers, and an optional clock. Nothing runs per game
+# between moves. A move is checked and played in one synchronous step, and
+# the resulting delta is encoded once and written to every viewer's
+# transport without waiting, so a move costs the same however many games
+# are open. The only per-game task is the flag timer of a running clock,
+# a loop.call_later handle that is replaced on each move.
+#
+# A viewer that stops reading is dropped once MAX_BUFFER bytes are queued
+# for it, so it cannot grow the server's memory.
+
+import asyncio
+import os
+import random
+import sys
+import time
+import tracemalloc
+from typing import Dict, List, Optional, Set
+
+from base.stats import RollingStats
+from chess.chess_exception import ChessException
+from chess.net.protocol import MAX_LINE, encode, decode, parse_address
+from chess.rules.move import to_uci
+from chess.rules.pgn import game_result
+from chess.rules.position import Position, START_FEN, WHITE, BLACK
+
+# Bytes queued for a client before it counts as too slow and is dropped.
+MAX_BUFFER = 1 << 20
+# Games sampled for the "game_bytes" figure of a stats reply.
+SIZE_SAMPLE = 64
+
+COLORS = {"white": WHITE, "black": BLACK}
+
+
+def outcome(position: Position) -> tuple:
+    """
+    (result, reason) of a position by the rules, ("*", None) while the game
+    goes on.
+    """
+    result = game_result(position)
+    if result == "*":
+        return result, None
+    if not position.legal_moves():
+        return result, "checkmate" if position.in_check() else "stalemate"
+    return result, "fifty move rule" if position.halfmove >= 100 else "repetition"
+
+
+def approx_size(obj, seen: set = None) -> int:
+    """
+    Bytes used by an object and everything it references that is not
+    shared with an object already counted (containers, __dict__ and
+    __slots__).
+    """
+    seen = seen if seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(approx_size(item, seen) for item in obj)
+    elif isinstance(obj, dict):
+        size += sum(approx_size(k, seen) + approx_size(v, seen) for k, v in obj.items())
+    else:
+        if hasattr(obj, "__dict__"):
+            size += approx_size(vars(obj), seen)
+        for name in getattr(type(obj), "__slots__", ()):
+            if hasattr(obj, name):
+                size += approx_size(getattr(obj, name), seen)
+    return size
+
+
+class Clock:
+    """
+    Both sides' remaining time in seconds. The side to move's clock runs
+    from the previous move; nothing runs before the first move.
+    """
+    __slots__ = ("remaining", "increment", "since")
+
+    def __init__(self, seconds: float, increment: float):
+        self.remaining = [float(seconds), float(seconds)]
+        self.increment = float(increment)
+        self.since: Optional[float] = None
+
+    def left(self, color: int, turn: int, now: float) -> float:
+        if color == turn and self.since is not None:
+            return self.remaining[color] - (now - self.since)
+        return self.remaining[color]
+
+    def punch(self, turn: int, now: float) -> bool:
+        """
+        Stops the mover's clock and starts the other. Returns False if the
+        mover's time had already run out.
+        """
+        if self.since is not None:
+            self.remaining[turn] -= now - self.since
+            if self.remaining[turn] <= 0:
+                self.remaining[turn] = 0.0
+                return False
+        self.remaining[turn] += self.increment
+        self.since = now
+        return True
+
+    def to_json(self, turn: int, now: float) -> List[float]:
+        return [round(max(self.left(color, turn, now), 0.0), 3) for color in (WHITE, BLACK)]
+
+
+class ServerGame:
+    __slots__ = ("id", "start_fen", "position", "seats", "viewers", "clock", "timer",
+                 "result", "reason")
+
+    def __init__(self, game_id: int, fen: str = START_FEN, clock: Clock = None):
+        self.id = game_id
+        self.position = Position(fen)
+        self.start_fen = self.position.fen()
+        self.seats: List[Optional["Connection"]] = [None, None]
+        self.viewers: Set["Connection"] = set()
+        self.clock = clock
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.result = "*"
+        self.reason: Optional[str] = None
+
+    @property
+    def over(self) -> bool:
+        return self.result != "*"
+
+    def clock_json(self, now: float) -> Optional[List[float]]:
+        return self.clock.to_json(self.position.turn, now) if self.clock else None
+
+    def state(self, now: float) -> dict:
+        return {"op": "state", "game": self.id, "fen": self.start_fen,
+                "moves": [to_uci(move) for move in self.position.moves()],
+                "turn": self.position.turn, "clock": self.clock_json(now),
+                "result": self.result, "reason": self.reason}
+
+    def summary(self) -> dict:
+        return {"game": self.id, "ply": len(self.position.stack), "result": self.result,
+                "seats": [seat is not None for seat in self.seats], "viewers": len(self.viewers)}
+
+
+class Connection:
+    __slots__ = ("id", "writer", "games")
+
+    def __init__(self, connection_id: int, writer: asyncio.StreamWriter):
+        self.id = connection_id
+        self.writer = writer
+        self.games: Set[int] = set()
+
+    def send_bytes(self, data: bytes) -> None:
+        transport = self.writer.transport
+        if transport.is_closing():
+            return
+        if transport.get_write_buffer_size() > MAX_BUFFER:
+            print(f"Dropping client {self.id}: too far behind")
+            transport.abort()
+            return
+        self.writer.write(data)
+
+    def send(self, message: dict) -> None:
+        self.send_bytes(encode(message))
+
+
+class GameServer:
+    def __init__(self, max_games: int = 100_000):
+        self.max_games = max_games
+        self.games: Dict[int, ServerGame] = {}
+        self.connections: Set[Connection] = set()
+        self.next_game_id = 1
+        self.next_connection_id = 1
+        self.moves = 0
+        self.move_latency = RollingStats()
+        self.started = time.monotonic()
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.tasks: Set[asyncio.Task] = set()
+
+    # ----------------------------------------------------------------- #
+    # Sockets
+    # ----------------------------------------------------------------- #
+    async def start(self, address: str) -> str:
+        """
+        Listens on a "host:port" or a Unix socket path. Returns the address
+        actually bound (useful with port 0).
+        """
+        kind = parse_address(address)
+        if kind[0] == "unix":
+            if os.path.exists(kind[1]):
+                os.unlink(kind[1])
+            self.server = await asyncio.start_unix_server(self._serve, kind[1], limit=MAX_LINE)
+            return kind[1]
+        self.server = await asyncio.start_server(self._serve, kind[1], kind[2], limit=MAX_LINE)
+        host, port = self.server.sockets[0].getsockname()[:2]
+        return f"{host}:{port}"
+
+    async def close(self) -> None:
+        for game in self.games.values():
+            if game.timer is not None:
+                game.timer.cancel()
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        for connection in list(self.connections):
+            connection.writer.close()
+        # Let every connection's task see its socket close and clean up.
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        connection = Connection(self.next_connection_id, writer)
+        self.next_connection_id += 1
+        self.connections.add(connection)
+        task = asyncio.current_task()
+        self.tasks.add(task)
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ValueError, ConnectionError):
+                    # A line over MAX_LINE, or the peer went away.
+                    break
+                if not line:
+                    break
+                self.handle(connection, line)
+                if writer.transport.get_write_buffer_size() > MAX_BUFFER // 2:
+                    await writer.drain()
+        finally:
+            self.disconnect(connection)
+            self.tasks.discard(task)
+            writer.close()
+
+    # ----------------------------------------------------------------- #
+    # Requests
+    # ----------------------------------------------------------------- #
+    def handle(self, connection: Connection, line: bytes) -> None:
+        start = time.perf_counter()
+        message = decode(line)
+        if message is None:
+            connection.send({"op": "error", "reason": "expected a JSON object with an op"})
+            return
+        op = message["op"]
+        handler = getattr(self, "op_" + op, None)
+        if handler is None:
+            connection.send({"op": "error", "reason": f"unknown op {op}", "request": op})
+            return
+        try:
+            handler(connection, message)
+        except (ChessException, KeyError, ValueError, TypeError, IndexError) as e:
+            connection.send({"op": "error", "reason": str(e), "request": op})
+            return
+        except Exception as e:
+            # A bug in a handler must cost one request, not the connection
+            # (or the games it plays in).
+            print(f"Error handling {op} from connection {connection.id}: {e!r}")
+            connection.send({"op": "error", "reason": "internal error", "request": op})
+            return
+        if op == "move":
+            self.move_latency.record(time.perf_counter() - start)
+
+    def game(self, message: dict) -> ServerGame:
+        game = self.games.get(message["game"])
+        if game is None:
+            raise ChessException(f"no game {message['game']}")
+        return game
+
+    def op_create(self, connection: Connection, message: dict) -> None:
+        if len(self.games) >= self.max_games:
+            raise ChessException("server is full")
+        clock = None
+        if message.get("clock"):
+            seconds, increment = message["clock"]
+            clock = Clock(seconds, increment)
+        fen = message.get("fen") or START_FEN
+        if not isinstance(fen, str):
+            raise ValueError("fen must be a string")
+        # Position rejects bad FENs, including ones where a king can be taken.
+        game = ServerGame(self.next_game_id, fen, clock)
+        self.next_game_id += 1
+        game.result, game.reason = outcome(game.position)
+        self.games[game.id] = game
+        connection.send({"op": "created", "game": game.id})
+
+    def op_join(self, connection: Connection, message: dict) -> None:
+        game = self.game(message)
+        seat = message.get("as", "watch")
+        if seat in COLORS:
+            color = COLORS[seat]
+            if game.seats[color] not in (None, connection):
+                raise ChessException(f"{seat} is taken in game {game.id}")
+            game.seats[color] = connection
+        elif seat != "watch":
+            raise ValueError(f"cannot join as {seat}")
+        game.viewers.add(connection)
+        connection.games.add(game.id)
+        connection.send(game.state(time.monotonic()))
+
+    def op_leave(self, connection: Connection, message: dict) -> None:
+        self.leave(self.game(message), connection)
+
+    def op_move(self, connection: Connection, message: dict) -> None:
+        game = self.game(message)
+        if game.over:
+            raise ChessException(f"game {game.id} is over")
+        position = game.position
+        turn = position.turn
+        if game.seats[turn] is not connection:
+            raise ChessException("not your move")
+        move = position.parse_uci(message["move"])
+        if move is None:
+            raise ChessException(f"illegal move {message['move']}")
+
+        now = time.monotonic()
+        if game.clock is not None and not game.clock.punch(turn, now):
+            # Answered with the same error as a move after the flag timer
+            # fired, so every move gets a delta or an error.
+            self.finish(game, "0-1" if turn == WHITE else "1-0", "time")
+            raise ChessException(f"game {game.id} is over")
+        before = position.board[:]
+        position.make_move(move)
+        after = position.board
+        squares = [[sq, after[sq]] for sq in range(64) if before[sq] != after[sq]]
+        game.result, game.reason = outcome(position)
+        self.moves += 1
+
+        self.broadcast(game, {"op": "delta", "game": game.id, "ply": len(position.stack),
+                              "move": to_uci(move), "squares": squares, "turn": position.turn,
+                              "clock": game.clock_json(now),
+                              "result": game.result, "reason": game.reason})
+        if game.over:
+            self.finish(game, game.result, game.reason)
+        elif game.clock is not None:
+            self.start_timer(game, now)
+
+    def op_resign(self, connection: Connection, message: dict) -> None:
+        game = self.game(message)
+        if game.over:
+            raise ChessException(f"game {game.id} is over")
+        if connection is game.seats[WHITE]:
+            self.finish(game, "0-1", "resignation")
+        elif connection is game.seats[BLACK]:
+            self.finish(game, "1-0", "resignation")
+        else:
+            raise ChessException("only a player can resign")
+
+    def op_list(self, connection: Connection, message: dict) -> None:
+        connection.send({"op": "games", "games": [game.summary() for game in self.games.values()]})
+
+    def op_stats(self, connection: Connection, message: dict) -> None:
+        connection.send(dict(op="stats", **self.stats()))
+
+    # ----------------------------------------------------------------- #
+    # Games
+    # ----------------------------------------------------------------- #
+    def broadcast(self, game: ServerGame, message: dict) -> None:
+        data = encode(message)
+        for viewer in game.viewers:
+            viewer.send_bytes(data)
+
+    def start_timer(self, game: ServerGame, now: float) -> None:
+        if game.timer is not None:
+            game.timer.cancel()
+        left = game.clock.left(game.position.turn, game.position.turn, now)
+        game.timer = asyncio.get_running_loop().call_later(max(left, 0.0), self.flag, game)
+
+    def flag(self, game: ServerGame) -> None:
+        game.timer = None
+        if game.over:
+            return
+        turn = game.position.turn
+        game.clock.punch(turn, time.monotonic())
+        self.finish(game, "0-1" if turn == WHITE else "1-0", "time")
+
+    def finish(self, game: ServerGame, result: str, reason: str) -> None:
+        if game.timer is not None:
+            game.timer.cancel()
+            game.timer = None
+        game.result, game.reason = result, reason
+        if game.clock is not None:
+            game.clock.since = None
+        self.broadcast(game, {"op": "end", "game": game.id, "result": result, "reason": reason})
+        self.collect(game)
+
+    def leave(self, game: ServerGame, connection: Connection) -> None:
+        game.viewers.discard(connection)
+        connection.games.discard(game.id)
+        for color in (WHITE, BLACK):
+            if game.seats[color] is connection:
+                game.seats[color] = None
+        self.collect(game)
+
+    def collect(self, game: ServerGame) -> None:
+        # A finished game is dropped once nobody is looking at it.
+        if game.over and not game.viewers:
+            self.games.pop(game.id, None)
+
+    def disconnect(self, connection: Connection) -> None:
+        self.connections.discard(connection)
+        for game_id in list(connection.games):
+            game = self.games.get(game_id)
+            if game is not None:
+                self.leave(game, connection)
+
+    def stats(self) -> dict:
+        """
+        Capacity figures: games and connections, per-move handling latency
+        in milliseconds and the approximate bytes held per game.
+        """
+        latency = {key: round(value * 1000, 3) if key != "count" else value
+                   for key, value in self.move_latency.summary().items()}
+        games = list(self.games.values())
+        sample = random.sample(games, min(SIZE_SAMPLE, len(games)))
+        game_bytes = sum(approx_size(game.position) + sys.getsizeof(game) for game in sample)
+        return {
+            "games": len(games),
+            "active": sum(1 for game in games if not game.over),
+            "connections": len(self.connections),
+            "moves": self.moves,
+            "uptime": round(time.monotonic() - self.started, 1),
+            "move_latency_ms": latency,
+            "game_bytes": game_bytes // len(sample) if sample else 0,
+        }
+
+
+def measure_game_memory(games: int = 1000, plies: int = 40, seed: int = 1) -> int:
+    """
+    Bytes per game measured with tracemalloc: games are created the way the
+    server creates them and each plays plies random moves.
+    """
+    rng = random.Random(seed)
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    hosted = []
+    for game_id in range(games):
+        game = ServerGame(game_id, clock=Clock(300, 2))
+        for _ in range(plies):
+            moves = game.position.legal_moves()
+            if not moves:
+                break
+            game.position.make_move(rng.choice(moves))
+        hosted.append(game)
+    used = tracemalloc.get_traced_memory()[0] - before
+    if not was_tracing:
+        tracemalloc.stop()
+    return used // games
@@ -0,0 +1,5 @@
+# rules: The game rules and position state, independent of pygame. Everything
+# in this package can be imported and run on a machine without a display,
+# e.g. for perft, analysis or engine self-play.
+
+from chess.rules.position import Position, START_FEN
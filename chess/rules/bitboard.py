@@ -0,0 +1,181 @@
+# bitboard.py: Bitboard constants and the precomputed attack tables used by the
+# position and its move generator. Squares are numbered a1 = 0 ... h8 = 63.
+
+from typing import List, Dict, Iterator
+
+FULL = 0xFFFF_FFFF_FFFF_FFFF
+
+FILE_A = 0x0101_0101_0101_0101
+FILE_H = FILE_A << 7
+RANK_1 = 0xFF
+RANK_2 = RANK_1 << 8
+RANK_4 = RANK_1 << 24
+RANK_5 = RANK_1 << 32
+RANK_7 = RANK_1 << 48
+RANK_8 = RANK_1 << 56
+
+NOT_FILE_A = FULL ^ FILE_A
+NOT_FILE_H = FULL ^ FILE_H
+
+SQUARE_BB: List[int] = [1 << sq for sq in range(64)]
+
+SQUARE_NAMES: List[str] = [f"{chr(ord('a') + (sq & 7))}{(sq >> 3) + 1}" for sq in range(64)]
+
+
+def square(file: int, rank: int) -> int:
+    return rank * 8 + file
+
+
+def square_file(sq: int) -> int:
+    return sq & 7
+
+
+def square_rank(sq: int) -> int:
+    return sq >> 3
+
+
+def parse_square(name: str) -> int:
+    return square(ord(name[0]) - ord('a'), int(name[1]) - 1)
+
+
+def lsb(bb: int) -> int:
+    return (bb & -bb).bit_length() - 1
+
+
+def msb(bb: int) -> int:
+    return bb.bit_length() - 1
+
+
+def popcount(bb: int) -> int:
+    return bin(bb).count("1")
+
+
+def iter_squares(bb: int) -> Iterator[int]:
+    while bb:
+        b = bb & -bb
+        yield b.bit_length() - 1
+        bb ^= b
+
+
+def _on_board(file: int, rank: int) -> bool:
+    return 0 <= file < 8 and 0 <= rank < 8
+
+
+def _step_attacks(deltas) -> List[int]:
+    table = []
+    for sq in range(64):
+        f, r = sq & 7, sq >> 3
+        bb = 0
+        for df, dr in deltas:
+            if _on_board(f + df, r + dr):
+                bb |= 1 << square(f + df, r + dr)
+        table.append(bb)
+    return table
+
+
+KNIGHT_ATTACKS = _step_attacks([(1, 2), (2, 1), (2, -1), (1, -2),
+                                (-1, -2), (-2, -1), (-2, 1), (-1, 2)])
+KING_ATTACKS = _step_attacks([(1, 0), (1, 1), (0, 1), (-1, 1),
+                              (-1, 0), (-1, -1), (0, -1), (1, -1)])
+
+# PAWN_ATTACKS[color][sq]: squares attacked by a pawn of that color on sq.
+PAWN_ATTACKS = [_step_attacks([(-1, 1), (1, 1)]),
+                _step_attacks([(-1, -1), (1, -1)])]
+
+ROOK_DIRECTIONS = [(1, 0), (-1, 0), (0, 1), (0, -1)]
+BISHOP_DIRECTIONS = [(1, 1), (-1, -1), (1, -1), (-1, 1)]
+
+
+def _ray(sq: int, df: int, dr: int, occupied: int = 0) -> int:
+    f, r = (sq & 7) + df, (sq >> 3) + dr
+    bb = 0
+    while _on_board(f, r):
+        b = 1 << square(f, r)
+        bb |= b
+        if occupied & b:
+            break
+        f, r = f + df, r + dr
+    return bb
+
+
+def _subsets(mask: int) -> Iterator[int]:
+    # Carry-rippler enumeration of every subset of mask.
+    subset = 0
+    while True:
+        yield subset
+        subset = (subset - mask) & mask
+        if subset == 0:
+            break
+
+
+def _line_tables(directions) -> (List[int], List[Dict[int, int]]):
+    """
+    Builds the lookup tables for one line (rank, file, diagonal or
+    anti-diagonal) through every square. The mask leaves out the edge squares
+    since a blocker there never changes the attack set, which keeps each table
+    at most 64 entries.
+    """
+    masks = []
+    tables = []
+    for sq in range(64):
+        inner = 0
+        for df, dr in directions:
+            ray = _ray(sq, df, dr)
+            # Drop the last square of each ray (the board edge).
+            f, r = sq & 7, sq >> 3
+            while _on_board(f + df, r + dr):
+                f, r = f + df, r + dr
+            if ray:
+                inner |= ray & ~(1 << square(f, r))
+        table = {}
+        for occ in _subsets(inner):
+            attacks = 0
+            for df, dr in directions:
+                attacks |= _ray(sq, df, dr, occ)
+            table[occ] = attacks
+        masks.append(inner)
+        tables.append(table)
+    return masks, tables
+
+
+RANK_MASK, RANK_TABLE = _line_tables([(1, 0), (-1, 0)])
+FILE_MASK, FILE_TABLE = _line_tables([(0, 1), (0, -1)])
+DIAG_MASK, DIAG_TABLE = _line_tables([(1, 1), (-1, -1)])
+ANTI_MASK, ANTI_TABLE = _line_tables([(1, -1), (-1, 1)])
+
+ROOK_EMPTY = [RANK_TABLE[sq][0] | FILE_TABLE[sq][0] for sq in range(64)]
+BISHOP_EMPTY = [DIAG_TABLE[sq][0] | ANTI_TABLE[sq][0] for sq in range(64)]
+
+
+def rook_attacks(sq: int, occupied: int) -> int:
+    return RANK_TABLE[sq][occupied & RANK_MASK[sq]] | FILE_TABLE[sq][occupied & FILE_MASK[sq]]
+
+
+def bishop_attacks(sq: int, occupied: int) -> int:
+    return DIAG_TABLE[sq][occupied & DIAG_MASK[sq]] | ANTI_TABLE[sq][occupied & ANTI_MASK[sq]]
+
+
+def queen_attacks(sq: int, occupied: int) -> int:
+    return rook_attacks(sq, occupied) | bishop_attacks(sq, occupied)
+
+
+def _between_and_line() -> (List[List[int]], List[List[int]]):
+    between = [[0] * 64 for _ in range(64)]
+    line = [[0] * 64 for _ in range(64)]
+    for a in range(64):
+        for df, dr in ROOK_DIRECTIONS + BISHOP_DIRECTIONS:
+            full = _ray(a, df, dr) | _ray(a, -df, -dr) | (1 << a)
+            path = 0
+            f, r = (a & 7) + df, (a >> 3) + dr
+            while _on_board(f, r):
+                b = square(f, r)
+                between[a][b] = path
+                line[a][b] = full
+                path |= 1 << b
+                f, r = f + df, r + dr
+    return between, line
+
+
+# BETWEEN[a][b]: squares strictly between a and b if they share a line.
+# LINE[a][b]: the whole line through a and b (including both), else 0.
+BETWEEN, LINE = _between_and_line()
@@ -0,0 +1,103 @@
+# history.py: The move list of a game with undo, redo and jumping to any ply.
+#
+# The history owns a cursor into its move list and drives a Position to
+# match it. Every SNAPSHOT_INTERVAL plies a compact snapshot of the position
+# is kept, so a jump restores the nearest snapshot at or before the target
+# and replays at most SNAPSHOT_INTERVAL - 1 moves, however long the game is.
+
+from typing import List
+
+from chess.chess_exception import ChessException
+from chess.rules.move import NULL_MOVE
+from chess.rules.position import Position
+
+SNAPSHOT_INTERVAL = 16
+
+
+class GameHistory:
+    def __init__(self, position: Position, interval: int = SNAPSHOT_INTERVAL):
+        self.position = position
+        self.interval = interval
+        self.moves: List[int] = []
+        self.ply = 0
+
+        # The undo records and pre-move hashes of the whole line, as the
+        # position pushed them. A restored position gets the prefix up to its
+        # snapshot, so it can still unmake moves and detect repetitions.
+        # Whatever was already on the position's stack stays as the base.
+        self.__base_stack = position.stack[:]
+        self.__base_hashes = position.hashes[:]
+        self.__records: List[int] = []
+        self.__hashes: List[int] = []
+        self.__snapshots: List[tuple] = [position.snapshot()]
+
+    def __len__(self) -> int:
+        return len(self.moves)
+
+    @property
+    def at_end(self) -> bool:
+        return self.ply == len(self.moves)
+
+    def can_undo(self) -> bool:
+        return self.ply > 0
+
+    def can_redo(self) -> bool:
+        return self.ply < len(self.moves)
+
+    def push(self, move: int) -> None:
+        """
+        Plays a move at the cursor. If the cursor is not at the end and the
+        move differs from the one recorded there, the rest of the line is
+        dropped; playing the recorded move again just steps forward.
+        """
+        if self.can_redo():
+            if self.moves[self.ply] == move:
+                self.redo()
+                return
+            del self.moves[self.ply:]
+            del self.__records[self.ply:]
+            del self.__hashes[self.ply:]
+            del self.__snapshots[self.ply // self.interval + 1:]
+
+        self.position.make_move(move)
+        self.moves.append(move)
+        self.__records.append(self.position.stack[-1])
+        self.__hashes.append(self.position.hashes[-1])
+        self.ply += 1
+        if self.ply % self.interval == 0:
+            self.__snapshots.append(self.position.snapshot())
+
+    def undo(self) -> int:
+        if not self.can_undo():
+            raise ChessException("Nothing to undo.")
+        self.ply -= 1
+        return self.position.unmake_move()
+
+    def redo(self) -> int:
+        if not self.can_redo():
+            raise ChessException("Nothing to redo.")
+        move = self.moves[self.ply]
+        self.position.make_move(move)
+        self.ply += 1
+        return move
+
+    def seek(self, ply: int) -> None:
+        """
+        Moves the cursor to any ply between 0 and len(self). Short distances
+        are walked move by move; longer jumps restore a snapshot first.
+        """
+        ply = max(0, min(ply, len(self.moves)))
+        if ply < self.ply - self.interval or ply > self.ply + self.interval:
+            start = (ply // self.interval) * self.interval
+            self.position.restore(self.__snapshots[start // self.interval],
+                                  self.__base_stack + self.__records[:start],
+                                  self.__base_hashes + self.__hashes[:start])
+            self.ply = start
+
+        while self.ply > ply:
+            self.undo()
+        while self.ply < ply:
+            self.redo()
+
+    def last_move(self) -> int:
+        return self.moves[self.ply - 1] if self.ply else NULL_MOVE
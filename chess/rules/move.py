@@ -0,0 +1,65 @@
+# move.py: Compact integer move encoding shared by the position, the move
+# generator and everything built on top of them.
+#
+#   bits  0-5   from square
+#   bits  6-11  to square
+#   bits 12-15  flag (see below)
+
+from chess.rules.bitboard import SQUARE_NAMES
+
+NULL_MOVE = 0
+
+QUIET = 0
+DOUBLE_PUSH = 1
+KING_CASTLE = 2
+QUEEN_CASTLE = 3
+CAPTURE = 4
+EP_CAPTURE = 5
+PROMOTION = 8           # 8-11: knight, bishop, rook, queen
+PROMOTION_CAPTURE = 12  # 12-15: knight, bishop, rook, queen
+
+PROMOTION_LETTERS = "nbrq"
+
+
+def encode(frm: int, to: int, flag: int = QUIET) -> int:
+    return frm | (to << 6) | (flag << 12)
+
+
+def move_from(move: int) -> int:
+    return move & 63
+
+
+def move_to(move: int) -> int:
+    return (move >> 6) & 63
+
+
+def move_flag(move: int) -> int:
+    return move >> 12
+
+
+def is_capture(move: int) -> bool:
+    return bool((move >> 12) & CAPTURE)
+
+
+def is_promotion(move: int) -> bool:
+    return bool((move >> 12) & PROMOTION)
+
+
+def promotion_kind(move: int) -> int:
+    """
+    Returns the piece kind (KNIGHT..QUEEN, see position.py) a promotion move
+    promotes to, or 0 if the move is not a promotion.
+    """
+    flag = move >> 12
+    if flag & PROMOTION:
+        return (flag & 3) + 2
+    return 0
+
+
+def to_uci(move: int) -> str:
+    if move == NULL_MOVE:
+        return "0000"
+    text = SQUARE_NAMES[move & 63] + SQUARE_NAMES[(move >> 6) & 63]
+    if (move >> 12) & PROMOTION:
+        text += PROMOTION_LETTERS[(move >> 12) & 3]
+    return text
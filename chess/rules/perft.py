@@ -0,0 +1,102 @@
+# perft.py: Move generator node counting ("performance test") and the standard
+# reference positions used to check it.
+
+import time
+from dataclasses import dataclass
+from typing import List, Tuple
+
+from chess.rules.move import to_uci
+from chess.rules.position import Position, START_FEN
+
+
+@dataclass
+class PerftResult:
+    name: str
+    fen: str
+    depth: int
+    nodes: int
+    expected: int
+    seconds: float
+
+    @property
+    def ok(self) -> bool:
+        return self.expected < 0 or self.nodes == self.expected
+
+    @property
+    def nps(self) -> float:
+        return self.nodes / self.seconds if self.seconds > 0 else 0.0
+
+
+# (name, fen, node counts for depth 1, 2, 3, ...) from the Chess Programming
+# Wiki perft results page.
+REFERENCE_POSITIONS: List[Tuple[str, str, List[int]]] = [
+    ("startpos", START_FEN,
+     [20, 400, 8902, 197281, 4865609, 119060324]),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+     [48, 2039, 97862, 4085603, 193690690]),
+    ("position3", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+     [14, 191, 2812, 43238, 674624, 11030083]),
+    ("position4", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+     [6, 264, 9467, 422333, 15833292]),
+    ("position4_mirrored", "r2q1rk1/pP1p2pp/Q4n2/bbp1p3/Np6/1B3NBn/pPPP1PPP/R3K2R b KQ - 0 1",
+     [6, 264, 9467, 422333, 15833292]),
+    ("position5", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+     [44, 1486, 62379, 2103487, 89941194]),
+    ("position6", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+     [46, 2079, 89890, 3894594, 164075551]),
+]
+
+
+def perft(position: Position, depth: int) -> int:
+    """
+    Counts the leaf nodes of the legal move tree to the given depth. The last
+    ply is counted straight from the move list (bulk counting).
+    """
+    if depth <= 0:
+        return 1
+    moves = position.legal_moves()
+    if depth == 1:
+        return len(moves)
+
+    nodes = 0
+    make_move = position.make_move
+    unmake_move = position.unmake_move
+    for move in moves:
+        make_move(move)
+        nodes += perft(position, depth - 1)
+        unmake_move()
+    return nodes
+
+
+def divide(position: Position, depth: int) -> List[Tuple[str, int]]:
+    """
+    Returns the perft count below each root move, which is what you compare
+    against another engine to find the move generator bug.
+    """
+    results = []
+    for move in position.legal_moves():
+        position.make_move(move)
+        results.append((to_uci(move), perft(position, depth - 1)))
+        position.unmake_move()
+    return sorted(results)
+
+
+def timed_perft(name: str, fen: str, depth: int, expected: int = -1) -> PerftResult:
+    position = Position(fen)
+    start = time.perf_counter()
+    nodes = perft(position, depth)
+    return PerftResult(name, fen, depth, nodes, expected, time.perf_counter() - start)
+
+
+def run_suite(max_nodes: int = 1_000_000, max_depth: int = 99) -> List[PerftResult]:
+    """
+    Runs every reference position to the deepest depth whose expected node
+    count fits in max_nodes.
+    """
+    results = []
+    for name, fen, counts in REFERENCE_POSITIONS:
+        depth = 1
+        while depth < min(len(counts), max_depth) and counts[depth] <= max_nodes:
+            depth += 1
+        results.append(timed_perft(name, fen, depth, counts[depth - 1]))
+    return results
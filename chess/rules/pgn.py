@@ -0,0 +1,273 @@
+# pgn.py: Streaming PGN reader and a PGN writer.
+#
+# read_pgn is a generator: it reads its source line by line and yields one
+# game at a time, so memory use stays the same for a ten game file and for a
+# multi-gigabyte database. Moves are parsed as SAN against the legal move
+# generator. Comments and move marks ("?!") are kept per ply; variations and
+# NAGs are skipped.
+
+import io
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, TextIO, Union
+
+from chess.chess_exception import ChessException
+from chess.rules.position import Position, START_FEN, WHITE
+from chess.rules.san import parse_san, to_san
+
+RESULTS = ("1-0", "0-1", "1/2-1/2", "*")
+
+# The seven tag roster, written first and in this order.
+STR_TAGS = ("Event", "Site", "Date", "Round", "White", "Black", "Result")
+
+
+@dataclass
+class PgnGame:
+    headers: Dict[str, str] = field(default_factory=dict)
+    moves: List[int] = field(default_factory=list)
+    # Comments by ply: key 0 is before the first move, key n follows move n.
+    comments: Dict[int, str] = field(default_factory=dict)
+    # Move marks by ply ("!", "?", "?!", ...), written right after the SAN.
+    marks: Dict[int, str] = field(default_factory=dict)
+    result: str = "*"
+    # Set when the movetext could not be read to the end; moves then holds
+    # the moves up to the problem.
+    error: Optional[str] = None
+
+    @property
+    def fen(self) -> str:
+        return self.headers.get("FEN", START_FEN)
+
+    def start_position(self) -> Position:
+        return Position(self.fen)
+
+    def end_position(self) -> Position:
+        position = self.start_position()
+        for move in self.moves:
+            position.make_move(move)
+        return position
+
+
+def game_result(position: Position) -> str:
+    """
+    The PGN result of a position: decided when it is mate or a draw by the
+    rules, "*" while the game goes on.
+    """
+    if not position.legal_moves():
+        if not position.in_check():
+            return "1/2-1/2"
+        return "0-1" if position.turn == WHITE else "1-0"
+    if position.halfmove >= 100 or position.repetition_count() >= 2:
+        return "1/2-1/2"
+    return "*"
+
+
+def _parse_header(line: str):
+    # [Name "value with \"escapes\""]
+    body = line.strip()[1:-1].strip()
+    name, _, value = body.partition(" ")
+    value = value.strip()
+    if value.startswith('"') and value.endswith('"') and len(value) >= 2:
+        value = value[1:-1].replace('\\"', '"').replace("\\\\", "\\")
+    return name, value
+
+
+class _MovetextParser:
+    """
+    Tokenizes movetext as it arrives, line by line, and plays each SAN move
+    on the game's position.
+    """
+
+    def __init__(self, game: PgnGame, parse_moves: bool):
+        self.game = game
+        self.parse_moves = parse_moves
+        self.position = game.start_position() if parse_moves else None
+        self.comment: Optional[List[str]] = None
+        self.depth = 0
+        self.done = False
+
+    def feed(self, line: str) -> None:
+        i = 0
+        n = len(line)
+        while i < n:
+            if self.comment is not None:
+                end = line.find("}", i)
+                if end == -1:
+                    self.comment.append(line[i:])
+                    return
+                self.comment.append(line[i:end])
+                self.__add_comment(" ".join(part.strip() for part in self.comment).strip())
+                self.comment = None
+                i = end + 1
+                continue
+
+            c = line[i]
+            if c in " \t\r\n.":
+                i += 1
+            elif c == "{":
+                self.comment = []
+                i += 1
+            elif c == ";":
+                self.__add_comment(line[i + 1:].strip())
+                return
+            elif c == "(":
+                self.depth += 1
+                i += 1
+            elif c == ")":
+                self.depth -= 1
+                i += 1
+            else:
+                j = i
+                while j < n and line[j] not in " \t\r\n.{}();":
+                    j += 1
+                token = line[i:j]
+                i = j
+                if self.depth == 0:
+                    self.__token(token)
+
+    def __add_comment(self, text: str) -> None:
+        if self.depth or not text:
+            return
+        ply = len(self.game.moves)
+        comments = self.game.comments
+        comments[ply] = comments[ply] + " " + text if ply in comments else text
+
+    def __token(self, token: str) -> None:
+        game = self.game
+        if token in RESULTS:
+            game.result = token
+            self.done = True
+            return
+        if token[0] == "$" or token.isdigit() or game.error is not None:
+            # NAGs and move numbers; after an error the rest of the game is
+            # skipped.
+            return
+        if not self.parse_moves:
+            return
+        mark = token[len(token.rstrip("!?")):]
+        try:
+            move = parse_san(self.position, token)
+        except ChessException as e:
+            game.error = str(e)
+            return
+        if move is None:
+            game.error = f"Illegal or unreadable move {token} at ply {len(game.moves) + 1}"
+            return
+        self.position.make_move(move)
+        game.moves.append(move)
+        if mark:
+            game.marks[len(game.moves)] = mark
+
+
+def read_pgn(source: Union[str, TextIO], parse_moves: bool = True) -> Iterator[PgnGame]:
+    """
+    Yields the games of a PGN file one at a time. source is a path or an
+    open text file. With parse_moves=False only headers, comments and the
+    result are read, which is much faster when only the tags are needed.
+    """
+    if isinstance(source, str):
+        with open(source, encoding="utf-8", errors="replace") as f:
+            yield from read_pgn(f, parse_moves)
+        return
+
+    game: Optional[PgnGame] = None
+    parser: Optional[_MovetextParser] = None
+    for line in source:
+        stripped = line.strip()
+        if parser is not None and parser.comment is not None:
+            # Comments may run over several lines and contain anything.
+            pass
+        elif stripped.startswith("[") and stripped.endswith("]"):
+            if parser is not None:
+                yield game
+                game = parser = None
+            if game is None:
+                game = PgnGame()
+            name, value = _parse_header(stripped)
+            game.headers[name] = value
+            continue
+        elif not stripped or stripped[0] == "%":
+            continue
+        elif parser is None:
+            if game is None:
+                game = PgnGame()
+            try:
+                parser = _MovetextParser(game, parse_moves)
+            except ChessException as e:
+                game.error = str(e)
+                parser = _MovetextParser(game, False)
+        parser.feed(line)
+        if parser.done:
+            # The result token ends the movetext.
+            yield game
+            game = parser = None
+
+    if game is not None:
+        yield game
+
+
+def read_pgn_string(text: str, parse_moves: bool = True) -> Iterator[PgnGame]:
+    return read_pgn(io.StringIO(text), parse_moves)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def game_to_pgn(game: PgnGame, line_length: int = 79) -> str:
+    """
+    Formats a game as PGN: the seven tag roster first (filled with "?" where
+    unknown), then the other tags, then movetext in SAN wrapped at
+    line_length, with the comments.
+    """
+    headers = dict(game.headers)
+    headers["Result"] = game.result
+    if "FEN" in headers and headers["FEN"] != START_FEN:
+        headers["SetUp"] = "1"
+    lines = []
+    for name in STR_TAGS:
+        lines.append(f'[{name} "{_escape(headers.pop(name, "????.??.??" if name == "Date" else "?"))}"]')
+    for name, value in headers.items():
+        lines.append(f'[{name} "{_escape(value)}"]')
+    lines.append("")
+
+    tokens = []
+    if 0 in game.comments:
+        tokens.append("{" + game.comments[0] + "}")
+    position = game.start_position() if game.moves else None
+    for ply, move in enumerate(game.moves, 1):
+        if position.turn == WHITE:
+            tokens.append(f"{position.fullmove}.")
+        elif ply == 1 or ply - 1 in game.comments:
+            tokens.append(f"{position.fullmove}...")
+        tokens.append(to_san(position, move) + game.marks.get(ply, ""))
+        position.make_move(move)
+        if ply in game.comments:
+            tokens.append("{" + game.comments[ply] + "}")
+    tokens.append(game.result)
+
+    line = ""
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > line_length:
+            lines.append(line)
+            line = token
+        else:
+            line = f"{line} {token}" if line else token
+    lines.append(line)
+    return "\n".join(lines) + "\n"
+
+
+def write_pgn(games, target: Union[str, TextIO]) -> int:
+    """
+    Writes games (any iterable, e.g. a generator) to a path or an open text
+    file, separated by blank lines. Returns the number of games written.
+    """
+    if isinstance(target, str):
+        with open(target, "w", encoding="utf-8") as f:
+            return write_pgn(games, f)
+    count = 0
+    for game in games:
+        if count:
+            target.write("\n")
+        target.write(game_to_pgn(game))
+        count += 1
+    return count
@@ -0,0 +1,820 @@
+# position.py: Bitboard position model and legal move generator.
+#
+# A position is twelve piece bitboards (one per piece type and color), two
+# color occupancy bitboards, a 64 entry mailbox for fast "what is on this
+# square" lookups, and the side to move, castling rights, en passant square
+# and move clocks. Moves are plain ints (see move.py) and are applied in place
+# with make_move / unmake_move, which also keep the Zobrist hash up to date,
+# along with the terms the evaluation is built from: the material and
+# piece-square sums, the game phase, a hash of the pawns alone and the king
+# squares.
+
+from typing import List, Optional
+
+from chess.chess_exception import ChessException
+from chess.rules.bitboard import (
+    FULL, RANK_1, RANK_2, RANK_7, RANK_8, NOT_FILE_A, NOT_FILE_H,
+    KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKS, ROOK_EMPTY, BISHOP_EMPTY,
+    BETWEEN, LINE, SQUARE_NAMES,
+    rook_attacks, bishop_attacks, lsb, parse_square
+)
+from chess.rules.move import (
+    QUIET, DOUBLE_PUSH, KING_CASTLE, QUEEN_CASTLE, CAPTURE, EP_CAPTURE,
+    PROMOTION, PROMOTION_CAPTURE, NULL_MOVE, to_uci
+)
+from chess.rules.psqt import MG_SCORES, EG_SCORES, PIECE_PHASE
+from chess.rules.zobrist import PIECE_KEYS, CASTLING_KEYS, EP_KEYS, SIDE_KEY
+
+WHITE, BLACK = 0, 1
+
+(EMPTY,
+ PAWN,
+ KNIGHT,
+ BISHOP,
+ ROOK,
+ QUEEN,
+ KING) = range(0, 7)
+
+# Piece codes are kind + 6 * color, so white pieces are 1-6 and black pieces
+# are 7-12. This lines up with the ids in EntityID (P1 is white, P2 is black).
+PIECE_COLOR = [-1] + [WHITE] * 6 + [BLACK] * 6
+PIECE_KIND = [EMPTY] + list(range(PAWN, KING + 1)) * 2
+PIECE_SYMBOLS = ".PNBRQKpnbrqk"
+
+WHITE_KINGSIDE = 1
+WHITE_QUEENSIDE = 2
+BLACK_KINGSIDE = 4
+BLACK_QUEENSIDE = 8
+
+# Castling rights are and-ed with these on every move, so moving a king or a
+# rook (or capturing a rook on its home square) drops the matching rights.
+CASTLING_MASK = [15] * 64
+CASTLING_MASK[0] = 15 ^ WHITE_QUEENSIDE
+CASTLING_MASK[4] = 15 ^ (WHITE_KINGSIDE | WHITE_QUEENSIDE)
+CASTLING_MASK[7] = 15 ^ WHITE_KINGSIDE
+CASTLING_MASK[56] = 15 ^ BLACK_QUEENSIDE
+CASTLING_MASK[60] = 15 ^ (BLACK_KINGSIDE | BLACK_QUEENSIDE)
+CASTLING_MASK[63] = 15 ^ BLACK_KINGSIDE
+
+# Undo records are single ints: the move in the low 16 bits, then the
+# captured piece, the castling rights, the en passant square (plus one, so
+# "none" is 0) and the halfmove clock. The hash before each move is kept in a
+# separate list, which repetition detection scans. The evaluation terms are
+# not recorded: unmake_move applies the same updates in reverse.
+
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+
+def make_piece(color: int, kind: int) -> int:
+    return kind + 6 * color
+
+
+class Position:
+    """
+    The full state of a chess game at one point in time. The piece bitboards
+    in self.bb are indexed by piece code (index 0 is unused), self.occ holds
+    the white and black occupancy and self.board is the mailbox view of the
+    same data.
+    """
+
+    def __init__(self, fen: str = START_FEN):
+        self.bb: List[int] = [0] * 13
+        self.occ: List[int] = [0, 0]
+        self.board: List[int] = [EMPTY] * 64
+        self.turn = WHITE
+        self.castling = 0
+        self.ep = -1
+        self.halfmove = 0
+        self.fullmove = 1
+        self.hash = 0
+        self.stack: List[int] = []
+        self.hashes: List[int] = []
+        # Incremental evaluation terms, white's point of view.
+        self.psq_mg = 0
+        self.psq_eg = 0
+        self.phase = 0
+        self.pawn_key = 0
+        self.kings: List[int] = [-1, -1]
+        self.set_fen(fen)
+
+    # --------------------------------------------------------------------- #
+    # Setup
+    # --------------------------------------------------------------------- #
+    def clear(self) -> None:
+        self.bb = [0] * 13
+        self.occ = [0, 0]
+        self.board = [EMPTY] * 64
+        self.turn = WHITE
+        self.castling = 0
+        self.ep = -1
+        self.halfmove = 0
+        self.fullmove = 1
+        self.hash = 0
+        self.stack = []
+        self.hashes = []
+        self.psq_mg = 0
+        self.psq_eg = 0
+        self.phase = 0
+        self.pawn_key = 0
+        self.kings = [-1, -1]
+
+    def put_piece(self, piece: int, sq: int) -> None:
+        if self.board[sq] != EMPTY:
+            self.remove_piece(sq)
+        b = 1 << sq
+        self.bb[piece] |= b
+        self.occ[PIECE_COLOR[piece]] |= b
+        self.board[sq] = piece
+        self.hash ^= PIECE_KEYS[piece][sq]
+        self.psq_mg += MG_SCORES[piece][sq]
+        self.psq_eg += EG_SCORES[piece][sq]
+        self.phase += PIECE_PHASE[piece]
+        if PIECE_KIND[piece] == PAWN:
+            self.pawn_key ^= PIECE_KEYS[piece][sq]
+        elif PIECE_KIND[piece] == KING:
+            self.kings[PIECE_COLOR[piece]] = sq
+
+    def remove_piece(self, sq: int) -> None:
+        piece = self.board[sq]
+        if piece == EMPTY:
+            return
+        b = 1 << sq
+        self.bb[piece] ^= b
+        self.occ[PIECE_COLOR[piece]] ^= b
+        self.board[sq] = EMPTY
+        self.hash ^= PIECE_KEYS[piece][sq]
+        self.psq_mg -= MG_SCORES[piece][sq]
+        self.psq_eg -= EG_SCORES[piece][sq]
+        self.phase -= PIECE_PHASE[piece]
+        if PIECE_KIND[piece] == PAWN:
+            self.pawn_key ^= PIECE_KEYS[piece][sq]
+
+    def set_fen(self, fen: str) -> None:
+        fields = fen.split()
+        if len(fields) < 4:
+            raise ChessException(f"Invalid FEN (expected at least 4 fields): {fen}")
+
+        self.clear()
+        ranks = fields[0].split("/")
+        if len(ranks) != 8:
+            raise ChessException(f"Invalid FEN board: {fields[0]}")
+        for i, row in enumerate(ranks):
+            rank = 7 - i
+            file = 0
+            for ch in row:
+                if ch.isdigit():
+                    file += int(ch)
+                else:
+                    kind = PIECE_SYMBOLS.find(ch)
+                    if kind <= 0 or file > 7:
+                        raise ChessException(f"Invalid FEN board: {fields[0]}")
+                    self.put_piece(kind, rank * 8 + file)
+                    file += 1
+            if file != 8:
+                raise ChessException(f"Invalid FEN board: {fields[0]}")
+
+        if fields[1] not in ("w", "b"):
+            raise ChessException(f"Invalid FEN side to move: {fields[1]}")
+        self.turn = WHITE if fields[1] == "w" else BLACK
+
+        for ch, right, king_sq, rook_sq, rook in (("K", WHITE_KINGSIDE, 4, 7, ROOK),
+                                                  ("Q", WHITE_QUEENSIDE, 4, 0, ROOK),
+                                                  ("k", BLACK_KINGSIDE, 60, 63, ROOK + 6),
+                                                  ("q", BLACK_QUEENSIDE, 60, 56, ROOK + 6)):
+            # Rights that do not match the pieces on the board are dropped.
+            if ch in fields[2] and self.board[rook_sq] == rook and \
+                    self.board[king_sq] == make_piece(PIECE_COLOR[rook], KING):
+                self.castling |= right
+
+        if fields[3] == "-":
+            self.ep = -1
+        elif len(fields[3]) == 2 and fields[3][0] in "abcdefgh" and fields[3][1] == ("6" if self.turn == WHITE else "3"):
+            self.ep = parse_square(fields[3])
+        else:
+            raise ChessException(f"Invalid FEN en passant square: {fields[3]}")
+        if self.ep != -1 and not PAWN_ATTACKS[self.turn ^ 1][self.ep] & self.bb[make_piece(self.turn, PAWN)]:
+            # Like make_move, only keep an en passant square a pawn can use.
+            self.ep = -1
+        try:
+            self.halfmove = int(fields[4]) if len(fields) > 4 else 0
+            self.fullmove = int(fields[5]) if len(fields) > 5 else 1
+        except ValueError:
+            raise ChessException(f"Invalid FEN move counters: {' '.join(fields[4:6])}")
+        if self.halfmove < 0 or self.fullmove < 1:
+            raise ChessException(f"Invalid FEN move counters: {' '.join(fields[4:6])}")
+
+        for color in (WHITE, BLACK):
+            kings = self.bb[make_piece(color, KING)]
+            if kings == 0 or kings & (kings - 1):
+                raise ChessException(f"Invalid FEN (each side needs one king): {fen}")
+        if self.is_attacked(self.kings[self.turn ^ 1], self.turn):
+            raise ChessException(f"Invalid FEN (the side not to move is in check): {fen}")
+
+        self.hash = self.compute_hash()
+
+    def compute_hash(self) -> int:
+        """
+        Computes the Zobrist hash from scratch. make_move and unmake_move keep
+        self.hash up to date incrementally, so this is only needed on setup.
+        """
+        h = 0
+        for sq, piece in enumerate(self.board):
+            h ^= PIECE_KEYS[piece][sq]
+        h ^= CASTLING_KEYS[self.castling]
+        if self.ep != -1:
+            h ^= EP_KEYS[self.ep & 7]
+        if self.turn == WHITE:
+            h ^= SIDE_KEY
+        return h
+
+    def compute_terms(self) -> None:
+        """
+        Recomputes the incremental evaluation terms from the board.
+        """
+        mg = eg = phase = pawn_key = 0
+        for sq, piece in enumerate(self.board):
+            if piece:
+                mg += MG_SCORES[piece][sq]
+                eg += EG_SCORES[piece][sq]
+                phase += PIECE_PHASE[piece]
+                if PIECE_KIND[piece] == PAWN:
+                    pawn_key ^= PIECE_KEYS[piece][sq]
+        self.psq_mg, self.psq_eg, self.phase, self.pawn_key = mg, eg, phase, pawn_key
+        self.kings = [lsb(self.bb[KING]), lsb(self.bb[KING + 6])]
+
+    def fen(self) -> str:
+        rows = []
+        for rank in range(7, -1, -1):
+            row = ""
+            empty = 0
+            for file in range(8):
+                piece = self.board[rank * 8 + file]
+                if piece == EMPTY:
+                    empty += 1
+                    continue
+                if empty:
+                    row += str(empty)
+                    empty = 0
+                row += PIECE_SYMBOLS[piece]
+            if empty:
+                row += str(empty)
+            rows.append(row)
+
+        castling = "".join(ch for ch, right in (("K", WHITE_KINGSIDE), ("Q", WHITE_QUEENSIDE),
+                                                ("k", BLACK_KINGSIDE), ("q", BLACK_QUEENSIDE))
+                           if self.castling & right) or "-"
+        ep = "-" if self.ep == -1 else SQUARE_NAMES[self.ep]
+        return f"{'/'.join(rows)} {'wb'[self.turn]} {castling} {ep} {self.halfmove} {self.fullmove}"
+
+    def copy(self) -> "Position":
+        other = Position.__new__(Position)
+        other.bb = self.bb[:]
+        other.occ = self.occ[:]
+        other.board = self.board[:]
+        other.turn = self.turn
+        other.castling = self.castling
+        other.ep = self.ep
+        other.halfmove = self.halfmove
+        other.fullmove = self.fullmove
+        other.hash = self.hash
+        other.stack = self.stack[:]
+        other.hashes = self.hashes[:]
+        other.psq_mg = self.psq_mg
+        other.psq_eg = self.psq_eg
+        other.phase = self.phase
+        other.pawn_key = self.pawn_key
+        other.kings = self.kings[:]
+        return other
+
+    def snapshot(self) -> tuple:
+        """
+        Returns the state without its undo stack as a small immutable tuple
+        (the mailbox as 64 bytes plus the scalar fields), for restore().
+        """
+        return (bytes(self.board), self.turn, self.castling, self.ep,
+                self.halfmove, self.fullmove, self.hash)
+
+    def restore(self, snapshot: tuple, stack: List[int] = None, hashes: List[int] = None) -> None:
+        """
+        Sets the position back to a snapshot. The bitboards are rebuilt from
+        the mailbox. stack and hashes become the undo history, so moves made
+        before the snapshot can still be unmade and repetitions still count.
+        """
+        board, self.turn, self.castling, self.ep, self.halfmove, self.fullmove, self.hash = snapshot
+        bb = [0] * 13
+        for sq, piece in enumerate(board):
+            if piece:
+                bb[piece] |= 1 << sq
+        self.bb = bb
+        self.occ = [bb[1] | bb[2] | bb[3] | bb[4] | bb[5] | bb[6],
+                    bb[7] | bb[8] | bb[9] | bb[10] | bb[11] | bb[12]]
+        self.board = list(board)
+        self.stack = list(stack or [])
+        self.hashes = list(hashes or [])
+        self.compute_terms()
+
+    # --------------------------------------------------------------------- #
+    # Queries
+    # --------------------------------------------------------------------- #
+    def piece_at(self, sq: int) -> int:
+        return self.board[sq]
+
+    def king_square(self, color: int) -> int:
+        return self.kings[color]
+
+    def attackers_to(self, sq: int, color: int, occupied: int) -> int:
+        """
+        Returns a bitboard of the pieces of the given color that attack sq,
+        with sliding attacks computed against the given occupancy.
+        """
+        bb = self.bb
+        o = 6 * color
+        return ((PAWN_ATTACKS[color ^ 1][sq] & bb[PAWN + o]) |
+                (KNIGHT_ATTACKS[sq] & bb[KNIGHT + o]) |
+                (KING_ATTACKS[sq] & bb[KING + o]) |
+                (bishop_attacks(sq, occupied) & (bb[BISHOP + o] | bb[QUEEN + o])) |
+                (rook_attacks(sq, occupied) & (bb[ROOK + o] | bb[QUEEN + o])))
+
+    def is_attacked(self, sq: int, by_color: int) -> bool:
+        return self.attackers_to(sq, by_color, self.occ[0] | self.occ[1]) != 0
+
+    def in_check(self) -> bool:
+        return self.is_attacked(self.king_square(self.turn), self.turn ^ 1)
+
+    def attack_map(self, color: int, occupied: int) -> int:
+        """
+        Returns every square attacked by the given color.
+        """
+        bb = self.bb
+        o = 6 * color
+        pawns = bb[PAWN + o]
+        if color == WHITE:
+            attacks = (((pawns << 7) & NOT_FILE_H) | ((pawns << 9) & NOT_FILE_A)) & FULL
+        else:
+            attacks = ((pawns >> 9) & NOT_FILE_H) | ((pawns >> 7) & NOT_FILE_A)
+
+        knights = bb[KNIGHT + o]
+        while knights:
+            b = knights & -knights
+            attacks |= KNIGHT_ATTACKS[b.bit_length() - 1]
+            knights ^= b
+
+        diagonal = bb[BISHOP + o] | bb[QUEEN + o]
+        while diagonal:
+            b = diagonal & -diagonal
+            attacks |= bishop_attacks(b.bit_length() - 1, occupied)
+            diagonal ^= b
+
+        straight = bb[ROOK + o] | bb[QUEEN + o]
+        while straight:
+            b = straight & -straight
+            attacks |= rook_attacks(b.bit_length() - 1, occupied)
+            straight ^= b
+
+        return attacks | KING_ATTACKS[self.kings[color]]
+
+    # --------------------------------------------------------------------- #
+    # Move generation
+    # --------------------------------------------------------------------- #
+    def legal_moves(self) -> List[int]:
+        """
+        Generates every legal move in the position. Moves that would leave the
+        king in check are never produced, so no make/test/unmake pass is
+        needed afterwards: check evasions are restricted to the check mask,
+        pinned pieces to the line through their king, and the king to squares
+        outside the enemy attack map.
+        """
+        moves = []
+        append = moves.append
+        bb = self.bb
+        us = self.turn
+        them = us ^ 1
+        ou = 6 * us
+        ot = 6 * them
+        occ_us = self.occ[us]
+        occ_them = self.occ[them]
+        occ = occ_us | occ_them
+        king_sq = self.kings[us]
+
+        danger = self.attack_map(them, occ ^ (1 << king_sq))
+
+        targets = KING_ATTACKS[king_sq] & ~occ_us & ~danger
+        while targets:
+            b = targets & -targets
+            to = b.bit_length() - 1
+            append(king_sq | (to << 6) | ((CAPTURE << 12) if b & occ_them else 0))
+            targets ^= b
+
+        checkers = self.attackers_to(king_sq, them, occ)
+        if checkers & (checkers - 1):
+            # Double check: only the king can move.
+            return moves
+
+        if checkers:
+            check_mask = checkers | BETWEEN[king_sq][lsb(checkers)]
+        else:
+            check_mask = FULL
+            self._castling_moves(moves, occ, danger)
+
+        straight = bb[ROOK + ot] | bb[QUEEN + ot]
+        diagonal = bb[BISHOP + ot] | bb[QUEEN + ot]
+
+        pinned = 0
+        snipers = (ROOK_EMPTY[king_sq] & straight) | (BISHOP_EMPTY[king_sq] & diagonal)
+        while snipers:
+            b = snipers & -snipers
+            blockers = BETWEEN[king_sq][b.bit_length() - 1] & occ
+            if blockers and not (blockers & (blockers - 1)) and blockers & occ_us:
+                pinned |= blockers
+            snipers ^= b
+
+        target_mask = check_mask & ~occ_us
+        line = LINE[king_sq]
+
+        # Pinned knights can never move, so they are left out entirely.
+        pieces = bb[KNIGHT + ou] & ~pinned
+        while pieces:
+            b = pieces & -pieces
+            frm = b.bit_length() - 1
+            self._add_moves(append, frm, KNIGHT_ATTACKS[frm] & target_mask, occ_them)
+            pieces ^= b
+
+        pieces = bb[BISHOP + ou] | bb[QUEEN + ou]
+        while pieces:
+            b = pieces & -pieces
+            frm = b.bit_length() - 1
+            attacks = bishop_attacks(frm, occ) & target_mask
+            if b & pinned:
+                attacks &= line[frm]
+            self._add_moves(append, frm, attacks, occ_them)
+            pieces ^= b
+
+        pieces = bb[ROOK + ou] | bb[QUEEN + ou]
+        while pieces:
+            b = pieces & -pieces
+            frm = b.bit_length() - 1
+            attacks = rook_attacks(frm, occ) & target_mask
+            if b & pinned:
+                attacks &= line[frm]
+            self._add_moves(append, frm, attacks, occ_them)
+            pieces ^= b
+
+        self._pawn_moves(append, occ, occ_them, check_mask, pinned, king_sq, straight, diagonal)
+        return moves
+
+    @staticmethod
+    def _add_moves(append, frm: int, targets: int, occ_them: int) -> None:
+        while targets:
+            b = targets & -targets
+            to = b.bit_length() - 1
+            if b & occ_them:
+                append(frm | (to << 6) | (CAPTURE << 12))
+            else:
+                append(frm | (to << 6))
+            targets ^= b
+
+    def _castling_moves(self, moves: List[int], occ: int, danger: int) -> None:
+        rights = self.castling
+        if self.turn == WHITE:
+            if rights & WHITE_KINGSIDE and not (occ & 0x60) and not (danger & 0x60):
+                moves.append(4 | (6 << 6) | (KING_CASTLE << 12))
+            if rights & WHITE_QUEENSIDE and not (occ & 0x0E) and not (danger & 0x0C):
+                moves.append(4 | (2 << 6) | (QUEEN_CASTLE << 12))
+        else:
+            if rights & BLACK_KINGSIDE and not (occ & (0x60 << 56)) and not (danger & (0x60 << 56)):
+                moves.append(60 | (62 << 6) | (KING_CASTLE << 12))
+            if rights & BLACK_QUEENSIDE and not (occ & (0x0E << 56)) and not (danger & (0x0C << 56)):
+                moves.append(60 | (58 << 6) | (QUEEN_CASTLE << 12))
+
+    def _pawn_moves(self, append, occ: int, occ_them: int, check_mask: int,
+                    pinned: int, king_sq: int, straight: int, diagonal: int) -> None:
+        us = self.turn
+        bb = self.bb
+        if us == WHITE:
+            push, start_rank, last_rank = 8, RANK_2, RANK_8
+        else:
+            push, start_rank, last_rank = -8, RANK_7, RANK_1
+        attacks_table = PAWN_ATTACKS[us]
+        line = LINE[king_sq]
+        ep = self.ep
+
+        pawns = bb[PAWN + 6 * us]
+        while pawns:
+            b = pawns & -pawns
+            frm = b.bit_length() - 1
+            pawns ^= b
+
+            mask = check_mask
+            if b & pinned:
+                mask &= line[frm]
+
+            to = frm + push
+            if not (occ >> to) & 1:
+                if (mask >> to) & 1:
+                    if (1 << to) & last_rank:
+                        for kind in range(4):
+                            append(frm | (to << 6) | ((PROMOTION | kind) << 12))
+                    else:
+                        append(frm | (to << 6))
+                if b & start_rank:
+                    to2 = to + push
+                    if not (occ >> to2) & 1 and (mask >> to2) & 1:
+                        append(frm | (to2 << 6) | (DOUBLE_PUSH << 12))
+
+            captures = attacks_table[frm] & occ_them & mask
+            while captures:
+                c = captures & -captures
+                to = c.bit_length() - 1
+                if c & last_rank:
+                    for kind in range(4):
+                        append(frm | (to << 6) | ((PROMOTION_CAPTURE | kind) << 12))
+                else:
+                    append(frm | (to << 6) | (CAPTURE << 12))
+                captures ^= c
+
+            if ep != -1 and (attacks_table[frm] >> ep) & 1:
+                # En passant removes two pieces from one rank, which no mask
+                # can express, so test the resulting position directly.
+                captured = 1 << (ep - push)
+                after = (occ ^ b ^ captured) | (1 << ep)
+                ot = 6 * (us ^ 1)
+                if not (rook_attacks(king_sq, after) & straight) and \
+                        not (bishop_attacks(king_sq, after) & diagonal) and \
+                        not (KNIGHT_ATTACKS[king_sq] & bb[KNIGHT + ot]) and \
+                        not (attacks_table[king_sq] & bb[PAWN + ot] & ~captured):
+                    append(frm | (ep << 6) | (EP_CAPTURE << 12))
+
+    # --------------------------------------------------------------------- #
+    # Make / unmake
+    # --------------------------------------------------------------------- #
+    def make_move(self, move: int) -> None:
+        """
+        Plays a legal move in place. The previous state is pushed to
+        self.stack as one packed int so that unmake_move can restore it.
+        """
+        frm = move & 63
+        to = (move >> 6) & 63
+        flag = move >> 12
+        board = self.board
+        bb = self.bb
+        occ = self.occ
+        us = self.turn
+        them = us ^ 1
+
+        piece = board[frm]
+        captured = board[to]
+        castling = self.castling
+        self.stack.append(move | (captured << 16) | (castling << 20) |
+                          ((self.ep + 1) << 24) | (self.halfmove << 31))
+        self.hashes.append(self.hash)
+
+        h = self.hash ^ SIDE_KEY ^ PIECE_KEYS[piece][frm] ^ PIECE_KEYS[piece][to]
+        if self.ep != -1:
+            h ^= EP_KEYS[self.ep & 7]
+        mg_table = MG_SCORES[piece]
+        eg_table = EG_SCORES[piece]
+        mg = self.psq_mg + mg_table[to] - mg_table[frm]
+        eg = self.psq_eg + eg_table[to] - eg_table[frm]
+        kind = PIECE_KIND[piece]
+
+        from_to = (1 << frm) | (1 << to)
+        bb[piece] ^= from_to
+        occ[us] ^= from_to
+        board[frm] = EMPTY
+        board[to] = piece
+
+        if captured:
+            bb[captured] ^= 1 << to
+            occ[them] ^= 1 << to
+            h ^= PIECE_KEYS[captured][to]
+            mg -= MG_SCORES[captured][to]
+            eg -= EG_SCORES[captured][to]
+            self.phase -= PIECE_PHASE[captured]
+            if PIECE_KIND[captured] == PAWN:
+                self.pawn_key ^= PIECE_KEYS[captured][to]
+            self.halfmove = 0
+        elif kind == PAWN:
+            self.halfmove = 0
+        else:
+            self.halfmove += 1
+        if kind == PAWN:
+            self.pawn_key ^= PIECE_KEYS[piece][frm] ^ PIECE_KEYS[piece][to]
+        elif kind == KING:
+            self.kings[us] = to
+
+        self.ep = -1
+        if flag:
+            if flag == DOUBLE_PUSH:
+                # Only record an en passant square that can actually be used,
+                # so identical positions compare (and later hash) equal.
+                ep = (frm + to) >> 1
+                if PAWN_ATTACKS[us][ep] & bb[PAWN + 6 * them]:
+                    self.ep = ep
+                    h ^= EP_KEYS[ep & 7]
+            elif flag == EP_CAPTURE:
+                cap = to - 8 if us == WHITE else to + 8
+                pawn = PAWN + 6 * them
+                bb[pawn] ^= 1 << cap
+                occ[them] ^= 1 << cap
+                board[cap] = EMPTY
+                h ^= PIECE_KEYS[pawn][cap]
+                mg -= MG_SCORES[pawn][cap]
+                eg -= EG_SCORES[pawn][cap]
+                self.pawn_key ^= PIECE_KEYS[pawn][cap]
+            elif flag == KING_CASTLE:
+                self._move_rook(frm + 3, frm + 1)
+                rook = ROOK + 6 * us
+                h ^= PIECE_KEYS[rook][frm + 3] ^ PIECE_KEYS[rook][frm + 1]
+                mg += MG_SCORES[rook][frm + 1] - MG_SCORES[rook][frm + 3]
+                eg += EG_SCORES[rook][frm + 1] - EG_SCORES[rook][frm + 3]
+            elif flag == QUEEN_CASTLE:
+                self._move_rook(frm - 4, frm - 1)
+                rook = ROOK + 6 * us
+                h ^= PIECE_KEYS[rook][frm - 4] ^ PIECE_KEYS[rook][frm - 1]
+                mg += MG_SCORES[rook][frm - 1] - MG_SCORES[rook][frm - 4]
+                eg += EG_SCORES[rook][frm - 1] - EG_SCORES[rook][frm - 4]
+            elif flag & PROMOTION:
+                promoted = (flag & 3) + KNIGHT + 6 * us
+                bb[piece] ^= 1 << to
+                bb[promoted] ^= 1 << to
+                board[to] = promoted
+                h ^= PIECE_KEYS[piece][to] ^ PIECE_KEYS[promoted][to]
+                mg += MG_SCORES[promoted][to] - mg_table[to]
+                eg += EG_SCORES[promoted][to] - eg_table[to]
+                self.phase += PIECE_PHASE[promoted]
+                self.pawn_key ^= PIECE_KEYS[piece][to]
+
+        self.castling = castling & CASTLING_MASK[frm] & CASTLING_MASK[to]
+        if self.castling != castling:
+            h ^= CASTLING_KEYS[castling] ^ CASTLING_KEYS[self.castling]
+        self.hash = h
+        self.psq_mg = mg
+        self.psq_eg = eg
+        if us == BLACK:
+            self.fullmove += 1
+        self.turn = them
+
+    def unmake_move(self) -> int:
+        """
+        Takes back the last move made with make_move and returns it.
+        """
+        record = self.stack.pop()
+        self.hash = self.hashes.pop()
+        move = record & 0xFFFF
+        captured = (record >> 16) & 15
+        self.castling = (record >> 20) & 15
+        self.ep = ((record >> 24) & 127) - 1
+        self.halfmove = record >> 31
+        frm = move & 63
+        to = (move >> 6) & 63
+        flag = move >> 12
+        board = self.board
+        bb = self.bb
+        occ = self.occ
+
+        self.turn ^= 1
+        us = self.turn
+        them = us ^ 1
+        if us == BLACK:
+            self.fullmove -= 1
+
+        piece = board[to]
+        mg = self.psq_mg
+        eg = self.psq_eg
+        if flag & PROMOTION:
+            pawn = PAWN + 6 * us
+            bb[piece] ^= 1 << to
+            bb[pawn] ^= 1 << to
+            mg -= MG_SCORES[piece][to] - MG_SCORES[pawn][to]
+            eg -= EG_SCORES[piece][to] - EG_SCORES[pawn][to]
+            self.phase -= PIECE_PHASE[piece]
+            self.pawn_key ^= PIECE_KEYS[pawn][to]
+            piece = pawn
+
+        from_to = (1 << frm) | (1 << to)
+        bb[piece] ^= from_to
+        occ[us] ^= from_to
+        board[frm] = piece
+        board[to] = captured
+        mg_table = MG_SCORES[piece]
+        eg_table = EG_SCORES[piece]
+        mg += mg_table[frm] - mg_table[to]
+        eg += eg_table[frm] - eg_table[to]
+        kind = PIECE_KIND[piece]
+        if kind == PAWN:
+            self.pawn_key ^= PIECE_KEYS[piece][frm] ^ PIECE_KEYS[piece][to]
+        elif kind == KING:
+            self.kings[us] = frm
+
+        if captured:
+            bb[captured] ^= 1 << to
+            occ[them] ^= 1 << to
+            mg += MG_SCORES[captured][to]
+            eg += EG_SCORES[captured][to]
+            self.phase += PIECE_PHASE[captured]
+            if PIECE_KIND[captured] == PAWN:
+                self.pawn_key ^= PIECE_KEYS[captured][to]
+        elif flag == EP_CAPTURE:
+            cap = to - 8 if us == WHITE else to + 8
+            pawn = PAWN + 6 * them
+            bb[pawn] ^= 1 << cap
+            occ[them] ^= 1 << cap
+            board[cap] = pawn
+            mg += MG_SCORES[pawn][cap]
+            eg += EG_SCORES[pawn][cap]
+            self.pawn_key ^= PIECE_KEYS[pawn][cap]
+        elif flag == KING_CASTLE:
+            self._move_rook(frm + 1, frm + 3)
+            rook = ROOK + 6 * us
+            mg += MG_SCORES[rook][frm + 3] - MG_SCORES[rook][frm + 1]
+            eg += EG_SCORES[rook][frm + 3] - EG_SCORES[rook][frm + 1]
+        elif flag == QUEEN_CASTLE:
+            self._move_rook(frm - 1, frm - 4)
+            rook = ROOK + 6 * us
+            mg += MG_SCORES[rook][frm - 4] - MG_SCORES[rook][frm - 1]
+            eg += EG_SCORES[rook][frm - 4] - EG_SCORES[rook][frm - 1]
+        self.psq_mg = mg
+        self.psq_eg = eg
+        return move
+
+    def make_null_move(self) -> None:
+        """
+        Passes the turn without moving, for null move pruning in the search.
+        Undo it with unmake_null_move.
+        """
+        self.stack.append((self.castling << 20) | ((self.ep + 1) << 24) | (self.halfmove << 31))
+        self.hashes.append(self.hash)
+        h = self.hash ^ SIDE_KEY
+        if self.ep != -1:
+            h ^= EP_KEYS[self.ep & 7]
+            self.ep = -1
+        self.hash = h
+        self.halfmove += 1
+        self.turn ^= 1
+
+    def unmake_null_move(self) -> None:
+        record = self.stack.pop()
+        self.hash = self.hashes.pop()
+        self.castling = (record >> 20) & 15
+        self.ep = ((record >> 24) & 127) - 1
+        self.halfmove = record >> 31
+        self.turn ^= 1
+
+    def _move_rook(self, frm: int, to: int) -> None:
+        rook = self.board[frm]
+        from_to = (1 << frm) | (1 << to)
+        self.bb[rook] ^= from_to
+        self.occ[PIECE_COLOR[rook]] ^= from_to
+        self.board[frm] = EMPTY
+        self.board[to] = rook
+
+    # --------------------------------------------------------------------- #
+    # Convenience
+    # --------------------------------------------------------------------- #
+    def moves(self) -> List[int]:
+        """
+        Returns the moves made since the position was set up, oldest first
+        (null moves show up as NULL_MOVE).
+        """
+        return [record & 0xFFFF for record in self.stack]
+
+    def last_move(self) -> int:
+        return self.stack[-1] & 0xFFFF if self.stack else NULL_MOVE
+
+    def parse_uci(self, text: str) -> Optional[int]:
+        """
+        Returns the legal move matching a long algebraic string such as
+        "e2e4" or "e7e8q", or None if there is no such move.
+        """
+        for move in self.legal_moves():
+            if to_uci(move) == text:
+                return move
+        return None
+
+    def repetition_count(self) -> int:
+        """
+        Returns how many times the current position occurred before, looking
+        back only as far as the last capture or pawn move.
+        """
+        count = 0
+        hashes = self.hashes
+        h = self.hash
+        for back in range(2, min(self.halfmove, len(hashes)) + 1, 2):
+            if hashes[-back] == h:
+                count += 1
+        return count
+
+    def is_checkmate(self) -> bool:
+        return self.in_check() and not self.legal_moves()
+
+    def is_stalemate(self) -> bool:
+        return not self.in_check() and not self.legal_moves()
+
+    def __str__(self) -> str:
+        rows = []
+        for rank in range(7, -1, -1):
+            rows.append(" ".join(PIECE_SYMBOLS[self.board[rank * 8 + file]] for file in range(8)))
+        return "\n".join(rows)
+
+    def __repr__(self) -> str:
+        return f"Position('{self.fen()}')"
@@ -0,0 +1,112 @@
+# psqt.py: Material values and piece-square tables.
+#
+# They live with the rules rather than the engine because Position keeps
+# their sums up to date in make_move / unmake_move (see Position.psq_mg),
+# so the evaluation never has to rescan the board.
+
+from typing import List
+
+# The same values as in position.py, which imports this module.
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(1, 7)
+WHITE = 0
+
+PIECE_VALUES = [0, 100, 320, 330, 500, 900, 0]
+
+# Game phase weight per piece kind; 24 is a full board of minor and major
+# pieces, 0 is a bare pawn ending.
+PHASE_WEIGHTS = [0, 0, 1, 1, 2, 4, 0]
+MAX_PHASE = 24
+
+# Piece-square tables from white's point of view, written rank 8 first so
+# they read like a diagram. Index with sq ^ 56 for white, sq for black.
+_PAWN = [
+     0,   0,   0,   0,   0,   0,   0,   0,
+    50,  50,  50,  50,  50,  50,  50,  50,
+    10,  10,  20,  30,  30,  20,  10,  10,
+     5,   5,  10,  25,  25,  10,   5,   5,
+     0,   0,   0,  20,  20,   0,   0,   0,
+     5,  -5, -10,   0,   0, -10,  -5,   5,
+     5,  10,  10, -20, -20,  10,  10,   5,
+     0,   0,   0,   0,   0,   0,   0,   0,
+]
+_KNIGHT = [
+   -50, -40, -30, -30, -30, -30, -40, -50,
+   -40, -20,   0,   0,   0,   0, -20, -40,
+   -30,   0,  10,  15,  15,  10,   0, -30,
+   -30,   5,  15,  20,  20,  15,   5, -30,
+   -30,   0,  15,  20,  20,  15,   0, -30,
+   -30,   5,  10,  15,  15,  10,   5, -30,
+   -40, -20,   0,   5,   5,   0, -20, -40,
+   -50, -40, -30, -30, -30, -30, -40, -50,
+]
+_BISHOP = [
+   -20, -10, -10, -10, -10, -10, -10, -20,
+   -10,   0,   0,   0,   0,   0,   0, -10,
+   -10,   0,   5,  10,  10,   5,   0, -10,
+   -10,   5,   5,  10,  10,   5,   5, -10,
+   -10,   0,  10,  10,  10,  10,   0, -10,
+   -10,  10,  10,  10,  10,  10,  10, -10,
+   -10,   5,   0,   0,   0,   0,   5, -10,
+   -20, -10, -10, -10, -10, -10, -10, -20,
+]
+_ROOK = [
+     0,   0,   0,   0,   0,   0,   0,   0,
+     5,  10,  10,  10,  10,  10,  10,   5,
+    -5,   0,   0,   0,   0,   0,   0,  -5,
+    -5,   0,   0,   0,   0,   0,   0,  -5,
+    -5,   0,   0,   0,   0,   0,   0,  -5,
+    -5,   0,   0,   0,   0,   0,   0,  -5,
+    -5,   0,   0,   0,   0,   0,   0,  -5,
+     0,   0,   0,   5,   5,   0,   0,   0,
+]
+_QUEEN = [
+   -20, -10, -10,  -5,  -5, -10, -10, -20,
+   -10,   0,   0,   0,   0,   0,   0, -10,
+   -10,   0,   5,   5,   5,   5,   0, -10,
+    -5,   0,   5,   5,   5,   5,   0,  -5,
+     0,   0,   5,   5,   5,   5,   0,  -5,
+   -10,   5,   5,   5,   5,   5,   0, -10,
+   -10,   0,   5,   0,   0,   0,   0, -10,
+   -20, -10, -10,  -5,  -5, -10, -10, -20,
+]
+_KING_MG = [
+   -30, -40, -40, -50, -50, -40, -40, -30,
+   -30, -40, -40, -50, -50, -40, -40, -30,
+   -30, -40, -40, -50, -50, -40, -40, -30,
+   -30, -40, -40, -50, -50, -40, -40, -30,
+   -20, -30, -30, -40, -40, -30, -30, -20,
+   -10, -20, -20, -20, -20, -20, -20, -10,
+    20,  20,   0,   0,   0,   0,  20,  20,
+    20,  30,  10,   0,   0,  10,  30,  20,
+]
+_KING_EG = [
+   -50, -40, -30, -20, -20, -30, -40, -50,
+   -30, -20, -10,   0,   0, -10, -20, -30,
+   -30, -10,  20,  30,  30,  20, -10, -30,
+   -30, -10,  30,  40,  40,  30, -10, -30,
+   -30, -10,  30,  40,  40,  30, -10, -30,
+   -30, -10,  20,  30,  30,  20, -10, -30,
+   -30, -30,   0,   0,   0,   0, -30, -30,
+   -50, -30, -30, -30, -30, -30, -30, -50,
+]
+
+_MG_TABLES = [None, _PAWN, _KNIGHT, _BISHOP, _ROOK, _QUEEN, _KING_MG]
+_EG_TABLES = [None, _PAWN, _KNIGHT, _BISHOP, _ROOK, _QUEEN, _KING_EG]
+
+
+def _signed_tables(tables) -> List[List[int]]:
+    # Material plus placement for every piece code, positive for white and
+    # negative for black, so evaluation is a plain sum.
+    result = [[0] * 64]
+    for color in (0, 1):
+        for kind in range(PAWN, KING + 1):
+            if color == WHITE:
+                result.append([PIECE_VALUES[kind] + tables[kind][sq ^ 56] for sq in range(64)])
+            else:
+                result.append([-(PIECE_VALUES[kind] + tables[kind][sq]) for sq in range(64)])
+    return result
+
+
+MG_SCORES = _signed_tables(_MG_TABLES)
+EG_SCORES = _signed_tables(_EG_TABLES)
+PIECE_PHASE = [PHASE_WEIGHTS[k] for k in [0] + list(range(PAWN, KING + 1)) * 2]
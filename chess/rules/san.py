@@ -0,0 +1,132 @@
+# san.py: Standard algebraic notation ("Nbd7", "exd5", "O-O", "e8=Q+").
+# Moves are read by matching the notation against the legal move generator,
+# so anything it accepts is legal in the position it is read in.
+
+from typing import List, Optional
+
+from chess.chess_exception import ChessException
+from chess.rules.bitboard import SQUARE_NAMES, square_file, square_rank
+from chess.rules.move import (
+    KING_CASTLE, QUEEN_CASTLE, move_from, move_to, promotion_kind, is_capture
+)
+from chess.rules.position import Position, PIECE_KIND, PAWN, KING
+
+PIECE_LETTERS = " PNBRQK"
+FILES = "abcdefgh"
+RANKS = "12345678"
+
+
+def to_san(position: Position, move: int, legal: List[int] = None) -> str:
+    """
+    Returns the SAN of a legal move, with "+" or "#" appended when it gives
+    check or mate. Pass the position's legal moves if they are already known.
+    """
+    flag = move >> 12
+    if flag == KING_CASTLE:
+        text = "O-O"
+    elif flag == QUEEN_CASTLE:
+        text = "O-O-O"
+    else:
+        frm = move_from(move)
+        to = move_to(move)
+        kind = PIECE_KIND[position.board[frm]]
+        if kind == PAWN:
+            text = FILES[square_file(frm)] + "x" if is_capture(move) else ""
+        else:
+            text = PIECE_LETTERS[kind]
+            if legal is None:
+                legal = position.legal_moves()
+            # Other pieces of the same kind that can also reach the square.
+            rivals = [move_from(m) for m in legal
+                      if move_to(m) == to and move_from(m) != frm and
+                      position.board[move_from(m)] == position.board[frm]]
+            if rivals:
+                if all(square_file(r) != square_file(frm) for r in rivals):
+                    text += FILES[square_file(frm)]
+                elif all(square_rank(r) != square_rank(frm) for r in rivals):
+                    text += RANKS[square_rank(frm)]
+                else:
+                    text += SQUARE_NAMES[frm]
+            if is_capture(move):
+                text += "x"
+        text += SQUARE_NAMES[to]
+        if promotion_kind(move):
+            text += "=" + PIECE_LETTERS[promotion_kind(move)]
+
+    position.make_move(move)
+    if position.in_check():
+        text += "#" if not position.legal_moves() else "+"
+    position.unmake_move()
+    return text
+
+
+def parse_san(position: Position, text: str, legal: List[int] = None) -> Optional[int]:
+    """
+    Returns the legal move written as text, or None if no legal move
+    matches. Raises ChessException if the notation is ambiguous.
+    """
+    san = text.rstrip("+#!?")
+    if legal is None:
+        legal = position.legal_moves()
+
+    if san in ("O-O", "0-0", "O-O-O", "0-0-0"):
+        flag = KING_CASTLE if len(san) == 3 else QUEEN_CASTLE
+        for move in legal:
+            if move >> 12 == flag:
+                return move
+        return None
+
+    promotion = 0
+    if "=" in san:
+        san, letter = san.split("=", 1)
+        promotion = PIECE_LETTERS.find(letter[:1].upper())
+    elif len(san) > 2 and san[-1] in "NBRQ" and san[-2] in RANKS:
+        # Some writers leave out the "=".
+        promotion = PIECE_LETTERS.find(san[-1])
+        san = san[:-1]
+    if promotion < 0 or len(san) < 2:
+        return None
+
+    if san[0] in "NBRQK":
+        kind = PIECE_LETTERS.index(san[0])
+        san = san[1:]
+    else:
+        kind = PAWN
+
+    target = san[-2:]
+    if target[0] not in FILES or target[1] not in RANKS:
+        return None
+    to = FILES.index(target[0]) + 8 * RANKS.index(target[1])
+
+    # Whatever is left between the piece letter and the target square is a
+    # capture mark and/or disambiguation (a file, a rank or a square).
+    hint = san[:-2].replace("x", "").replace(":", "")
+    from_file = from_rank = -1
+    for c in hint:
+        if c in FILES:
+            from_file = FILES.index(c)
+        elif c in RANKS:
+            from_rank = RANKS.index(c)
+        else:
+            return None
+
+    found = None
+    board = position.board
+    for move in legal:
+        if move_to(move) != to or promotion_kind(move) != promotion:
+            continue
+        frm = move_from(move)
+        if PIECE_KIND[board[frm]] != kind:
+            continue
+        if (from_file != -1 and square_file(frm) != from_file) or \
+                (from_rank != -1 and square_rank(frm) != from_rank):
+            continue
+        if found is not None:
+            raise ChessException(f"Ambiguous move: {text}")
+        found = move
+    if found is None and kind == KING and hint == "" and san in ("g1", "c1", "g8", "c8"):
+        # "Kg1" for castling, as a few old databases write it.
+        for move in legal:
+            if move >> 12 in (KING_CASTLE, QUEEN_CASTLE) and move_to(move) == to:
+                return move
+    return found
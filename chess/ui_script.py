@@ -0,0 +1,123 @@
+# ui_script.py: Writes input recordings of scripted sessions for the replay
+# benchmark (replay.py), so rendering changes can be compared on a fixed
+# workload without recording one by hand. Click positions come from the
+# real menu and board objects, so the script follows layout changes.
+
+import random
+
+import pygame
+from pygame.constants import *
+
+from base.events import RecordingWriter
+from base.settings import SCREEN_SETTING
+from base.window import Window
+import chess.game as game
+import chess.menu as menu
+from chess.rules.move import move_from, move_to, promotion_kind
+from chess.rules.position import Position, QUEEN
+
+
+class _Script:
+    """
+    Writes one event per frame, like a user who is never faster than the
+    frame rate.
+    """
+
+    def __init__(self, path: str):
+        self.writer = RecordingWriter(path)
+        self.frame = 0
+        self.frame_ms = 1000 / SCREEN_SETTING["fps"]
+
+    def add(self, event_type: int, **attrs) -> None:
+        self.writer.write(self.frame, self.frame * self.frame_ms, pygame.event.Event(event_type, attrs))
+        self.frame += 1
+
+    def idle(self, frames: int) -> None:
+        self.frame += frames
+
+    def move_mouse(self, pos: tuple, buttons: tuple = (0, 0, 0)) -> None:
+        self.add(MOUSEMOTION, pos=pos, rel=(0, 0), buttons=buttons, touch=False)
+
+    def click(self, pos: tuple) -> None:
+        self.move_mouse(pos)
+        self.add(MOUSEBUTTONDOWN, pos=pos, button=1, touch=False)
+        self.add(MOUSEBUTTONUP, pos=pos, button=1, touch=False)
+
+    def key(self, key: int) -> None:
+        self.add(KEYDOWN, key=key, mod=0, unicode="", scancode=0)
+        self.add(KEYUP, key=key, mod=0, unicode="", scancode=0)
+
+    def close(self) -> int:
+        self.add(QUIT)
+        self.writer.close(self.frame)
+        return self.frame
+
+
+def random_game(plies: int, seed: int) -> list:
+    """
+    A reproducible random game of up to plies moves that stops short of
+    mate, stalemate and the draw rules, so the board keeps taking input.
+    Promotions are to a queen, the only kind a click can play.
+    """
+    rng = random.Random(seed)
+    position = Position()
+    moves = []
+    while len(moves) < plies:
+        candidates = []
+        for move in position.legal_moves():
+            if promotion_kind(move) not in (0, QUEEN):
+                continue
+            position.make_move(move)
+            if position.legal_moves() and position.halfmove < 100 and position.repetition_count() < 2:
+                candidates.append(move)
+            position.unmake_move()
+        if not candidates:
+            break
+        move = rng.choice(candidates)
+        position.make_move(move)
+        moves.append(move)
+    return moves
+
+
+def script_session(path: str, plies: int = 100, seed: int = 1, step_every: int = 20) -> int:
+    """
+    Writes a recording that opens the options menu and goes back, starts a
+    human vs human game, plays plies random moves by clicking their squares,
+    steps back and forward through the game every step_every moves, jumps
+    to the start and end, drags the timeline across the game and quits.
+    Needs a display mode set (any driver). Returns the number of frames.
+    """
+    window = Window()
+    m_sys = menu.MenuSystem()
+    menu.initialize(window, m_sys)
+    g_sys = game.GameSystem()
+    game.initialize(window, g_sys)
+    grid = g_sys.grid
+    bar = g_sys.timeline.bar
+    game.shutdown(g_sys)
+
+    script = _Script(path)
+    script.idle(2)
+    script.click(m_sys.main_menu.option_button.rect.center)
+    script.idle(2)
+    script.click(m_sys.option_menu.mm_button.rect.center)
+    script.idle(2)
+    script.click(m_sys.main_menu.start_button.rect.center)
+    script.idle(2)
+
+    for i, move in enumerate(random_game(plies, seed), 1):
+        script.click(grid.renderer.square_rect(move_from(move)).center)
+        script.click(grid.renderer.square_rect(move_to(move)).center)
+        if i % step_every == 0:
+            for key in (K_LEFT,) * 3 + (K_RIGHT,) * 3:
+                script.key(key)
+
+    script.key(K_HOME)
+    script.key(K_END)
+    script.move_mouse((bar.left + 1, bar.centery))
+    script.add(MOUSEBUTTONDOWN, pos=(bar.left + 1, bar.centery), button=1, touch=False)
+    for step in range(1, 41):
+        script.move_mouse((bar.left + bar.width * step // 40, bar.centery), (1, 0, 0))
+    script.add(MOUSEBUTTONUP, pos=(bar.right, bar.centery), button=1, touch=False)
+    script.idle(2)
+    return script.close()
@@ -1,8 +1,26 @@
 from base.settings import SCREEN_SETTING
 
+
+class PlayerType:
+    (Human,
+     Computer) = range(0, 2)
+
+
 USER_OPTION = {
     "player_one_index": 2,
     "player_two_index": 3,
     "grid_square_width": int(SCREEN_SETTING["size"][0] / (16/8) / 8),
-    "grid_square_height": int(SCREEN_SETTING["size"][1] / (10/8) / 8)
+    "grid_square_height": int(SCREEN_SETTING["size"][1] / (10/8) / 8),
+    "player_one_type": PlayerType.Human,
+    "player_two_type": PlayerType.Human,
+    "ai_move_time": 2.0,
+    "ai_hash_mb": 16,
+    "ai_ponder": True,
+    "ai_book_path": "resource/books/book.bin",
+    "ai_use_book": True,
+    "ai_tablebase_path": "resource/tablebases",
+    "ai_use_tablebase": True,
+    # Set by main.py --watch: the game server address and game to show.
+    "watch_server": None,
+    "watch_game": 0
 }
@@ -13,17 +13,33 @@ def main_loop():
             break
 
 
+def end_startup_trace():
+    # Startup ends with the first frame drawn, which is the game's rather
+    # than the menu's when starting with --watch.
+    if trace.is_open("first frame"):
+        trace.end("first frame")
+        trace.finish()
+
+
 def menu_loop():
     global window
     menu_ent = menu.MenuSystem()
-    menu.initialize(window, menu_ent)
+    with trace.phase("menu construction"):
+        menu.initialize(window, menu_ent)
+    profiler.attach(window.scheduler)
     while window.menu_state == MenuState.Menu or \
             window.menu_state == MenuState.Options:
 
+        profiler.begin()
         menu.event_loop(window, menu_ent)
+        profiler.lap("event")
         menu.update(window, menu_ent)
+        profiler.lap("update")
         menu.draw(window, menu_ent)
-        window.ms = window.clock.tick(SCREEN_SETTING.get("fps"))
+        profiler.lap("draw")
+        end_startup_trace()
+        window.ms = window.scheduler.tick()
+        profiler.end()
 
 
 def game_loop():
@@ -31,33 +47,118 @@ def game_loop():
     game_ent = game.GameSystem()
 
     # Edit the window and game_ent objects
-    game.initialize(window, game_ent)
+    with trace.phase("board construction"):
+        game.initialize(window, game_ent)
+    profiler.attach(window.scheduler)
     while window.menu_state == MenuState.Game or \
             window.menu_state == MenuState.Paused:
 
+        profiler.begin()
         game.event_loop(window, game_ent)
+        profiler.lap("event")
         game.update(window, game_ent)
+        profiler.lap("update")
         game.draw(window, game_ent)
-        window.ms = window.clock.tick(SCREEN_SETTING.get("fps"))
-
+        profiler.lap("draw")
+        end_startup_trace()
+        window.ms = window.scheduler.tick()
+        profiler.end()
 
-if __name__ == "__main__":
-    import pygame
-    from pygame.constants import *
-    pygame.init()
-    pygame.font.init()
-
-    from base.window import Window, MenuState
-    from base.settings import SCREEN_SETTING
+    game.shutdown(game_ent)
 
-    pygame.display.set_mode(SCREEN_SETTING["size"], FULLSCREEN if SCREEN_SETTING["fullscreen"] else 0)
-    pygame.display.set_caption(SCREEN_SETTING["title"])
 
-    import chess.game as game
-    import chess.menu as menu
+if __name__ == "__main__":
+    import argparse
+    import gc
+    import os
+    import time
+
+    from base.startup import StartupTrace
+
+    parser = argparse.ArgumentParser(description="ChessPygame")
+    parser.add_argument("--trace-startup", action="store_true",
+                        default=bool(os.environ.get("CHESS_TRACE_STARTUP")),
+                        help="print time and memory used by each startup phase")
+    parser.add_argument("--watch", metavar="ADDRESS",
+                        help="watch a game on a game server (host:port or Unix socket path)")
+    parser.add_argument("--game", type=int, default=1, help="id of the game to watch")
+    parser.add_argument("--profile", metavar="FILE", action="append", default=[],
+                        help="write per-frame timings on exit (.csv per frame, .json summary); repeatable")
+    parser.add_argument("--record", metavar="FILE", help="record the input events of this session")
+    parser.add_argument("--replay", metavar="FILE",
+                        help="replay a recorded session as fast as possible instead of taking input")
+    parser.add_argument("--headless", action="store_true",
+                        help="run without a window (SDL dummy video driver), e.g. for --replay")
+    args = parser.parse_args()
+    trace = StartupTrace(args.trace_startup)
+    if args.headless:
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+        os.environ["SDL_AUDIODRIVER"] = "dummy"
+
+    # Startup runs in explicit phases. Nothing below is an import side
+    # effect, so tools can import the chess modules without a display.
+    with trace.phase("sdl init"):
+        import pygame
+        from pygame.constants import *
+        pygame.init()
+        pygame.font.init()
+
+        from base.window import Window, MenuState
+        from base.settings import SCREEN_SETTING
+
+        pygame.display.set_mode(SCREEN_SETTING["size"], FULLSCREEN if SCREEN_SETTING["fullscreen"] else 0)
+        pygame.display.set_caption(SCREEN_SETTING["title"])
+
+    with trace.phase("imports"):
+        import chess.game as game
+        import chess.menu as menu
+        from base.profiler import FRAME_PROFILER as profiler
+
+    with trace.phase("fonts"):
+        # Touching each size loads it into the shared registry before the
+        # menu's first frame needs it.
+        from base.common import GameFont
+        _fonts = GameFont.Small, GameFont.Default, GameFont.Title, GameFont.Arrow
+
+    with trace.phase("atlas"):
+        from chess.game_component.piece_texture import chess_texture
+        chess_texture.piece_textures()
+
+    # Everything built so far lives for the whole run; keep the cyclic GC
+    # from rescanning it during play.
+    gc.freeze()
+
+    from base.events import EVENTS
+    if args.replay:
+        try:
+            recording = EVENTS.replay(args.replay)
+        except ValueError as e:
+            print(e)
+            raise SystemExit(1)
+        SCREEN_SETTING["fps"] = 0
+        profiler.clear(size=max(recording.length, profiler.size))
+    elif args.record:
+        EVENTS.record(args.record)
 
     window = Window()
-    
+    if args.watch:
+        from chess.user_option import USER_OPTION
+        USER_OPTION["watch_server"] = args.watch
+        USER_OPTION["watch_game"] = args.game
+        window.menu_state = MenuState.Game
+
+    trace.begin("first frame")
+    started = time.perf_counter()
     main_loop()
+    elapsed = time.perf_counter() - started
 
+    EVENTS.close()
     pygame.quit()
+    if args.replay:
+        print(f"replayed {recording.events} events over {EVENTS.frame} frames in {elapsed:.2f}s "
+              f"({EVENTS.frame / elapsed:.0f} frames/s; recorded session {recording.seconds:.1f}s)")
+        print(profiler.report())
+    for path in args.profile:
+        profiler.export(path)
+    if args.profile and not args.replay:
+        print(profiler.report())
@@ -0,0 +1,65 @@
+# perft.py: Headless move generator benchmark and correctness check.
+#
+#   python perft.py                      run the reference suite
+#   python perft.py --depth 5            perft of the start position
+#   python perft.py --fen "<fen>" --depth 3 --divide
+
+import argparse
+import sys
+
+from chess.chess_exception import ChessException
+from chess.rules.perft import run_suite, timed_perft, divide
+from chess.rules.position import Position, START_FEN
+
+
+def print_result(result) -> None:
+    status = "" if result.expected < 0 else ("  OK" if result.ok else f"  FAIL (expected {result.expected})")
+    print(f"{result.name:<20} depth {result.depth}  {result.nodes:>12,} nodes  "
+          f"{result.seconds:8.3f}s  {result.nps:>12,.0f} nps{status}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Perft benchmark for the chess move generator.")
+    parser.add_argument("--fen", help="position to search (default: the start position)")
+    parser.add_argument("--depth", type=int, help="perft depth; without it the reference suite runs")
+    parser.add_argument("--divide", action="store_true", help="print the node count below each root move")
+    parser.add_argument("--max-nodes", type=int, default=1_000_000,
+                        help="suite only: deepest depth per position whose node count fits this budget")
+    args = parser.parse_args(argv)
+
+    if args.depth is None and args.fen is None:
+        results = run_suite(args.max_nodes)
+        for result in results:
+            print_result(result)
+        total_nodes = sum(r.nodes for r in results)
+        total_time = sum(r.seconds for r in results)
+        print(f"{'total':<20}          {total_nodes:>12,} nodes  {total_time:8.3f}s  "
+              f"{total_nodes / total_time:>12,.0f} nps")
+        failed = [r.name for r in results if not r.ok]
+        if failed:
+            print(f"FAILED: {', '.join(failed)}")
+            return 1
+        return 0
+
+    fen = args.fen or START_FEN
+    depth = args.depth or 1
+    try:
+        position = Position(fen)
+    except ChessException as e:
+        print(e)
+        return 1
+
+    if args.divide:
+        total = 0
+        for uci, nodes in divide(position, depth):
+            print(f"{uci}: {nodes}")
+            total += nodes
+        print(f"\nNodes searched: {total}")
+        return 0
+
+    print_result(timed_perft("fen" if args.fen else "startpos", fen, depth))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+# replay.py: Reproducible UI performance runs. Writes a scripted session
+# (menus, a game played by clicks, navigation and the timeline) as an input
+# recording, or replays any recording headless as fast as possible and
+# reports frame time percentiles.
+#
+#   python replay.py script session.jsonl --plies 100
+#   python replay.py run session.jsonl --profile frames.csv --max-p95 8
+#
+# Sessions recorded with python main.py --record FILE replay the same way.
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+
+def run(recording: str, profile: str = None) -> dict:
+    """
+    Replays the recording in a fresh headless main.py and returns the
+    profile summary (see base/profiler.py).
+    """
+    main = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+    with tempfile.TemporaryDirectory() as tmp:
+        summary_path = os.path.join(tmp, "summary.json")
+        command = [sys.executable, main, "--headless", "--replay", recording, "--profile", summary_path]
+        if profile:
+            command += ["--profile", profile]
+        code = subprocess.call(command)
+        if code != 0:
+            raise SystemExit(code)
+        with open(summary_path) as f:
+            return json.load(f)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Script and replay UI sessions headless to benchmark rendering.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    script = commands.add_parser("script", help="write a scripted session as a recording")
+    script.add_argument("output")
+    script.add_argument("--plies", type=int, default=100, help="moves to play by clicking")
+    script.add_argument("--seed", type=int, default=1, help="seed of the random game")
+
+    replay = commands.add_parser("run", help="replay a recording headless and report frame times")
+    replay.add_argument("recording")
+    replay.add_argument("--profile", metavar="FILE", help="also write the frame times (.csv or .json)")
+    replay.add_argument("--max-p95", type=float, metavar="MS",
+                        help="exit with status 1 if the p95 work time per frame exceeds MS")
+    args = parser.parse_args(argv)
+
+    if args.command == "script":
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+        import pygame
+        from base.settings import SCREEN_SETTING
+        from chess.ui_script import script_session
+        pygame.init()
+        pygame.display.set_mode(SCREEN_SETTING["size"])
+        frames = script_session(args.output, args.plies, args.seed)
+        pygame.quit()
+        print(f"Wrote {frames} frames to {args.output}")
+        return 0
+
+    summary = run(args.recording, args.profile)
+    p95 = summary["columns"]["work"]["p95"]
+    if args.max_p95 is not None and p95 > args.max_p95:
+        print(f"FAIL: p95 work time {p95:.2f} ms is over {args.max_p95:.2f} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,53 @@
+# scaling.py: Measure how the parallel search scales with the worker count.
+#
+#   python scaling.py                         1, 2, 4, ... up to the core count
+#   python scaling.py --workers 1 2 3 --depth 8
+#
+# Every position is searched to the same depth from an empty table for each
+# worker count; the time to depth and nps are compared with the first count.
+
+import argparse
+import os
+import sys
+
+from chess.chess_exception import ChessException
+from chess.engine.smp import BENCH_FENS, measure_scaling, scaling_report
+from chess.rules.position import Position
+
+
+def default_workers():
+    cores = os.cpu_count() or 1
+    counts = [1]
+    while counts[-1] * 2 <= cores:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != cores:
+        counts.append(cores)
+    return counts
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Time to depth and nps of the parallel search per worker count.")
+    parser.add_argument("--workers", type=int, nargs="+", default=default_workers(),
+                        help="worker counts to compare (default: powers of two up to the core count)")
+    parser.add_argument("--depth", type=int, default=7)
+    parser.add_argument("--fen", action="append", help="position to search (repeatable; default: a built-in set)")
+    parser.add_argument("--hash", type=int, default=64, help="shared transposition table size in MB")
+    args = parser.parse_args(argv)
+
+    fens = args.fen or BENCH_FENS
+    try:
+        for fen in fens:
+            Position(fen)
+    except ChessException as e:
+        print(e)
+        return 1
+
+    print(f"{len(fens)} positions, depth {args.depth}, {os.cpu_count()} cores")
+    results = measure_scaling(fens, args.workers, args.depth, args.hash)
+    print()
+    print(scaling_report(results))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,69 @@
+# server.py: Host many headless games over a local socket, or load-test a
+# server.
+#
+#   python server.py serve                          127.0.0.1:7654
+#   python server.py serve --listen /tmp/chess.sock
+#   python server.py bench --games 5000 --connections 200
+#
+# Watch a game in the pygame client with
+#   python main.py --watch 127.0.0.1:7654 --game 1
+
+import argparse
+import asyncio
+import sys
+
+from chess.net.bench import bench
+from chess.net.protocol import DEFAULT_HOST, DEFAULT_PORT
+from chess.net.server import GameServer
+
+
+async def serve(address: str, stats_interval: float) -> None:
+    server = GameServer()
+    bound = await server.start(address)
+    print(f"Listening on {bound}")
+    try:
+        while True:
+            await asyncio.sleep(stats_interval or 3600)
+            if stats_interval:
+                stats = server.stats()
+                latency = stats["move_latency_ms"]
+                print(f"{stats['games']} games ({stats['active']} active), {stats['connections']} connections, "
+                      f"{stats['moves']} moves, move p50 {latency['p50']}ms p99 {latency['p99']}ms, "
+                      f"{stats['game_bytes']:,} bytes/game")
+    finally:
+        await server.close()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Headless multi-game server.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="host games until interrupted")
+    serve_parser.add_argument("--listen", default=f"{DEFAULT_HOST}:{DEFAULT_PORT}",
+                              help="host:port, or a path for a Unix socket")
+    serve_parser.add_argument("--stats", type=float, default=10.0,
+                              help="seconds between stats lines (0 for none)")
+
+    bench_parser = commands.add_parser("bench", help="play random games and report capacity figures")
+    bench_parser.add_argument("--games", type=int, default=1000)
+    bench_parser.add_argument("--connections", type=int, default=50)
+    bench_parser.add_argument("--plies", type=int, default=40, help="moves per game at most")
+    bench_parser.add_argument("--clock", type=float, nargs=2, metavar=("SECONDS", "INCREMENT"),
+                              help="give every game a clock")
+    bench_parser.add_argument("--connect", help="load-test a running server instead of an in-process one")
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        try:
+            asyncio.run(serve(args.listen, args.stats))
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    result = bench(args.games, args.connections, args.plies, args.clock, args.connect)
+    print(result.report())
+    return 0 if not result.errors else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+# tablebase.py: Generate and probe the endgame tablebases.
+#
+#   python tablebase.py generate KQK KRK KPK
+#   python tablebase.py generate KBNK
+#   python tablebase.py probe --fen "8/8/8/4k3/8/8/8/KQ6 w - - 0 1"
+
+import argparse
+import sys
+import time
+
+from chess.chess_exception import ChessException
+from chess.engine.tablebase import Tablebases, TB_DIR, WIN, LOSS, describe
+from chess.rules.position import Position
+from chess.rules.san import to_san
+
+DEFAULT_TABLES = ["KQK", "KRK", "KPK"]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Generate and probe endgame tablebases.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate = commands.add_parser("generate", help="build tables (needs numpy)")
+    generate.add_argument("tables", nargs="*", default=DEFAULT_TABLES,
+                          help=f"signatures to build (default: {' '.join(DEFAULT_TABLES)}); "
+                               f"KBNK takes about a minute and 1 GB of memory")
+    generate.add_argument("--dir", default=TB_DIR)
+    generate.add_argument("--force", action="store_true", help="rebuild tables that already exist")
+
+    probe = commands.add_parser("probe", help="show the result and best moves of a position")
+    probe.add_argument("--fen", required=True)
+    probe.add_argument("--dir", default=TB_DIR)
+    args = parser.parse_args(argv)
+
+    if args.command == "generate":
+        # Imported here so probing works without numpy installed.
+        from chess.engine.tablebase_gen import generate as generate_tables
+        start = time.perf_counter()
+        try:
+            written = generate_tables(args.tables, args.dir, args.force)
+        except ChessException as e:
+            print(e)
+            return 1
+        print(f"Wrote {', '.join(written) or 'nothing'} to {args.dir} "
+              f"in {time.perf_counter() - start:.1f}s")
+        return 0
+
+    tablebase = Tablebases(args.dir)
+    for signature, reason in tablebase.skipped:
+        print(f"Skipping tablebase {signature}: {reason}")
+    try:
+        position = Position(args.fen)
+    except ChessException as e:
+        print(e)
+        return 1
+    print(describe(tablebase.probe(position), position.turn))
+    found = tablebase.best_move(position)
+    if found is None or not found[0]:
+        return 0
+    print(f"best {to_san(position, found[0])}")
+    for move in position.legal_moves():
+        san = to_san(position, move)
+        position.make_move(move)
+        result = tablebase.probe(position)
+        position.unmake_move()
+        if result is None:
+            text = "?"
+        elif result[0] == LOSS:
+            text = f"win, mate in {(result[1] + 2) // 2}"
+        elif result[0] == WIN:
+            text = f"loss, mated in {(result[1] + 1) // 2}"
+        else:
+            text = "draw"
+        print(f"  {san:<8} {text}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
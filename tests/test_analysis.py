@@ -0,0 +1,35 @@
+# test_analysis.py: Batch analysis of PGN files (chess/engine/analysis.py).
+
+import io
+
+from chess.engine.analysis import AnalysisOptions, analyze_games
+from chess.rules.pgn import read_pgn_string, write_pgn
+
+PGN = """[Event "Good"]
+[Result "*"]
+
+1. e4 e5 *
+
+[Event "Bad FEN"]
+[SetUp "1"]
+[FEN "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq z9 0 1"]
+[Result "*"]
+
+1. e4 *
+
+[Event "After"]
+[Result "*"]
+
+1. d4 *
+"""
+
+
+def test_game_with_bad_fen_is_passed_through():
+    results = list(analyze_games(read_pgn_string(PGN), AnalysisOptions(depth=1), workers=0))
+
+    assert [result.index for result in results] == [0, 1, 2]
+    assert [result.game.headers["Event"] for result in results] == ["Good", "Bad FEN", "After"]
+    assert [result.plies for result in results] == [3, 0, 2]
+    bad = results[1].game
+    assert bad.comments == {} and "Annotator" not in bad.headers
+    assert write_pgn([result.game for result in results], io.StringIO()) == 3
@@ -0,0 +1,109 @@
+# tournament.py: Self-play tournaments between engine configurations on all
+# cores.
+#
+#   python tournament.py --engine "name=base" --engine "name=shelter20 eval.SHELTER=20" \
+#       --nodes 20000 --rounds 200 --sprt 0 5 -o match.pgn
+#
+# The first engine is the baseline; Elo and the SPRT are given for the
+# second against it. Each round is one opening played with both colors.
+
+import argparse
+import os
+import sys
+import time
+
+from chess.chess_exception import ChessException
+from chess.engine.elo import Sprt
+from chess.engine.tablebase import TB_DIR
+from chess.engine.tournament import (Adjudication, TournamentStats, builtin_openings, load_openings,
+                                     parse_engine, run_tournament, EVAL_TERMS)
+from chess.rules.pgn import game_to_pgn
+
+# Seconds between live status lines.
+STATUS_INTERVAL = 2.0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Play engine configurations against each other.")
+    parser.add_argument("--engine", action="append", required=True, metavar="SPEC",
+                        help="an engine as key=value words: name, depth, movetime, nodes, hash and "
+                             f"eval.<term> for {', '.join(EVAL_TERMS)} (give two or more)")
+    parser.add_argument("--depth", type=int, help="depth per move for engines without a budget")
+    parser.add_argument("--movetime", type=float, help="seconds per move for engines without a budget")
+    parser.add_argument("--nodes", type=int, help="nodes per move for engines without a budget (default 20000)")
+    parser.add_argument("--openings", help="PGN (first --opening-plies moves of each game) or EPD/FEN file")
+    parser.add_argument("--opening-plies", type=int, default=8)
+    parser.add_argument("--rounds", type=int, help="openings to play, each with both colors "
+                                                   "(default: every opening once)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="worker processes (0 plays in this process)")
+    parser.add_argument("-o", "--output", default="tournament.pgn", help="PGN file for the games")
+    parser.add_argument("--sprt", type=float, nargs=2, metavar=("ELO0", "ELO1"),
+                        help="stop once the second engine is shown to be at least ELO1 (or at most "
+                             "ELO0) Elo stronger than the first")
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--beta", type=float, default=0.05)
+    parser.add_argument("--no-tablebase", action="store_true", help="do not adjudicate by tablebase")
+    parser.add_argument("--tablebase-dir", default=TB_DIR)
+    parser.add_argument("--resign", type=int, nargs=2, default=[600, 4], metavar=("CP", "MOVES"),
+                        help="adjudicate a loss after both engines see CP against one side for MOVES "
+                             "moves each (0 moves to disable)")
+    parser.add_argument("--draw", type=int, nargs=3, default=[10, 8, 40], metavar=("CP", "MOVES", "FROM"),
+                        help="adjudicate a draw after both engines score within CP of zero for MOVES moves "
+                             "each, from move FROM on (0 moves to disable)")
+    parser.add_argument("--max-plies", type=int, default=400)
+    args = parser.parse_args(argv)
+
+    try:
+        configs = [parse_engine(spec) for spec in args.engine]
+        openings = load_openings(args.openings, args.opening_plies) if args.openings else builtin_openings()
+    except (ChessException, OSError) as e:
+        print(e)
+        return 1
+    if len(configs) < 2:
+        print("Give at least two --engine specs")
+        return 1
+    if not openings:
+        print("No openings")
+        return 1
+    for config in configs:
+        if not config.has_budget:
+            config.depth = args.depth
+            config.movetime = args.movetime
+            config.nodes = args.nodes
+            if not config.has_budget:
+                config.nodes = 20000
+
+    rules = Adjudication(tablebase=not args.no_tablebase, tablebase_dir=args.tablebase_dir,
+                         resign_score=args.resign[0], resign_moves=args.resign[1],
+                         draw_score=args.draw[0], draw_moves=args.draw[1], draw_start=args.draw[2],
+                         max_plies=args.max_plies)
+    sprt = Sprt(args.sprt[0], args.sprt[1], args.alpha, args.beta) if args.sprt else None
+    rounds = args.rounds or len(openings)
+    pairs = len(configs) * (len(configs) - 1) // 2
+    total = rounds * pairs * 2
+    stats = TournamentStats(configs)
+
+    print(f"{total} games, {len(configs)} engines, {len(openings)} openings, "
+          f"{args.workers or 1} workers", file=sys.stderr)
+    last_status = 0.0
+    with open(args.output, "w", encoding="utf-8") as out:
+        for record in run_tournament(configs, openings, rounds, rules, args.workers, sprt, stats):
+            if stats.games > 1:
+                out.write("\n")
+            out.write(game_to_pgn(record.game))
+            out.flush()
+            now = time.perf_counter()
+            if now - last_status >= STATUS_INTERVAL:
+                last_status = now
+                print(stats.status(total), file=sys.stderr)
+
+    print(stats.status(total), file=sys.stderr)
+    print()
+    print(stats.report())
+    print(f"Games written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,25 @@
+# uci.py: Run the engine as a UCI engine on stdin/stdout.
+#
+#   python uci.py
+#
+# Point a chess GUI (Arena, Cute Chess, ...) at this script, or type UCI
+# commands at it directly.
+
+import argparse
+import sys
+
+from chess.engine import uci
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Speak the Universal Chess Interface on stdin/stdout.")
+    parser.parse_args(argv)
+    try:
+        uci.run()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())